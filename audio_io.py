@@ -0,0 +1,50 @@
+import subprocess
+import numpy as np
+
+
+# Whisper 使用的取樣率
+WHISPER_SAMPLE_RATE = 16000
+
+# 參考語音片段的最大長度（秒）；XTTS 只會使用參考音訊開頭的 max_ref_len 秒
+SPEAKER_REFERENCE_SECONDS = 30
+
+
+def decode_audio(path, sample_rate=WHISPER_SAMPLE_RATE, threads=0):
+    """以 ffmpeg 將媒體的音軌一次解碼為單聲道 float32 NumPy 陣列（不寫入磁碟），threads 為 0 時由 ffmpeg 自行決定"""
+    command = [
+        "ffmpeg", "-nostdin", "-threads", str(threads), "-i", path,
+        "-vn", "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"無法解碼音訊: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def speech_select_filter(intervals, max_seconds=SPEAKER_REFERENCE_SECONDS):
+    """ffmpeg 音訊濾鏡：只保留語音區段並重新排列時間戳（取足 max_seconds 秒的語音即停止）"""
+    selected, total = [], 0.0
+    for start, end in intervals:
+        selected.append(f"between(t,{start:.3f},{end:.3f})")
+        total += end - start
+        if max_seconds and total >= max_seconds:
+            break
+    return f"aselect='{'+'.join(selected)}',asetpts=N/SR/TB"
+
+
+def extract_speaker_clip(video_path, output_path, max_seconds=SPEAKER_REFERENCE_SECONDS, threads=0,
+                         speech_intervals=None):
+    """從媒體中提取原始音質的參考語音片段（僅在需要作為 XTTS 參考語音時使用）
+
+    提供 speech_intervals（秒）時只擷取語音區段，避免開頭的靜音或音樂佔用參考長度。
+    """
+    command = ["ffmpeg", "-y", "-nostdin", "-loglevel", "error", "-threads", str(threads), "-i", video_path, "-vn"]
+    if speech_intervals:
+        command += ["-af", speech_select_filter(speech_intervals, max_seconds)]
+    if max_seconds:
+        command += ["-t", str(max_seconds)]
+    command += ["-acodec", "pcm_s16le", output_path]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"無法提取參考語音: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return output_path
@@ -0,0 +1,119 @@
+import os
+import queue
+import threading
+
+
+# 共用單一常駐模型實例的階段，只能以單一線程執行
+SERIAL_STAGES = {"transcribe", "synthesize"}
+
+# 通知工作線程結束的標記
+_STOP = object()
+
+
+class StagedBatchExecutor:
+    """分階段批次執行器：各階段有獨立的工作線程，階段之間以有界佇列連接
+
+    檔案 N+1 轉錄的同時，檔案 N 正在合成語音、檔案 N-1 正在編碼視頻。
+    佇列已滿時上游階段會阻塞等待（背壓），因此同時在處理中的檔案數量有上限。
+    只執行後段階段時，prerequisites 為必須已由批次記錄恢復的前置階段，缺少任一個的檔案記為失敗。
+    """
+
+    def __init__(self, pipeline, stages, stage_workers=None, queue_size=2, prerequisites=()):
+        self.pipeline = pipeline
+        self.stages = tuple(stages)
+        self.prerequisites = tuple(prerequisites)
+        self.queue_size = max(1, queue_size)
+        self.workers = {}
+        for stage in self.stages:
+            count = max(1, int((stage_workers or {}).get(stage, 1)))
+            if stage in SERIAL_STAGES and count > 1:
+                pipeline.log(f"⚠️ 階段 {stage} 共用單一模型實例，工作線程數固定為 1")
+                count = 1
+            self.workers[stage] = count
+
+    @property
+    def log(self):
+        return self.pipeline.log
+
+    def run(self, files, output_folder, on_file_start=None):
+        """執行批次處理，回傳 (依輸入順序排列的成功結果, [(檔案, 錯誤)] 列表)"""
+        pipeline = self.pipeline
+        stages = self.stages
+        total_files = len(files)
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        alive = [self.workers[stage] for stage in stages]
+        lock = threading.Lock()
+        results = []
+        failures = []
+
+        def finish(job, error=None):
+            file_name = os.path.basename(job.input_path)
+            with lock:
+                if error is None:
+                    results.append((job.index, job.result))
+                else:
+                    failures.append((job.index, job.input_path, error))
+            if error is None:
+                self.log(f"✅ 檔案 {file_name} 處理成功")
+            else:
+                self.log(f"❌ 處理檔案 {file_name} 時發生錯誤: {str(error)}")
+            pipeline.release_job(job)
+
+        def worker(stage_index):
+            stage = stages[stage_index]
+            in_queue = queues[stage_index]
+            while True:
+                job = in_queue.get()
+                if job is _STOP:
+                    break
+                try:
+                    pipeline.run_stage(stage, job)
+                except Exception as e:
+                    finish(job, e)
+                    continue
+                if stage_index + 1 < len(stages):
+                    # 下游佇列已滿時在此阻塞（背壓）
+                    queues[stage_index + 1].put(job)
+                else:
+                    finish(job)
+
+            # 本階段最後一個結束的工作線程負責通知下游階段結束
+            with lock:
+                alive[stage_index] -= 1
+                last = alive[stage_index] == 0
+            if last and stage_index + 1 < len(stages):
+                for _ in range(self.workers[stages[stage_index + 1]]):
+                    queues[stage_index + 1].put(_STOP)
+
+        threads = []
+        for stage_index, stage in enumerate(stages):
+            for n in range(self.workers[stage]):
+                thread = threading.Thread(target=worker, args=(stage_index,), name=f"{stage}-{n}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        # 依序送入檔案（第一個佇列已滿時阻塞）
+        for index, file_path in enumerate(files):
+            if on_file_start:
+                on_file_start(index, total_files, file_path)
+            self.log(f"🔄 開始處理檔案 {index+1}/{total_files}: {os.path.basename(file_path)}")
+            try:
+                job = pipeline.create_batch_job(file_path, output_folder, index=index)
+            except Exception as e:
+                failures.append((index, file_path, e))
+                self.log(f"❌ 處理檔案 {os.path.basename(file_path)} 時發生錯誤: {str(e)}")
+                continue
+            missing = [stage for stage in self.prerequisites if stage not in job.completed_stages]
+            if missing:
+                finish(job, RuntimeError(f"前置階段未完成或產物已遺失: {', '.join(missing)}"))
+                continue
+            queues[0].put(job)
+        for _ in range(self.workers[stages[0]]):
+            queues[0].put(_STOP)
+
+        for thread in threads:
+            thread.join()
+
+        results.sort(key=lambda item: item[0])
+        failures.sort(key=lambda item: item[0])
+        return [result for _, result in results], [(path, error) for _, path, error in failures]
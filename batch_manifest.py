@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from cache_utils import json_default
+
+
+# 輸出資料夾中的批次記錄檔與中間檔案目錄
+MANIFEST_NAME = ".dtv-manifest.sqlite3"
+WORK_DIR_NAME = ".dtv-work"
+
+
+def file_fingerprint(path):
+    """以檔案大小與修改時間判斷輸入檔案是否變更"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class BatchManifest:
+    """批次處理記錄（SQLite，位於輸出資料夾）：記錄每個輸入檔案已完成的階段與其產物
+
+    重新執行同一批次時，已完成的檔案直接略過，未完成的檔案從最後完成的階段之後繼續。
+    輸入檔案或影響輸出的設定變更時，該檔案的記錄會重設。
+    SQLite 可同時被多個工作線程與工作進程寫入。
+    """
+
+    def __init__(self, output_folder, config_key):
+        self.output_folder = output_folder
+        self.config_key = config_key
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connect(self):
+        # 連線不可跨進程共用，fork 後的子進程需重新連線
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " input_path TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, config_key TEXT NOT NULL,"
+                " output_path TEXT NOT NULL, work_dir TEXT NOT NULL, status TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stages ("
+                " input_path TEXT NOT NULL, stage TEXT NOT NULL, artifacts TEXT NOT NULL, finished_at REAL NOT NULL,"
+                " PRIMARY KEY (input_path, stage))"
+            )
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def work_dir_for(self, input_path):
+        """輸入檔案的中間檔案目錄（保留到檔案完成為止，供中斷後繼續使用）"""
+        digest = hashlib.sha1(input_path.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.output_folder, WORK_DIR_NAME, digest)
+
+    def open_file(self, input_path, output_path):
+        """取得輸入檔案的記錄，回傳 {"output_path", "work_dir", "status", "stages": {階段: 產物}}
+
+        沒有記錄、輸入檔案已變更或設定不同時建立新的記錄，output_path 為新記錄使用的輸出路徑。
+        """
+        input_path = os.path.abspath(input_path)
+        fingerprint = file_fingerprint(input_path)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT fingerprint, config_key, output_path, work_dir, status FROM files WHERE input_path = ?",
+                (input_path,)
+            ).fetchone()
+            if row and row[0] == fingerprint and row[1] == self.config_key:
+                stages = {
+                    stage: json.loads(artifacts)
+                    for stage, artifacts in conn.execute(
+                        "SELECT stage, artifacts FROM stages WHERE input_path = ?", (input_path,)
+                    )
+                }
+                return {"output_path": row[2], "work_dir": row[3], "status": row[4], "stages": stages}
+
+            work_dir = self.work_dir_for(input_path)
+            conn.execute("DELETE FROM stages WHERE input_path = ?", (input_path,))
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (input_path, fingerprint, self.config_key, output_path, work_dir, "pending", time.time())
+            )
+            conn.commit()
+            return {"output_path": output_path, "work_dir": work_dir, "status": "pending", "stages": {}}
+
+    def record_stage(self, input_path, stage, artifacts):
+        """記錄已完成的階段與其產物"""
+        input_path = os.path.abspath(input_path)
+        data = json.dumps(artifacts, ensure_ascii=False, default=json_default)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+                (input_path, stage, data, time.time())
+            )
+            conn.execute("UPDATE files SET updated_at = ? WHERE input_path = ?", (time.time(), input_path))
+            conn.commit()
+
+    def mark_done(self, input_path):
+        """標記檔案已完成所有階段"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE files SET status = 'done', updated_at = ? WHERE input_path = ?",
+                (time.time(), os.path.abspath(input_path))
+            )
+            conn.commit()
@@ -0,0 +1,98 @@
+"""比較 ffmpeg 串流複製與 MoviePy 重新編碼替換視頻音軌的耗時
+
+用法:
+    python benchmarks/bench_mux.py --video input.mp4 --audio dubbed.wav
+    python benchmarks/bench_mux.py --duration 60 --size 1920x1080
+未提供檔案時會用 ffmpeg 產生測試圖樣視頻與正弦波音訊。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from muxer import mux_audio  # noqa: E402
+
+
+def make_fixtures(temp_dir, duration, size):
+    """產生測試用視頻（testsrc 圖樣）與略短的音訊"""
+    video_path = os.path.join(temp_dir, "fixture.mp4")
+    audio_path = os.path.join(temp_dir, "fixture.wav")
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", video_path
+    ], check=True)
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={duration * 0.9:.2f}",
+        "-ar", "24000", "-ac", "1", audio_path
+    ], check=True)
+    return video_path, audio_path
+
+
+def mux_with_moviepy(video_path, audio_path, output_path, temp_dir):
+    """與舊版流程相同的 MoviePy 重新編碼方式"""
+    import moviepy as mp
+    video_clip = mp.VideoFileClip(video_path)
+    audio_clip = mp.AudioFileClip(audio_path)
+    if video_clip.duration > audio_clip.duration:
+        video_clip = video_clip.subclip(0, audio_clip.duration)
+    video_clip.set_audio(audio_clip).write_videofile(
+        output_path,
+        codec='libx264',
+        audio_codec='aac',
+        temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
+        remove_temp=True,
+        logger=None
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="視頻音軌替換速度基準測試")
+    parser.add_argument("--video", help="輸入視頻（未提供時自動產生）")
+    parser.add_argument("--audio", help="新的音訊（未提供時自動產生）")
+    parser.add_argument("--duration", type=float, default=30.0, help="自動產生的測試視頻長度（秒）")
+    parser.add_argument("--size", default="1920x1080", help="自動產生的測試視頻解析度")
+    parser.add_argument("--skip-moviepy", action="store_true", help="只測量 ffmpeg 串流複製")
+    parser.add_argument("--json", help="將結果寫入 JSON 檔案")
+    args = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        if args.video and args.audio:
+            video_path, audio_path = args.video, args.audio
+        else:
+            print("🔄 正在產生測試視頻...")
+            video_path, audio_path = make_fixtures(temp_dir, args.duration, args.size)
+
+        result = {"video": video_path, "audio": audio_path}
+
+        start = time.perf_counter()
+        stream_copied = mux_audio(video_path, audio_path, os.path.join(temp_dir, "ffmpeg_out.mp4"), log=lambda m: None)
+        result["ffmpeg"] = {"seconds": time.perf_counter() - start, "stream_copy": stream_copied}
+        print(f"⚡ ffmpeg{'串流複製' if stream_copied else '重新編碼'}: {result['ffmpeg']['seconds']:.2f} 秒")
+
+        if not args.skip_moviepy:
+            start = time.perf_counter()
+            mux_with_moviepy(video_path, audio_path, os.path.join(temp_dir, "moviepy_out.mp4"), temp_dir)
+            result["moviepy"] = {"seconds": time.perf_counter() - start}
+            result["speedup"] = result["moviepy"]["seconds"] / result["ffmpeg"]["seconds"]
+            print(f"🎬 MoviePy 重新編碼: {result['moviepy']['seconds']:.2f} 秒")
+            print(f"📊 加速倍數: {result['speedup']:.1f}x")
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""int8 動態量化基準測試：比較 fp32 與 int8 的 Whisper 轉錄、XTTS 合成速度與品質
+
+用法:
+    python benchmarks/bench_quantization.py --audio lecture.wav --reference lecture.txt
+    python benchmarks/bench_quantization.py --model-size small --xtts-dir XTTS-v2 --json quant.json
+未指定 --audio 時以 fp32 XTTS 合成範例文本作為測試語音（需要 --speaker-wav，參考文本即範例文本）。
+Whisper 的品質以詞錯誤率 (WER) 表示，無參考文本時以 fp32 的轉錄結果為參考；
+XTTS 的品質以 fp32 Whisper 轉錄合成語音後相對於輸入文本的 WER 表示（可懂度）。
+CJK 文本以字元計算錯誤率。每個模型變體在獨立的進程中執行，峰值記憶體互不影響；
+int8 的準備時間包含首次轉換（之後從快取載入）。
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import unicodedata
+import multiprocessing as mproc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_suite import SAMPLE_TEXT, MB, write_wav, peak_rss_bytes  # noqa: E402
+
+
+def tokenize(text):
+    """正規化後切分為詞；含 CJK 字元時逐字切分"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    if re.search(r"[぀-ヿ㐀-鿿가-힯]", text):
+        return [char for char in text if not char.isspace()]
+    return text.split()
+
+
+def word_error_rate(reference, hypothesis):
+    """以編輯距離計算詞錯誤率（替換 + 刪除 + 插入）/ 參考詞數"""
+    ref, hyp = tokenize(reference), tokenize(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_token in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_token in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_token != hyp_token))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _silent(message):
+    pass
+
+
+def _whisper_main(options, audio_path, quantize, conn):
+    """在獨立進程中載入 Whisper（fp32 或 int8）並轉錄"""
+    try:
+        import torch
+        from audio_io import decode_audio, WHISPER_SAMPLE_RATE
+        from model_registry import whisper_registry, model_param_bytes
+        audio = decode_audio(audio_path)
+
+        start = time.perf_counter()
+        model = whisper_registry.get(options.model_size, torch.device("cpu"), log=_silent, quantize=quantize)
+        setup_seconds = time.perf_counter() - start
+
+        best_seconds, text = None, ""
+        for _ in range(options.repeat):
+            start = time.perf_counter()
+            text = model.transcribe(audio, language=options.language)["text"]
+            elapsed = time.perf_counter() - start
+            best_seconds = elapsed if best_seconds is None else min(best_seconds, elapsed)
+        conn.send({
+            "status": "ok",
+            "setup_seconds": setup_seconds,
+            "seconds": best_seconds,
+            "rtf": best_seconds / (len(audio) / WHISPER_SAMPLE_RATE),
+            "param_mb": model_param_bytes(model.model) / MB,
+            "peak_rss_mb": peak_rss_bytes() / MB,
+            "text": text.strip(),
+        })
+    except Exception as e:
+        conn.send({"status": "skipped", "reason": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def _xtts_main(options, speaker_wav, output_path, quantize, conn):
+    """在獨立進程中載入 XTTS（fp32 或 int8）並合成範例文本"""
+    try:
+        import torch
+        from model_registry import xtts_registry, model_param_bytes
+        from speaker_cache import SpeakerLatentCache, synthesize_with_cache, xtts_model_tag
+
+        start = time.perf_counter()
+        model, config = xtts_registry.get(options.xtts_dir, torch.device("cpu"), log=_silent, quantize=quantize)
+        cache = SpeakerLatentCache(disk_dir=os.path.dirname(output_path))
+        model_tag = xtts_model_tag(options.xtts_dir, quantize)
+        cache.get(model, config, speaker_wav, model_tag=model_tag, log=_silent)
+        setup_seconds = time.perf_counter() - start
+
+        best_seconds, duration = None, 0.0
+        for _ in range(options.repeat):
+            # 固定亂數種子，讓 fp32 與 int8 的取樣過程一致
+            torch.manual_seed(0)
+            start = time.perf_counter()
+            outputs = synthesize_with_cache(model, config, SAMPLE_TEXT, "en", speaker_wav, cache,
+                                            model_tag=model_tag, log=_silent)
+            elapsed = time.perf_counter() - start
+            best_seconds = elapsed if best_seconds is None else min(best_seconds, elapsed)
+            sample_rate = outputs.get("sample_rate", 24000)
+            wav = np.asarray(outputs["wav"], dtype=np.float32)
+            duration = len(wav) / sample_rate
+            write_wav(output_path, wav, sample_rate)
+        conn.send({
+            "status": "ok",
+            "setup_seconds": setup_seconds,
+            "seconds": best_seconds,
+            "rtf": best_seconds / duration if duration else None,
+            "param_mb": model_param_bytes(model) / MB,
+            "peak_rss_mb": peak_rss_bytes() / MB,
+            "output": output_path,
+        })
+    except Exception as e:
+        conn.send({"status": "skipped", "reason": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_isolated(target, *args):
+    """在 spawn 的子進程中執行 target，回傳其結果"""
+    context = mproc.get_context("spawn")
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=target, args=args + (child_conn,))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = {"status": "failed", "reason": f"進程異常結束 (exit code {process.exitcode})"}
+    process.join()
+    return result
+
+
+def compare_variants(fp32, int8, quality_key):
+    """計算 int8 相對於 fp32 的加速比、記憶體比例與品質差異"""
+    if fp32["status"] != "ok" or int8["status"] != "ok":
+        return None
+    return {
+        "speedup": fp32["seconds"] / int8["seconds"],
+        "param_ratio": int8["param_mb"] / fp32["param_mb"] if fp32["param_mb"] else None,
+        "peak_rss_ratio": int8["peak_rss_mb"] / fp32["peak_rss_mb"],
+        "quality_delta": int8[quality_key] - fp32[quality_key]
+        if quality_key in int8 and quality_key in fp32 else None,
+    }
+
+
+def print_variant(name, result, quality_key):
+    if result["status"] != "ok":
+        print(f"⚠️ {name} 未執行: {result['reason']}")
+        return
+    print(f"📊 {name}: 耗時 {result['seconds']:.2f} 秒 (RTF {result['rtf']:.2f})，準備 {result['setup_seconds']:.2f} 秒，"
+          f"權重 {result['param_mb']:.0f} MB，峰值記憶體 {result['peak_rss_mb']:.0f} MB"
+          + (f"，WER {result[quality_key]:.1%}" if quality_key in result else ""))
+
+
+def print_comparison(name, comparison):
+    if comparison is None:
+        return
+    delta = comparison["quality_delta"]
+    print(f"🔍 {name} int8 vs fp32: 加速 {comparison['speedup']:.2f}x，權重 {comparison['param_ratio']:.2f}x，"
+          f"峰值記憶體 {comparison['peak_rss_ratio']:.2f}x"
+          + (f"，WER 變化 {delta:+.1%}" if delta is not None else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fp32 與 int8 動態量化的速度與品質比較")
+    parser.add_argument("--audio", help="測試語音（未指定時以 XTTS 合成範例文本）")
+    parser.add_argument("--reference", help="測試語音的參考文本檔案（未指定時以 fp32 轉錄結果為參考）")
+    parser.add_argument("--language", default="en", help="測試語音的語言")
+    parser.add_argument("--model-size", default="tiny", help="Whisper 模型大小")
+    parser.add_argument("--xtts-dir", default="XTTS-v2", help="XTTS-v2 模型目錄（存在時比較合成）")
+    parser.add_argument("--speaker-wav", help="XTTS 參考語音（未指定時使用 --audio）")
+    parser.add_argument("--repeat", type=int, default=2, help="每個變體重複次數（取最快的一次）")
+    parser.add_argument("--json", help="將結果寫入 JSON 檔案")
+    options = parser.parse_args()
+
+    has_xtts = os.path.exists(os.path.join(options.xtts_dir, "config.json"))
+    if not options.audio and not has_xtts:
+        parser.error("需要 --audio，或可用的 XTTS-v2 目錄以合成測試語音")
+
+    temp_dir = tempfile.mkdtemp()
+    report = {"model_size": options.model_size, "whisper": {}, "xtts": {}}
+    try:
+        reference = None
+        if options.reference:
+            with open(options.reference, encoding="utf-8") as f:
+                reference = f.read()
+        speaker_wav = options.speaker_wav or options.audio
+
+        if has_xtts:
+            if not speaker_wav:
+                parser.error("未指定 --audio 時需要 --speaker-wav 作為 XTTS 參考語音")
+            for name, quantize in (("fp32", False), ("int8", True)):
+                print(f"🔄 XTTS {name} 合成中...")
+                output_path = os.path.join(temp_dir, f"xtts_{name}.wav")
+                report["xtts"][name] = run_isolated(_xtts_main, options, speaker_wav, output_path, quantize)
+
+        audio_path = options.audio
+        if not audio_path:
+            if report["xtts"]["fp32"]["status"] != "ok":
+                print(f"❌ 無法合成測試語音: {report['xtts']['fp32']['reason']}")
+                sys.exit(1)
+            audio_path, reference, options.language = report["xtts"]["fp32"]["output"], SAMPLE_TEXT, "en"
+
+        for name, quantize in (("fp32", False), ("int8", True)):
+            print(f"🔄 Whisper {name} 轉錄中...")
+            report["whisper"][name] = run_isolated(_whisper_main, options, audio_path, quantize)
+        fp32 = report["whisper"]["fp32"]
+        if reference is None and fp32["status"] == "ok":
+            reference = fp32["text"]
+        for result in report["whisper"].values():
+            if result["status"] == "ok" and reference is not None:
+                result["wer"] = word_error_rate(reference, result["text"])
+        for name in ("fp32", "int8"):
+            print_variant(f"Whisper {options.model_size} {name}", report["whisper"][name], "wer")
+        report["whisper"]["comparison"] = compare_variants(report["whisper"]["fp32"], report["whisper"]["int8"], "wer")
+        print_comparison("Whisper", report["whisper"]["comparison"])
+
+        # 以 fp32 Whisper 轉錄合成語音，評估 int8 XTTS 的可懂度變化
+        if report["xtts"]:
+            transcribe_options = argparse.Namespace(**{**vars(options), "language": "en", "repeat": 1})
+            for name in ("fp32", "int8"):
+                result = report["xtts"][name]
+                if result["status"] != "ok":
+                    continue
+                transcript = run_isolated(_whisper_main, transcribe_options, result["output"], False)
+                if transcript["status"] == "ok":
+                    result["wer"] = word_error_rate(SAMPLE_TEXT, transcript["text"])
+                else:
+                    result["status"], result["reason"] = "skipped", transcript["reason"]
+            for name in ("fp32", "int8"):
+                print_variant(f"XTTS {name}", report["xtts"][name], "wer")
+            report["xtts"]["comparison"] = compare_variants(report["xtts"]["fp32"], report["xtts"]["int8"], "wer")
+            print_comparison("XTTS", report["xtts"]["comparison"])
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
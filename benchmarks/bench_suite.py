@@ -0,0 +1,391 @@
+"""離線基準測試套件：以合成的測試素材測量各階段的吞吐量與峰值記憶體
+
+用法:
+    python benchmarks/bench_suite.py --json results.json
+    python benchmarks/bench_suite.py --stages transcription synthesis --duration 120
+    python benchmarks/bench_suite.py --json new.json --compare baseline.json
+測試素材（含語音節奏的合成音、雜訊、ffmpeg 測試圖樣視頻）每次執行時自動產生。
+缺少模型權重時（Whisper 權重未下載、XTTS-v2 目錄不存在、未安裝 Argos 語言包）改用確定性的替代實作，
+因此可在無網路、只有 CPU 的機器上執行；結果中的 backend 欄位標示實際使用的實作。
+每個階段在獨立的進程中執行，峰值記憶體互不影響。
+"""
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import multiprocessing as mproc
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+SAMPLE_TEXT = (
+    "Hello everyone, welcome to today's lecture. We will talk about how speech translation works. "
+    "First, the audio is transcribed into text. Then the text is translated into another language. "
+    "Finally, a new voice is synthesized from the translated text. "
+)
+
+MB = 1024 ** 2
+
+
+# ---------- 測試素材 ----------
+
+def write_wav(path, wav, sample_rate):
+    """將 [-1, 1] 的浮點波形寫入 16 位元單聲道 WAV"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(wav, -1.0, 1.0) * 32767.0).astype("<i2").tobytes())
+
+
+def synthetic_speech(duration, sample_rate, seed=0):
+    """產生具有語音節奏的合成音：諧波音以約 4Hz 的音節包絡調變，每 2.5 秒後停頓 0.8 秒，並加入微弱雜訊"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sample_rate)) / sample_rate
+    pitch = 150 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * 4 * t)) ** 2
+    voiced = (t % 3.3) < 2.5
+    wav = 0.25 * voice * syllables * voiced + 0.005 * rng.standard_normal(t.size)
+    return wav.astype(np.float32)
+
+
+def make_fixtures(temp_dir, duration):
+    """產生測試素材，回傳 {名稱: 路徑}"""
+    fixtures = {
+        "speech_wav": os.path.join(temp_dir, "speech.wav"),
+        "noise_wav": os.path.join(temp_dir, "noise.wav"),
+        "speaker_wav": os.path.join(temp_dir, "speaker.wav"),
+        "dubbed_wav": os.path.join(temp_dir, "dubbed.wav"),
+        "video": os.path.join(temp_dir, "video.mp4"),
+    }
+    write_wav(fixtures["speech_wav"], synthetic_speech(duration, 16000), 16000)
+    write_wav(fixtures["noise_wav"], 0.1 * np.random.default_rng(1).standard_normal(int(duration * 16000)), 16000)
+    write_wav(fixtures["speaker_wav"], synthetic_speech(8, 24000, seed=2), 24000)
+    write_wav(fixtures["dubbed_wav"], synthetic_speech(duration * 0.9, 24000, seed=3), 24000)
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=25:duration={duration}",
+        "-i", fixtures["speech_wav"],
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest",
+        fixtures["video"]
+    ], check=True)
+    return fixtures
+
+
+# ---------- 確定性的替代模型 ----------
+
+class StubTranscriber:
+    """以能量偵測切出有聲片段，回傳與 Whisper 相同結構的結果（text 與 segments）"""
+
+    def transcribe(self, audio, **kwargs):
+        frame = 1600  # 0.1 秒
+        frames = audio[:len(audio) // frame * frame].reshape(-1, frame)
+        voiced = np.sqrt((frames ** 2).mean(axis=1)) > 0.02
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+        words = SAMPLE_TEXT.split()
+        segments = []
+        for i, (start, end) in enumerate(zip(edges[::2], edges[1::2])):
+            text = " ".join(words[(i * 8) % len(words):(i * 8) % len(words) + 8])
+            segments.append({"id": i, "start": start * 0.1, "end": end * 0.1, "text": f" {text}"})
+        return {"text": "".join(s["text"] for s in segments).strip(), "segments": segments, "language": "en"}
+
+
+class StubTranslator:
+    """確定性的翻譯替代實作：反轉每句的單字順序"""
+
+    def translate_many(self, texts, source_lang, target_lang, log=print):
+        return [" ".join(reversed(text.split())) for text in texts]
+
+
+class StubSynthesizer:
+    """依文字長度產生合成音（每字元約 60 毫秒）"""
+
+    sample_rate = 24000
+
+    def synthesize(self, text):
+        return synthetic_speech(max(1.0, len(text) * 0.06), self.sample_rate, seed=len(text))
+
+
+# ---------- 各階段 ----------
+# 每個階段函式完成準備工作（載入模型等）後回傳 {"backend", "unit", "run"}，
+# run() 執行一次被測量的工作並回傳處理量。
+
+def bench_extraction(fixtures, options):
+    from audio_io import decode_audio, WHISPER_SAMPLE_RATE
+
+    def run():
+        return len(decode_audio(fixtures["video"])) / WHISPER_SAMPLE_RATE
+    return {"backend": "ffmpeg", "unit": "音訊秒/秒", "run": run}
+
+
+def bench_transcription(fixtures, options):
+    from audio_io import decode_audio, WHISPER_SAMPLE_RATE
+    audio = decode_audio(fixtures["speech_wav"])
+
+    backend, model = "stub", StubTranscriber()
+    try:
+        import whisper
+        cache_root = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "whisper")
+        if os.path.exists(os.path.join(cache_root, f"{options.model_size}.pt")):
+            backend, model = f"whisper-{options.model_size}", whisper.load_model(options.model_size, device="cpu")
+    except ImportError:
+        pass
+
+    def run():
+        model.transcribe(audio, language="en")
+        return len(audio) / WHISPER_SAMPLE_RATE
+    return {"backend": backend, "unit": "音訊秒/秒", "run": run}
+
+
+def bench_translation(fixtures, options):
+    from sentence_split import split_sentences
+    sentences = split_sentences(SAMPLE_TEXT * options.text_repeat)
+
+    backend, translator = "stub", StubTranslator()
+    try:
+        import argostranslate.package
+        from translation_engine import TranslationEngine
+        if any(pkg.from_code == "en" and pkg.to_code == options.target_lang
+               for pkg in argostranslate.package.get_installed_packages()):
+            backend, translator = f"argos-en-{options.target_lang}", TranslationEngine(local_package_dir=None)
+    except ImportError:
+        pass
+    # 預熱：載入語言包與模型
+    translator.translate_many(sentences[:1], "en", options.target_lang, log=lambda message: None)
+
+    def run():
+        translator.translate_many(sentences, "en", options.target_lang, log=lambda message: None)
+        return sum(len(s) for s in sentences)
+    return {"backend": backend, "unit": "字元/秒", "run": run}
+
+
+def bench_synthesis(fixtures, options):
+    text = SAMPLE_TEXT
+    output_path = os.path.join(os.path.dirname(fixtures["video"]), "synthesis_out.wav")
+
+    if os.path.exists(os.path.join(options.xtts_dir, "config.json")):
+        import torch
+        from model_registry import xtts_registry
+        from speaker_cache import SpeakerLatentCache, synthesize_with_cache, xtts_model_tag
+        model, config = xtts_registry.get(options.xtts_dir, torch.device("cpu"), log=lambda message: None)
+        cache = SpeakerLatentCache(disk_dir=os.path.dirname(output_path))
+        # 與流程相同的快取鍵（檢查點目錄與量化狀態）
+        model_tag = xtts_model_tag(options.xtts_dir, False)
+        cache.get(model, config, fixtures["speaker_wav"], model_tag=model_tag, log=lambda message: None)
+
+        def run():
+            outputs = synthesize_with_cache(model, config, text, "en", fixtures["speaker_wav"], cache,
+                                            model_tag=model_tag, log=lambda message: None)
+            sample_rate = outputs.get("sample_rate", 24000)
+            write_wav(output_path, np.asarray(outputs["wav"], dtype=np.float32), sample_rate)
+            return len(outputs["wav"]) / sample_rate
+        return {"backend": "xtts-v2", "unit": "輸出音訊秒/秒", "run": run}
+
+    synthesizer = StubSynthesizer()
+
+    def run():
+        wav = synthesizer.synthesize(text)
+        write_wav(output_path, wav, synthesizer.sample_rate)
+        return len(wav) / synthesizer.sample_rate
+    return {"backend": "stub", "unit": "輸出音訊秒/秒", "run": run}
+
+
+def bench_muxing(fixtures, options):
+    from muxer import mux_audio, probe_duration
+    output_path = os.path.join(os.path.dirname(fixtures["video"]), "mux_out.mp4")
+    duration = probe_duration(fixtures["dubbed_wav"])
+
+    def run():
+        mux_audio(fixtures["video"], fixtures["dubbed_wav"], output_path, log=lambda message: None)
+        return duration
+    return {"backend": "ffmpeg", "unit": "視頻秒/秒", "run": run}
+
+
+def bench_convert_audio(fixtures, options):
+    from pipeline import convert_audio_format
+    output_path = os.path.join(os.path.dirname(fixtures["video"]), "convert_out.mp3")
+
+    def run():
+        convert_audio_format(fixtures["dubbed_wav"], output_path, log=lambda message: None)
+        return options.duration * 0.9
+    return {"backend": "pydub", "unit": "音訊秒/秒", "run": run}
+
+
+def bench_convert_video(fixtures, options):
+    from pipeline import convert_video_format
+    output_path = os.path.join(os.path.dirname(fixtures["video"]), "convert_out.mkv")
+
+    def run():
+        convert_video_format(fixtures["video"], output_path, log=lambda message: None)
+        return options.duration
+    return {"backend": "moviepy", "unit": "視頻秒/秒", "run": run}
+
+
+STAGES = {
+    "extraction": bench_extraction,
+    "transcription": bench_transcription,
+    "translation": bench_translation,
+    "synthesis": bench_synthesis,
+    "muxing": bench_muxing,
+    "convert_audio": bench_convert_audio,
+    "convert_video": bench_convert_video,
+}
+
+
+# ---------- 執行與比較 ----------
+
+def peak_rss_bytes():
+    """目前進程的峰值常駐記憶體（Linux 的 ru_maxrss 單位為 KB，macOS 為位元組）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _stage_main(stage, fixtures, options, conn):
+    """在獨立進程中執行單一階段並回傳結果"""
+    try:
+        start = time.perf_counter()
+        bench = STAGES[stage](fixtures, options)
+        setup_seconds = time.perf_counter() - start
+        setup_peak = peak_rss_bytes()
+
+        best_seconds, amount = None, 0
+        for _ in range(options.repeat):
+            start = time.perf_counter()
+            amount = bench["run"]()
+            elapsed = time.perf_counter() - start
+            best_seconds = elapsed if best_seconds is None else min(best_seconds, elapsed)
+        peak = peak_rss_bytes()
+
+        conn.send({
+            "status": "ok",
+            "backend": bench["backend"],
+            "unit": bench["unit"],
+            "setup_seconds": setup_seconds,
+            "seconds": best_seconds,
+            "amount": amount,
+            "throughput": amount / best_seconds if best_seconds else None,
+            "peak_rss_mb": peak / MB,
+            "setup_peak_rss_mb": setup_peak / MB,
+            "stage_peak_delta_mb": (peak - setup_peak) / MB,
+        })
+    except Exception as e:
+        conn.send({"status": "skipped", "reason": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_stage(stage, fixtures, options):
+    context = mproc.get_context("spawn")
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_stage_main, args=(stage, fixtures, options, child_conn))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = {"status": "failed", "reason": f"進程異常結束 (exit code {process.exitcode})"}
+    process.join()
+    return result
+
+
+def compare(current, baseline, tolerance):
+    """與基準結果比較，回傳退步項目列表（吞吐量下降或峰值記憶體增加超過容許比例）"""
+    regressions = []
+    for stage, result in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or result["status"] != "ok" or base.get("status") != "ok":
+            continue
+        if result["backend"] != base["backend"]:
+            print(f"   {stage}: 實作不同 ({base['backend']} → {result['backend']})，略過比較")
+            continue
+        speed = result["throughput"] / base["throughput"]
+        memory = result["peak_rss_mb"] / base["peak_rss_mb"]
+        print(f"   {stage}: 吞吐量 {speed:.2f}x, 峰值記憶體 {memory:.2f}x")
+        if speed < 1 - tolerance:
+            regressions.append(f"{stage} 吞吐量下降至 {speed:.0%}")
+        if memory > 1 + tolerance:
+            regressions.append(f"{stage} 峰值記憶體增加至 {memory:.0%}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="離線各階段基準測試")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES), help="要測量的階段")
+    parser.add_argument("--duration", type=float, default=60.0, help="測試音訊/視頻長度（秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="每個階段重複次數（取最快的一次）")
+    parser.add_argument("--model-size", default="tiny", help="Whisper 模型大小（權重已下載時使用）")
+    parser.add_argument("--xtts-dir", default="XTTS-v2", help="XTTS-v2 模型目錄（存在時使用）")
+    parser.add_argument("--target-lang", default="ja", help="翻譯目標語言（已安裝 en 到該語言的語言包時使用）")
+    parser.add_argument("--text-repeat", type=int, default=50, help="翻譯範例文本重複次數")
+    parser.add_argument("--json", help="將結果寫入 JSON 檔案")
+    parser.add_argument("--compare", help="與先前的 JSON 結果比較")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="比較時容許的退步比例")
+    options = parser.parse_args()
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print("🔄 正在產生測試素材...")
+        fixtures = make_fixtures(temp_dir, options.duration)
+        report = {
+            "meta": {
+                "date": datetime.now().isoformat(timespec="seconds"),
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "duration": options.duration,
+                "repeat": options.repeat,
+            },
+            "stages": {},
+        }
+        for stage in options.stages:
+            result = run_stage(stage, fixtures, options)
+            report["stages"][stage] = result
+            if result["status"] == "ok":
+                print(f"📊 {stage} [{result['backend']}]: {result['throughput']:.2f} {result['unit']}，"
+                      f"耗時 {result['seconds']:.2f} 秒（準備 {result['setup_seconds']:.2f} 秒），"
+                      f"峰值記憶體 {result['peak_rss_mb']:.0f} MB")
+            else:
+                print(f"⚠️ {stage} 未執行: {result['reason']}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"🔍 與 {options.compare} 比較:")
+        regressions = compare(report, baseline, options.tolerance)
+        for item in regressions:
+            print(f"❌ {item}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""各轉錄引擎與模型大小的即時率 (RTF) 比較
+
+用法:
+    python benchmarks/bench_transcription.py --audio lecture.wav --reference lecture.txt
+    python benchmarks/bench_transcription.py --backends whisper faster-whisper --sizes tiny base small --json rtf.json
+未提供 --audio 時使用具語音節奏的合成音（只比較速度；有 --reference 時另外計算 WER）。
+RTF = 轉錄耗時 / 音訊長度，越小越快。每個 (引擎, 模型大小) 在獨立的進程中執行，
+未安裝的引擎或未下載的模型會標示為未執行。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_suite import MB, synthetic_speech, write_wav, peak_rss_bytes  # noqa: E402
+from bench_quantization import run_isolated, word_error_rate  # noqa: E402
+from transcription_backends import TRANSCRIPTION_BACKENDS  # noqa: E402
+
+
+def _transcribe_main(backend, model_size, options, audio_path, conn):
+    """在獨立進程中載入引擎並轉錄，回傳耗時與轉錄文字"""
+    try:
+        import torch
+        from audio_io import decode_audio, WHISPER_SAMPLE_RATE
+        from model_registry import whisper_registry
+        audio = decode_audio(audio_path)
+        threads = options.threads or os.cpu_count() or 1
+        torch.set_num_threads(threads)
+
+        start = time.perf_counter()
+        engine = whisper_registry.get(model_size, torch.device("cpu"), log=lambda message: None,
+                                      backend=backend, threads=threads)
+        setup_seconds = time.perf_counter() - start
+
+        best_seconds, text = None, ""
+        for _ in range(options.repeat):
+            start = time.perf_counter()
+            text = engine.transcribe(audio, language=options.language)["text"]
+            elapsed = time.perf_counter() - start
+            best_seconds = elapsed if best_seconds is None else min(best_seconds, elapsed)
+        conn.send({
+            "status": "ok",
+            "setup_seconds": setup_seconds,
+            "seconds": best_seconds,
+            "rtf": best_seconds / (len(audio) / WHISPER_SAMPLE_RATE),
+            "peak_rss_mb": peak_rss_bytes() / MB,
+            "text": text.strip(),
+        })
+    except Exception as e:
+        conn.send({"status": "skipped", "reason": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="轉錄引擎即時率比較")
+    parser.add_argument("--audio", help="測試語音（未指定時使用合成音）")
+    parser.add_argument("--reference", help="測試語音的參考文本檔案（指定時計算 WER）")
+    parser.add_argument("--language", default="en", help="測試語音的語言")
+    parser.add_argument("--duration", type=float, default=60.0, help="合成音長度（秒）")
+    parser.add_argument("--backends", nargs="+", choices=list(TRANSCRIPTION_BACKENDS),
+                        default=list(TRANSCRIPTION_BACKENDS), help="要比較的引擎")
+    parser.add_argument("--sizes", nargs="+", default=["tiny", "base"], help="要比較的模型大小")
+    parser.add_argument("--threads", type=int, default=0, help="計算線程數（0 表示全部核心）")
+    parser.add_argument("--repeat", type=int, default=2, help="每個組合重複次數（取最快的一次）")
+    parser.add_argument("--json", help="將結果寫入 JSON 檔案")
+    options = parser.parse_args()
+
+    reference = None
+    if options.reference:
+        with open(options.reference, encoding="utf-8") as f:
+            reference = f.read()
+
+    temp_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        audio_path = options.audio
+        if not audio_path:
+            audio_path = os.path.join(temp_dir, "speech.wav")
+            write_wav(audio_path, synthetic_speech(options.duration, 16000), 16000)
+
+        for model_size in options.sizes:
+            for backend in options.backends:
+                print(f"🔄 {backend} {model_size} 轉錄中...")
+                result = run_isolated(_transcribe_main, backend, model_size, options, audio_path)
+                result.update({"backend": backend, "model_size": model_size})
+                if result["status"] == "ok" and reference is not None:
+                    result["wer"] = word_error_rate(reference, result["text"])
+                results.append(result)
+                if result["status"] == "ok":
+                    wer = f"，WER {result['wer']:.1%}" if "wer" in result else ""
+                    print(f"📊 {backend} {model_size}: RTF {result['rtf']:.3f}，耗時 {result['seconds']:.2f} 秒"
+                          f"（載入 {result['setup_seconds']:.2f} 秒），峰值記憶體 {result['peak_rss_mb']:.0f} MB{wer}")
+                else:
+                    print(f"⚠️ {backend} {model_size} 未執行: {result['reason']}")
+
+        # 以 openai-whisper 為基準列出各引擎的加速比
+        for model_size in options.sizes:
+            rows = {r["backend"]: r for r in results if r["model_size"] == model_size and r["status"] == "ok"}
+            base = rows.get("whisper")
+            for backend, row in rows.items():
+                if base and backend != "whisper":
+                    print(f"🔍 {model_size}: {backend} 相對 whisper 加速 {base['seconds'] / row['seconds']:.2f}x")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump({"language": options.language, "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""比較整段翻譯與分句批次翻譯的速度 (字元/秒)
+
+用法:
+    python benchmarks/bench_translation.py --from en --to ja --input transcript.txt
+    python benchmarks/bench_translation.py --from en --to ja --repeat 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation_engine import TranslationEngine  # noqa: E402
+from sentence_split import split_sentences  # noqa: E402
+
+
+SAMPLE_TEXT = {
+    "en": "Hello everyone, welcome to today's lecture. We will talk about how speech translation works. "
+          "First, the audio is transcribed into text. Then the text is translated into another language. "
+          "Finally, a new voice is synthesized from the translated text. ",
+    "zh": "大家好，歡迎來到今天的課程。我們將討論語音翻譯的運作方式。首先，音訊會被轉錄成文字。"
+          "接著，文字會被翻譯成另一種語言。最後，根據翻譯後的文字合成新的語音。",
+    "ja": "皆さん、こんにちは。今日の講義へようこそ。音声翻訳の仕組みについてお話しします。",
+}
+
+
+def run(engine, text, source_lang, target_lang):
+    """分別測量整段翻譯與分句批次翻譯的耗時"""
+    sentences = split_sentences(text)
+
+    # 預熱：載入語言包與模型，避免計入第一次載入時間
+    engine.translate(sentences[0], source_lang, target_lang)
+    engine.translate_many(sentences[:1], source_lang, target_lang)
+
+    start = time.perf_counter()
+    engine.translate(text, source_lang, target_lang)
+    whole_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.translate_many(sentences, source_lang, target_lang)
+    batched_seconds = time.perf_counter() - start
+
+    chars = len(text)
+    return {
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "chars": chars,
+        "sentences": len(sentences),
+        "whole_string": {"seconds": whole_seconds, "chars_per_second": chars / whole_seconds},
+        "batched": {"seconds": batched_seconds, "chars_per_second": chars / batched_seconds},
+        "speedup": whole_seconds / batched_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻譯速度基準測試")
+    parser.add_argument("--from", dest="source_lang", default="en")
+    parser.add_argument("--to", dest="target_lang", default="ja")
+    parser.add_argument("--input", help="要翻譯的文本檔案，未提供時使用內建範例")
+    parser.add_argument("--repeat", type=int, default=100, help="內建範例重複次數")
+    parser.add_argument("--json", help="將結果寫入 JSON 檔案")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = SAMPLE_TEXT.get(args.source_lang, SAMPLE_TEXT["en"]) * args.repeat
+
+    result = run(TranslationEngine(), text, args.source_lang, args.target_lang)
+    print(f"📊 {result['chars']} 字元, {result['sentences']} 句")
+    print(f"   整段翻譯: {result['whole_string']['chars_per_second']:.1f} 字元/秒")
+    print(f"   分句批次: {result['batched']['chars_per_second']:.1f} 字元/秒")
+    print(f"   加速倍數: {result['speedup']:.2f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+import hashlib
+import threading
+
+
+# 快取根目錄（可用環境變數 DTV_CACHE_DIR 覆寫）
+CACHE_ROOT = os.environ.get(
+    "DTV_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "deep-translation-video")
+)
+
+# 檔案雜湊記憶 (路徑, 修改時間, 大小) -> sha256，避免重複讀取同一個檔案
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def cache_dir(name):
+    """取得（並建立）指定名稱的快取子目錄"""
+    path = os.path.join(CACHE_ROOT, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """計算檔案內容的 sha256，同一檔案未變更時直接使用記憶結果"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _hash_lock:
+        digest = _hash_memo.get(memo_key)
+    if digest is not None:
+        return digest
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _hash_lock:
+        _hash_memo[memo_key] = digest
+    return digest
+
+
+def json_default(value):
+    """json.dump 的 default：將 NumPy 數值等無法直接序列化的物件轉為 Python 型別"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"無法序列化 {type(value).__name__}")
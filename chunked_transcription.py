@@ -0,0 +1,213 @@
+import os
+import queue
+import unicodedata
+import multiprocessing as mproc
+from multiprocessing import shared_memory
+import numpy as np
+from vad import frame_energy_db, VAD_FRAME_MS
+
+
+# 長音訊模式：每個區塊的目標長度、在目標切點前後尋找靜音的範圍，以及區塊前後重疊的長度（秒）
+CHUNK_SECONDS = 300
+CHUNK_SEARCH_SECONDS = 30
+CHUNK_OVERLAP_SECONDS = 2.0
+
+# 音訊長於此長度（秒）才使用多進程分塊轉錄
+LONG_AUDIO_SECONDS = 600
+
+
+def plan_chunks(audio, sample_rate, chunk_seconds=CHUNK_SECONDS, search_seconds=CHUNK_SEARCH_SECONDS):
+    """在靜音處切分音訊，回傳各區塊負責的範圍 [(起點樣本, 終點樣本), ...]
+
+    切點取目標位置前後 search_seconds 內能量最低（以約 0.3 秒平滑）的位置；最後一塊過短時併入前一塊。
+    """
+    total = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    if total <= chunk * 1.5:
+        return [(0, total)]
+    frame = int(sample_rate * VAD_FRAME_MS / 1000)
+    energy = frame_energy_db(audio, frame)
+    window = max(1, int(300 / VAD_FRAME_MS))
+    energy = np.convolve(energy, np.ones(window) / window, mode="same")
+    search = int(search_seconds * sample_rate)
+
+    cuts = [0]
+    while total - cuts[-1] > chunk * 1.5:
+        target = cuts[-1] + chunk
+        low = max(cuts[-1] + chunk // 2, target - search) // frame
+        high = min(total - chunk // 2, target + search) // frame
+        if high <= low:
+            cut = target
+        else:
+            cut = (low + int(np.argmin(energy[low:high]))) * frame + frame // 2
+        cuts.append(cut)
+    cuts.append(total)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _normalize(text):
+    return "".join(unicodedata.normalize("NFKC", text).split()).lower()
+
+
+def merge_chunk_segments(chunks):
+    """合併各區塊的 segments（時間戳已對回原始時間軸）
+
+    chunks 為 [(負責範圍起點秒, 終點秒, segments), ...]。區塊前後的重疊部分會被相鄰區塊重複轉錄，
+    只保留中點落在該區塊負責範圍內的 segment；邊界兩側仍重複的相同文字也只保留一次。
+    """
+    merged = []
+    for own_start, own_end, segments in chunks:
+        for segment in segments:
+            middle = (segment["start"] + segment["end"]) / 2
+            if not own_start <= middle < own_end:
+                continue
+            if merged and _normalize(merged[-1]["text"]) == _normalize(segment["text"]) \
+                    and segment["start"] < merged[-1]["end"]:
+                continue
+            merged.append(segment)
+    for index, segment in enumerate(merged):
+        segment["id"] = index
+    return merged
+
+
+def _shift_segments(segments, offset):
+    """將 segments 與逐字時間戳平移 offset 秒"""
+    shifted = []
+    for segment in segments:
+        segment = dict(segment, start=segment["start"] + offset, end=segment["end"] + offset)
+        if segment.get("words"):
+            segment["words"] = [dict(word, start=word["start"] + offset, end=word["end"] + offset)
+                                for word in segment["words"]]
+        shifted.append(segment)
+    return shifted
+
+
+def _chunk_worker(options, shm_name, length, task_queue, result_queue, cores_queue):
+    """工作進程：載入自己的轉錄模型，從共享記憶體讀取負責的區塊並轉錄"""
+    import torch
+    from model_registry import whisper_registry
+
+    cores = cores_queue.get()
+    if options["pin_cores"] and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(cores))
+    torch.set_num_threads(len(cores))
+    pid = os.getpid()
+
+    def log(message):
+        result_queue.put(("log", pid, message))
+
+    try:
+        engine = whisper_registry.get(options["model_size"], torch.device(options["device"]), log=log,
+                                      quantize=options["quantize"], backend=options["backend"], threads=len(cores))
+    except Exception as e:
+        result_queue.put(("error", pid, f"{type(e).__name__}: {e}"))
+        return
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        audio = np.ndarray((length,), dtype=np.float32, buffer=shm.buf)
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            index, start, end = task
+            try:
+                result = engine.transcribe(np.array(audio[start:end]), language=options["language"],
+                                           prompt=options["prompt"])
+                segments = _shift_segments(result.get("segments") or [], start / options["sample_rate"])
+                result_queue.put(("done", pid, (index, segments, result.get("language"))))
+            except Exception as e:
+                result_queue.put(("failed", pid, (index, f"{type(e).__name__}: {e}")))
+        del audio
+    finally:
+        shm.close()
+
+
+class ChunkedTranscriber:
+    """長音訊的多進程分塊轉錄：在靜音處切分，每個工作進程各自載入模型並行轉錄，最後合併 segments
+
+    工作進程以 spawn 啟動（父進程可能已使用過 torch 的線程池，fork 後可能卡住），
+    音訊放在共享記憶體中，各進程只複製自己負責的區塊。
+    """
+
+    def __init__(self, processes, core_slices, model_size, device="cpu", quantize=False, backend="whisper",
+                 pin_cores=False, log=print):
+        self.processes = max(1, processes)
+        self.core_slices = core_slices
+        self.options = {
+            "model_size": model_size,
+            "device": str(device),
+            "quantize": quantize,
+            "backend": backend,
+            "pin_cores": pin_cores,
+        }
+        self.log = log
+
+    def transcribe(self, audio, sample_rate, language=None, prompt=None):
+        """轉錄 16kHz float32 音訊，回傳與轉錄引擎相同格式的 {"text", "segments", "language"}"""
+        chunks = plan_chunks(audio, sample_rate)
+        overlap = int(CHUNK_OVERLAP_SECONDS * sample_rate)
+        processes = min(self.processes, len(chunks))
+        options = dict(self.options, language=language, prompt=prompt, sample_rate=sample_rate)
+        self.log(f"🧩 長音訊分為 {len(chunks)} 個區塊，以 {processes} 個進程並行轉錄")
+
+        context = mproc.get_context("spawn")
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, audio.nbytes))
+        try:
+            np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+            task_queue = context.Queue()
+            result_queue = context.Queue()
+            cores_queue = context.Queue()
+            for index, (start, end) in enumerate(chunks):
+                task_queue.put((index, max(0, start - overlap), min(len(audio), end + overlap)))
+            for cores in self.core_slices[:processes]:
+                task_queue.put(None)
+                cores_queue.put(cores)
+
+            workers = [
+                context.Process(
+                    target=_chunk_worker,
+                    args=(options, shm.name, len(audio), task_queue, result_queue, cores_queue),
+                    daemon=True
+                )
+                for _ in range(processes)
+            ]
+            for worker in workers:
+                worker.start()
+
+            results, language = {}, language
+            try:
+                while len(results) < len(chunks):
+                    try:
+                        kind, pid, payload = result_queue.get(timeout=1.0)
+                    except queue.Empty:
+                        if not any(worker.is_alive() for worker in workers):
+                            raise RuntimeError("分塊轉錄的工作進程已全部結束，部分區塊未完成")
+                        continue
+                    if kind == "log":
+                        self.log(f"[{pid}] {payload}")
+                    elif kind == "error":
+                        raise RuntimeError(f"工作進程無法載入轉錄模型: {payload}")
+                    elif kind == "failed":
+                        index, error = payload
+                        raise RuntimeError(f"區塊 {index + 1} 轉錄失敗: {error}")
+                    elif kind == "done":
+                        index, segments, detected = payload
+                        results[index] = segments
+                        language = language or detected
+                        self.log(f"✅ 區塊 {len(results)}/{len(chunks)} 轉錄完成")
+            finally:
+                for worker in workers:
+                    worker.join(timeout=5)
+                    if worker.is_alive():
+                        worker.terminate()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        segments = merge_chunk_segments([
+            (start / sample_rate, end / sample_rate if index < len(chunks) - 1 else float("inf"), results[index])
+            for index, (start, end) in enumerate(chunks)
+        ])
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments, "language": language}
@@ -0,0 +1,173 @@
+"""Deep-Translation-Video 命令列入口（不需要圖形介面）
+
+用法:
+    python dtv.py run input.mp4 --to ja --format mp4
+    python dtv.py run audio_files/ --from zh --via en --to ja --format mp3 --output-dir out/
+"""
+import os
+import ssl
+import sys
+import argparse
+import warnings
+from pipeline import (
+    TranslationPipeline, PipelineConfig, LANGUAGE_PROMPTS, LANGUAGE_CODES, AUDIO_FORMATS,
+    VIDEO_FORMATS, PIPELINE_STAGES, SYNTHESIS_MODES, ROUTE_MODES, list_media_files
+)
+from model_registry import MODEL_SIZES, RESIDENCY_POLICIES
+from transcription_backends import TRANSCRIPTION_BACKENDS
+from chunked_transcription import LONG_AUDIO_SECONDS
+
+
+# 禁用警告並設置SSL上下文
+warnings.filterwarnings("ignore")
+ssl._create_default_https_context = ssl._create_unverified_context
+
+
+def build_config(args):
+    """由命令列參數建立流程設定"""
+    output_format = args.format.upper()
+    output_type = "VIDEO" if output_format in VIDEO_FORMATS else "AUDIO"
+    return PipelineConfig(
+        model_size=args.model_size,
+        lang_mode=args.lang_mode,
+        from_lang=args.from_lang,
+        to_lang=args.via_lang,
+        final_lang=args.to_lang,
+        output_type=output_type,
+        output_format=output_format,
+        speaker_wav=args.speaker,
+        xtts_dir=args.xtts_dir,
+        device=args.device,
+        stage_workers=parse_stage_workers(args.workers),
+        stage_queue_size=args.queue_size,
+        stage_threads=parse_stage_workers(args.threads, option="--threads"),
+        pin_cores=args.pin_cores,
+        processes=args.processes,
+        synthesis_mode=args.synthesis_mode,
+        route_mode=args.route,
+        resume=not args.no_resume,
+        trace_path=args.trace,
+        model_residency=args.residency,
+        model_idle_timeout=args.idle_timeout,
+        trace_allocations=args.tracemalloc,
+        use_cache=not args.no_cache,
+        quantize=args.int8,
+        transcription_backend=args.backend,
+        vad=args.vad,
+        transcribe_processes=args.transcribe_processes,
+        long_audio_seconds=args.long_audio
+    )
+
+
+def parse_stage_workers(values, option="--workers"):
+    """解析 --workers / --threads 的 stage=N 參數"""
+    stage_workers = {}
+    for value in values or []:
+        stage, _, count = value.partition("=")
+        if stage not in PIPELINE_STAGES or not count.isdigit() or int(count) < 1:
+            raise SystemExit(f"❌ 無效的 {option} 參數: {value}（格式為 stage=N，stage 為 {', '.join(PIPELINE_STAGES)}）")
+        stage_workers[stage] = int(count)
+    return stage_workers
+
+
+def collect_inputs(paths):
+    """展開輸入路徑：資料夾會列出其中所有支援的媒體檔案"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(list_media_files(path))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"找不到輸入檔案: {path}")
+    return files
+
+
+def command_run(args):
+    """執行翻譯流程"""
+    config = build_config(args)
+    pipeline = TranslationPipeline(config)
+    files = collect_inputs(args.inputs)
+    if not files:
+        print("❌ 沒有可處理的媒體檔案")
+        return 1
+
+    # 單一檔案且指定輸出路徑時直接輸出，否則使用批次命名
+    if len(files) == 1 and args.output:
+        try:
+            result = pipeline.run(files[0], args.output)
+        finally:
+            pipeline.cleanup()
+        print(f"✅ 輸出檔案: {result.output_path}")
+        return 0
+
+    results, failures = pipeline.run_batch(files, args.output_dir)
+    print(f"🎉 處理完成！總共 {len(files)} 個檔案，成功 {len(results)} 個，失敗 {len(failures)} 個")
+    return 1 if failures else 0
+
+
+def build_parser():
+    lang_codes = sorted(set(LANGUAGE_CODES.values()))
+    formats = [f.lower() for f in list(AUDIO_FORMATS) + list(VIDEO_FORMATS)]
+
+    parser = argparse.ArgumentParser(prog="dtv", description="多語言媒體翻譯（轉錄 → 翻譯 → 語音合成）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="處理媒體檔案或資料夾")
+    run_parser.add_argument("inputs", nargs="+", help="輸入的音訊/視頻檔案或資料夾")
+    run_parser.add_argument("--from", dest="from_lang", default="zh", choices=lang_codes, help="源語言")
+    run_parser.add_argument("--via", dest="via_lang", default="en", choices=lang_codes, help="中間翻譯語言")
+    run_parser.add_argument("--to", dest="to_lang", default="ja", choices=lang_codes, help="最終翻譯語言")
+    run_parser.add_argument("--format", default="wav", choices=formats, help="輸出格式（視頻格式會輸出視頻）")
+    run_parser.add_argument("--model-size", default="tiny", choices=MODEL_SIZES, help="Whisper 模型大小")
+    run_parser.add_argument("--backend", default="whisper", choices=list(TRANSCRIPTION_BACKENDS),
+                            help="轉錄引擎：whisper (openai-whisper) 或 faster-whisper (CTranslate2 int8)")
+    run_parser.add_argument("--vad", action="store_true",
+                            help="偵測語音區段，只轉錄語音部分並以語音部分作為參考語音（適合含大量靜音的錄影）")
+    run_parser.add_argument("--transcribe-processes", type=int, default=1,
+                            help="長音訊分塊後並行轉錄的進程數（每個進程各自載入模型，1 表示不分塊）")
+    run_parser.add_argument("--long-audio", type=float, default=LONG_AUDIO_SECONDS,
+                            help="音訊長於此秒數時才分塊轉錄")
+    run_parser.add_argument("--lang-mode", default="zh-en", choices=list(LANGUAGE_PROMPTS.keys()), help="轉錄語言模式")
+    run_parser.add_argument("--speaker", help="參考語音檔案（預設使用輸入檔案本身的聲音）")
+    run_parser.add_argument("--xtts-dir", default="XTTS-v2", help="XTTS-v2 模型目錄")
+    run_parser.add_argument("--device", default="cpu", choices=["cpu"], help="處理裝置")
+    run_parser.add_argument("-o", "--output", help="輸出檔案路徑（僅限單一輸入檔案）")
+    run_parser.add_argument("--output-dir", default="output", help="批次輸出資料夾")
+    run_parser.add_argument("--workers", action="append", metavar="STAGE=N",
+                            help="批次模式各階段的工作線程數，例如 --workers extract=2 --workers mux=2")
+    run_parser.add_argument("--threads", action="append", metavar="STAGE=N",
+                            help="各階段的線程數（torch、CTranslate2、ffmpeg），例如 --threads transcribe=4；未指定時依核心數自動分配")
+    run_parser.add_argument("--pin-cores", action="store_true",
+                            help="將各階段（或各工作進程）綁定到互不重疊的 CPU 核心（Linux）")
+    run_parser.add_argument("--queue-size", type=int, default=2, help="批次模式階段之間的佇列長度")
+    run_parser.add_argument("--processes", type=int, default=1,
+                            help="批次模式的工作進程數（每個進程常駐各自的 Whisper/XTTS 模型）")
+    run_parser.add_argument("--synthesis-mode", default="full", choices=list(SYNTHESIS_MODES),
+                            help="語音合成模式：full 整段、sentence 逐句即時寫入、stream XTTS 串流推論")
+    run_parser.add_argument("--route", default="shortest", choices=list(ROUTE_MODES),
+                            help="翻譯路徑：shortest 取翻譯次數最少的路徑（可略過中間語言），pivot 固定經過 --via 語言")
+    run_parser.add_argument("--no-resume", action="store_true",
+                            help="不使用輸出資料夾中的批次記錄，所有檔案重新處理")
+    run_parser.add_argument("--trace", metavar="PATH",
+                            help="將各階段耗時輸出為 Chrome trace JSON（可用 chrome://tracing 或 Perfetto 開啟）")
+    run_parser.add_argument("--residency", default="auto", choices=list(RESIDENCY_POLICIES),
+                            help="模型常駐策略：auto 依實體記憶體決定、keep 同時常駐、swap 轉錄與合成之間互相卸載")
+    run_parser.add_argument("--idle-timeout", type=float, default=0,
+                            help="閒置超過此秒數的模型自動卸載（0 表示不卸載）")
+    run_parser.add_argument("--tracemalloc", action="store_true",
+                            help="記錄 Python 記憶體配置並列出配置最多的位置")
+    run_parser.add_argument("--no-cache", action="store_true", help="不使用轉錄快取與翻譯記憶，重新轉錄並翻譯所有檔案")
+    run_parser.add_argument("--int8", action="store_true",
+                            help="Whisper 與 XTTS GPT 使用動態 int8 量化（僅 CPU，首次使用時轉換並快取）")
+    run_parser.set_defaults(func=command_run)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import gc
+import os
+import sys
+import time
+import ctypes
+import threading
+import tracemalloc
+
+
+def current_rss_bytes():
+    """取得目前程序的常駐記憶體 (RSS)，無法取得時回傳 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 回傳位元組，Linux 回傳 KB
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+def total_memory_bytes():
+    """取得實體記憶體總量，無法取得時回傳 0"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+def release_memory():
+    """回收循環參照的物件，並請 glibc 將空閒的堆積記憶體歸還給作業系統"""
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+
+def top_allocations(limit=5):
+    """tracemalloc 啟用時，回傳目前配置最多記憶體的程式位置（文字列表）"""
+    if not tracemalloc.is_tracing():
+        return []
+    stats = tracemalloc.take_snapshot().statistics("lineno")[:limit]
+    return [f"{stat.size / 1024 ** 2:.1f} MB  {stat.traceback[0].filename}:{stat.traceback[0].lineno}" for stat in stats]
+
+
+class RssSampler:
+    """背景取樣 RSS，記錄每個觀察期間的峰值（有觀察者時才執行取樣線程）"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self._watchers = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._watchers:
+                    self._thread = None
+                    return
+                watchers = list(self._watchers)
+            rss = current_rss_bytes()
+            for watcher in watchers:
+                if rss > watcher["peak"]:
+                    watcher["peak"] = rss
+            time.sleep(self.interval)
+
+    def watch(self):
+        """開始觀察，回傳記錄 start 與 peak 的 dict"""
+        rss = current_rss_bytes()
+        watcher = {"start": rss, "peak": rss}
+        with self._lock:
+            self._watchers.append(watcher)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+                self._thread.start()
+        return watcher
+
+    def unwatch(self, watcher):
+        """結束觀察，補上 end 並回傳 watcher"""
+        rss = current_rss_bytes()
+        with self._lock:
+            self._watchers.remove(watcher)
+        watcher["end"] = rss
+        watcher["peak"] = max(watcher["peak"], rss)
+        return watcher
+
+
+# 全域共用的 RSS 取樣器
+rss_sampler = RssSampler()
@@ -0,0 +1,389 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import torch
+from TTS.tts.configs.xtts_config import XttsConfig
+from TTS.tts.models.xtts import Xtts
+from memory_stats import current_rss_bytes, total_memory_bytes, release_memory
+from quantization import quantize_xtts_gpt
+from transcription_backends import load_backend
+
+
+# 模型大小選項（與 GUI 的選項一致）
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
+
+# torch.load 修補狀態（整個程序只修補一次；只在 xtts_checkpoint_loading 期間的線程內生效）
+_torch_load_lock = threading.Lock()
+_original_torch_load = None
+_trusted_load = threading.local()
+
+
+def patch_torch_load():
+    """修補 torch.load：在 xtts_checkpoint_loading 區塊內以 weights_only=False 載入，其他呼叫維持原本行為"""
+    global _original_torch_load
+    with _torch_load_lock:
+        if _original_torch_load is not None:
+            return
+        _original_torch_load = torch.load
+
+        def patched_torch_load(f, map_location=None, pickle_module=None, **kwargs):
+            if getattr(_trusted_load, "active", False):
+                kwargs['weights_only'] = False
+            return _original_torch_load(f, map_location, pickle_module, **kwargs)
+
+        torch.load = patched_torch_load
+
+
+@contextmanager
+def xtts_checkpoint_loading():
+    """XTTS 檢查點包含非張量物件，只在此區塊內（且只對目前線程）允許 torch.load 以 weights_only=False 載入"""
+    patch_torch_load()
+    _trusted_load.active = True
+    try:
+        yield
+    finally:
+        _trusted_load.active = False
+
+
+def model_param_bytes(model):
+    """計算模型權重所佔的位元組數（含 int8 量化層打包的權重，共用的張量只計算一次）"""
+    total = 0
+    seen = set()
+    for value in model.state_dict().values():
+        for tensor in value if isinstance(value, (tuple, list)) else (value,):
+            if not isinstance(tensor, torch.Tensor) or tensor.data_ptr() in seen:
+                continue
+            seen.add(tensor.data_ptr())
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def quantization_supported(device):
+    """動態 int8 量化只支援 CPU 推論"""
+    return str(device) == "cpu"
+
+
+class XttsRegistry:
+    """XTTS 模型註冊表：每個 (檢查點目錄, 裝置, 是否量化) 只載入一次並常駐記憶體"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(checkpoint_dir, device, quantize=False):
+        return (os.path.abspath(checkpoint_dir), str(device), bool(quantize and quantization_supported(device)))
+
+    def get(self, checkpoint_dir, device, log=print, quantize=False):
+        """取得 (model, config)，若尚未載入則載入一次；quantize 時 GPT 以 int8 量化（僅 CPU）"""
+        key = self._key(checkpoint_dir, device, quantize)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["hits"] += 1
+                entry["last_used"] = time.monotonic()
+                log(f"♻️ 使用已載入的XTTS模型 (已重用 {entry['hits']} 次，"
+                    f"累計節省約 {entry['hits'] * entry['load_seconds']:.1f} 秒)")
+                return entry["model"], entry["config"]
+
+            config_path = os.path.join(checkpoint_dir, "config.json")
+            if not os.path.exists(config_path):
+                raise FileNotFoundError(f"找不到XTTS配置文件: {config_path}")
+
+            log("🔄 載入XTTS配置...")
+            config = XttsConfig()
+            config.load_json(config_path)
+
+            log("🔄 正在載入XTTS模型...")
+            rss_before = current_rss_bytes()
+            start = time.perf_counter()
+            with xtts_checkpoint_loading():
+                model = Xtts.init_from_config(config)
+                model.load_checkpoint(config, checkpoint_dir=checkpoint_dir, eval=True)
+            model.to(device)
+            if key[2]:
+                quantize_xtts_gpt(model, checkpoint_dir, log=log)
+            load_seconds = time.perf_counter() - start
+            rss_delta = max(current_rss_bytes() - rss_before, 0)
+
+            entry = {
+                "model": model,
+                "config": config,
+                "load_seconds": load_seconds,
+                "param_bytes": model_param_bytes(model),
+                "rss_delta_bytes": rss_delta,
+                "hits": 0,
+                "last_used": time.monotonic(),
+            }
+            self._entries[key] = entry
+            log(f"✅ XTTS模型{' (int8)' if key[2] else ''}已載入 (耗時 {load_seconds:.2f} 秒, "
+                f"參數 {entry['param_bytes'] / 1024 ** 2:.0f} MB, "
+                f"常駐記憶體增加 {rss_delta / 1024 ** 2:.0f} MB)")
+            return model, config
+
+    def unload(self, checkpoint_dir, device, quantize=False):
+        """從註冊表移除模型，回傳是否有移除"""
+        with self._lock:
+            return self._entries.pop(self._key(checkpoint_dir, device, quantize), None) is not None
+
+    def clear(self):
+        """移除所有已載入的模型，回傳移除的數量"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+    def evict_idle(self, max_idle_seconds):
+        """移除閒置超過 max_idle_seconds 的模型，回傳被移除的檢查點目錄列表"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if now - entry["last_used"] > max_idle_seconds]
+            for key in idle:
+                del self._entries[key]
+        return [key[0] for key in idle]
+
+    def loaded(self):
+        """回傳目前常駐的 (檢查點目錄, 裝置, 是否量化) 列表"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def report(self):
+        """回傳每個已載入模型的載入時間與記憶體統計"""
+        with self._lock:
+            return [
+                {
+                    "checkpoint_dir": key[0],
+                    "device": key[1],
+                    "quantized": key[2],
+                    "load_seconds": entry["load_seconds"],
+                    "param_bytes": entry["param_bytes"],
+                    "rss_delta_bytes": entry["rss_delta_bytes"],
+                    "hits": entry["hits"],
+                    "saved_seconds": entry["hits"] * entry["load_seconds"],
+                }
+                for key, entry in self._entries.items()
+            ]
+
+
+# 全域共用的XTTS註冊表（互動模式與批次模式共用）
+xtts_registry = XttsRegistry()
+
+
+# 各 Whisper 模型大小在 fp32 下的約略記憶體需求 (MB)，用於載入前預留空間
+WHISPER_ESTIMATED_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3060,
+    "large": 6200,
+}
+
+# int8 量化後全連接層權重縮小為 1/4，其餘層維持 fp32，整體約為 fp32 的 0.35 倍
+INT8_SIZE_RATIO = 0.35
+
+# Whisper 註冊表的記憶體預算 (MB)，可用環境變數 DTV_WHISPER_BUDGET_MB 覆寫
+WHISPER_BUDGET_MB = int(os.environ.get("DTV_WHISPER_BUDGET_MB", "6500"))
+
+
+class WhisperRegistry:
+    """Whisper 轉錄引擎 LRU 註冊表：以 (模型大小, 裝置, 是否量化, 引擎) 為鍵，超過記憶體預算時淘汰最久未使用的模型"""
+
+    def __init__(self, budget_mb=WHISPER_BUDGET_MB):
+        self.budget_bytes = budget_mb * 1024 ** 2
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_size, device, quantize=False, backend="whisper", threads=0):
+        # faster-whisper 一律以 int8 計算，且計算線程數在載入時即固定，線程數不同需分別載入
+        faster = backend == "faster-whisper"
+        quantized = faster or bool(quantize and quantization_supported(device))
+        return (model_size, str(device), quantized, backend, threads if faster else 0)
+
+    def _used_bytes(self):
+        return sum(entry["param_bytes"] for entry in self._entries.values())
+
+    def _evict_for(self, needed_bytes, log, keep=0):
+        """淘汰最久未使用的模型，直到可容納 needed_bytes（至少保留最新的 keep 個模型）"""
+        while len(self._entries) > keep and self._used_bytes() + needed_bytes > self.budget_bytes:
+            (size, device, _, backend, _), entry = self._entries.popitem(last=False)
+            log(f"♻️ 記憶體預算不足，已卸載Whisper模型 ({backend} {size}, {device})，釋放 {entry['param_bytes'] / 1024 ** 2:.0f} MB")
+
+    def get(self, model_size, device, log=print, quantize=False, backend="whisper", threads=0):
+        """取得轉錄引擎（提供 transcribe(audio, language, prompt)），若尚未載入則載入並放入 LRU
+
+        quantize 時 openai-whisper 載入 int8 量化版本（僅 CPU）；threads 為 faster-whisper 載入時設定的計算線程數。
+        """
+        if model_size not in MODEL_SIZES:
+            raise ValueError(f"不支援的Whisper模型大小: {model_size}")
+        key = self._key(model_size, device, quantize, backend, threads)
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry["hits"] += 1
+                    entry["last_used"] = time.monotonic()
+                    return entry["model"]
+                loading = self._loading.get(key)
+                if loading is None:
+                    loading = threading.Event()
+                    self._loading[key] = loading
+                    estimated_mb = WHISPER_ESTIMATED_MB.get(model_size, 0) * (INT8_SIZE_RATIO if key[2] else 1)
+                    self._evict_for(int(estimated_mb * 1024 ** 2), log)
+                    break
+            # 其他線程（例如預載）正在載入同一個模型，等待完成後重試
+            loading.wait()
+
+        try:
+            log(f"🔄 正在載入Whisper模型 ({backend} {model_size})...")
+            start = time.perf_counter()
+            model = load_backend(backend, model_size, device, quantize=key[2], threads=threads, log=log)
+            load_seconds = time.perf_counter() - start
+            if isinstance(model.model, torch.nn.Module):
+                param_bytes = model_param_bytes(model.model)
+            else:
+                # CTranslate2 模型的權重不在 Python 端，以估計值計算
+                param_bytes = int(WHISPER_ESTIMATED_MB.get(model_size, 0) * INT8_SIZE_RATIO * 1024 ** 2)
+            with self._lock:
+                self._entries[key] = {
+                    "model": model,
+                    "load_seconds": load_seconds,
+                    "param_bytes": param_bytes,
+                    "hits": 0,
+                    "last_used": time.monotonic(),
+                }
+                self._entries.move_to_end(key)
+                self._evict_for(0, log, keep=1)
+            log(f"✅ Whisper模型 ({backend} {model_size}{', int8' if key[2] else ''}) 已載入 (耗時 {load_seconds:.2f} 秒, 參數 {param_bytes / 1024 ** 2:.0f} MB)")
+            return model
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            loading.set()
+
+    def preload(self, model_size, device, log=print, quantize=False, backend="whisper", threads=0):
+        """在背景線程預先載入模型，回傳該線程（threads 應與之後轉錄時使用的線程數相同）"""
+        def worker():
+            try:
+                self.get(model_size, device, log=log, quantize=quantize, backend=backend, threads=threads)
+            except Exception as e:
+                log(f"⚠️ 預載Whisper模型失敗: {str(e)}")
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def unload(self, model_size, device, quantize=False, backend="whisper", threads=0):
+        """從註冊表移除模型，回傳是否有移除"""
+        with self._lock:
+            return self._entries.pop(self._key(model_size, device, quantize, backend, threads), None) is not None
+
+    def clear(self):
+        """移除所有已載入的模型，回傳移除的數量"""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            return count
+
+    def evict_idle(self, max_idle_seconds):
+        """移除閒置超過 max_idle_seconds 的模型，回傳被移除的模型大小列表"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if now - entry["last_used"] > max_idle_seconds]
+            for key in idle:
+                del self._entries[key]
+        return [key[0] for key in idle]
+
+    def loaded(self):
+        """回傳目前常駐的 (模型大小, 裝置, 是否量化, 引擎, faster-whisper 線程數) 列表，由舊到新"""
+        with self._lock:
+            return list(self._entries.keys())
+
+
+# 全域共用的Whisper註冊表（互動模式與批次模式共用）
+whisper_registry = WhisperRegistry()
+
+
+# 模型常駐策略：auto 依實體記憶體決定、keep 兩個模型都常駐、swap 轉錄與合成之間互相卸載
+RESIDENCY_POLICIES = ("auto", "keep", "swap")
+
+# XTTS-v2 在 fp32 下的約略記憶體需求 (MB)
+XTTS_ESTIMATED_MB = 2300
+
+# 模型以外保留給推論暫存、ffmpeg 與系統的記憶體 (MB)
+RESIDENCY_RESERVE_MB = 3072
+
+
+def resolve_residency(policy, model_size, processes=1, quantize=False):
+    """將 auto 解析為 keep 或 swap：實體記憶體足以讓每個進程同時常駐 Whisper 與 XTTS 時為 keep"""
+    if policy != "auto":
+        return policy
+    total_mb = total_memory_bytes() / 1024 ** 2
+    if not total_mb:
+        return "keep"
+    models_mb = WHISPER_ESTIMATED_MB.get(model_size, 0) + XTTS_ESTIMATED_MB
+    if quantize:
+        models_mb *= INT8_SIZE_RATIO
+    needed_mb = max(1, processes) * models_mb + RESIDENCY_RESERVE_MB
+    return "keep" if total_mb >= needed_mb else "swap"
+
+
+class ModelResidency:
+    """模型常駐策略：swap 時在轉錄前卸載 XTTS、合成前卸載 Whisper，keep 時兩者都常駐"""
+
+    def __init__(self, policy="auto", model_size="tiny", processes=1, log=print, quantize=False):
+        self.policy = resolve_residency(policy, model_size, processes, quantize)
+        self.log = log
+
+    def before_stage(self, stage):
+        """在需要模型的階段開始前，依策略卸載另一個模型"""
+        if self.policy != "swap":
+            return
+        if stage == "transcribe":
+            count, name = xtts_registry.clear(), "XTTS"
+        elif stage == "synthesize":
+            count, name = whisper_registry.clear(), "Whisper"
+        else:
+            return
+        if count:
+            release_memory()
+            self.log(f"♻️ 記憶體常駐策略 swap：已卸載{name}模型")
+
+
+# 閒置模型卸載設定（整個程序共用一個背景線程）
+_idle_lock = threading.Lock()
+_idle_state = {"timeout": 0, "log": print, "thread": None}
+
+
+def evict_idle_models(max_idle_seconds, log=print):
+    """卸載閒置超過 max_idle_seconds 的 Whisper 與 XTTS 模型，回傳被卸載的模型列表"""
+    evicted = whisper_registry.evict_idle(max_idle_seconds) + xtts_registry.evict_idle(max_idle_seconds)
+    if evicted:
+        release_memory()
+        log(f"♻️ 已卸載閒置超過 {max_idle_seconds:.0f} 秒的模型: {', '.join(evicted)}")
+    return evicted
+
+
+def _idle_worker():
+    while True:
+        with _idle_lock:
+            timeout, log = _idle_state["timeout"], _idle_state["log"]
+        time.sleep(min(30.0, max(1.0, timeout / 2)) if timeout else 30.0)
+        if timeout:
+            evict_idle_models(timeout, log)
+
+
+def set_idle_timeout(timeout, log=print):
+    """設定閒置模型的卸載時間（秒，0 表示不卸載），首次啟用時啟動背景線程"""
+    with _idle_lock:
+        _idle_state["timeout"] = timeout or 0
+        _idle_state["log"] = log
+        if timeout and _idle_state["thread"] is None:
+            thread = threading.Thread(target=_idle_worker, name="model-idle-evictor", daemon=True)
+            _idle_state["thread"] = thread
+            thread.start()
@@ -0,0 +1,72 @@
+import os
+import json
+import subprocess
+
+
+# 各視頻容器使用的音訊編碼
+CONTAINER_AUDIO_CODECS = {
+    "mp4": ["-c:a", "aac", "-b:a", "192k"],
+    "mov": ["-c:a", "aac", "-b:a", "192k"],
+    "mkv": ["-c:a", "aac", "-b:a", "192k"],
+}
+
+
+def probe_duration(path):
+    """使用 ffprobe 取得媒體時長（秒）"""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
+    )
+    return float(json.loads(result.stdout)["format"]["duration"])
+
+
+def _run_ffmpeg(args):
+    result = subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", *args],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg exit code {result.returncode}")
+
+
+def mux_audio(video_path, audio_path, output_path, log=print, threads=0):
+    """以 ffmpeg 將視頻的音軌替換為新音訊，回傳是否使用了視頻串流複製
+
+    視頻畫面預設直接複製 (-c:v copy)，不重新編碼：
+    - 視頻較長時在輸出端以 -t 截斷（截尾不需要關鍵幀對齊）
+    - 音訊較長時以 -stream_loop 重複視頻
+    只有在目標容器不接受原視頻編碼、或串流複製失敗時才改用 libx264 重新編碼。
+    threads 限制 ffmpeg（主要是重新編碼時的 libx264）使用的線程數，0 表示由 ffmpeg 自行決定。
+    """
+    video_duration = probe_duration(video_path)
+    audio_duration = probe_duration(audio_path)
+    output_format = os.path.splitext(output_path)[1].lower()[1:]
+    audio_codec = CONTAINER_AUDIO_CODECS.get(output_format, ["-c:a", "aac", "-b:a", "192k"])
+
+    input_args = []
+    if audio_duration > video_duration:
+        log(f"⚠️ 合成的音頻 ({audio_duration:.2f}秒) 比原視頻 ({video_duration:.2f}秒) 長，將重複視頻以匹配音頻長度")
+        input_args += ["-stream_loop", "-1"]
+    elif video_duration > audio_duration:
+        log(f"⚠️ 原視頻 ({video_duration:.2f}秒) 比合成的音頻 ({audio_duration:.2f}秒) 長，將裁剪視頻以匹配音頻長度")
+    input_args += ["-i", video_path, "-i", audio_path]
+    mapping_args = ["-map", "0:v:0", "-map", "1:a:0", "-t", f"{audio_duration:.3f}", "-threads", str(threads)]
+    if output_format in ("mp4", "mov"):
+        mapping_args += ["-movflags", "+faststart"]
+
+    # 先寫入臨時檔再改名，避免失敗時留下不完整的輸出
+    root, ext = os.path.splitext(output_path)
+    temp_output = f"{root}.partial{ext}"
+    try:
+        try:
+            _run_ffmpeg(input_args + mapping_args + ["-c:v", "copy", *audio_codec, temp_output])
+            stream_copied = True
+        except RuntimeError as e:
+            log(f"⚠️ 無法直接複製視頻串流，改為重新編碼: {str(e).splitlines()[-1] if str(e) else e}")
+            _run_ffmpeg(input_args + mapping_args + ["-c:v", "libx264", "-preset", "veryfast", *audio_codec, temp_output])
+            stream_copied = False
+        os.replace(temp_output, output_path)
+    finally:
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+    return stream_copied
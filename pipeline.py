@@ -0,0 +1,986 @@
+import os
+import json
+import shutil
+import hashlib
+import tracemalloc
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+import numpy as np
+import torch
+from pydub import AudioSegment
+import moviepy as mp
+from model_registry import (
+    xtts_registry, whisper_registry, MODEL_SIZES, RESIDENCY_POLICIES, ModelResidency, set_idle_timeout,
+    quantization_supported
+)
+from memory_stats import top_allocations
+from speaker_cache import speaker_latent_cache, synthesize_with_cache, xtts_model_tag
+from streaming_synthesis import stream_synthesize, write_pcm_file
+from muxer import mux_audio
+from audio_io import decode_audio, extract_speaker_clip, WHISPER_SAMPLE_RATE
+from transcription_cache import TranscriptionCache, transcription_cache
+from transcription_backends import TRANSCRIPTION_BACKENDS, backend_version
+from vad import detect_speech, concat_speech, map_segments
+from chunked_transcription import ChunkedTranscriber, LONG_AUDIO_SECONDS
+from translation_memory import translation_memory
+from translation_engine import translation_engine
+from sentence_split import sentences_from_segments, split_sentences, join_sentences
+from batch_executor import StagedBatchExecutor
+from batch_manifest import BatchManifest
+from tracing import Tracer
+from resource_scheduler import ResourceScheduler
+from worker_pool import ProcessBatchPool
+
+
+# 語言設置
+LANGUAGE_PROMPTS = {
+    "zh": {"language": "zh", "prompt": "請轉錄以下繁體中文的內容：", "display": "中文"},
+    "zh-en": {"language": "zh", "prompt": "請轉錄以下內容，可能包含中文和英文：", "display": "中文和英文"},
+    "en": {"language": "en", "prompt": "Please transcribe the following English content:", "display": "英文"},
+    "ja": {"language": "ja", "prompt": "以下の日本語の内容を文字起こししてください：", "display": "日文"}
+}
+
+# 支持的語言代碼
+LANGUAGE_CODES = {
+    "中文": "zh",
+    "英文": "en",
+    "日文": "ja",
+    "韓文": "ko",
+    "法文": "fr",
+    "德文": "de",
+    "西班牙文": "es",
+    "俄文": "ru"
+}
+
+# 輸出格式選項
+AUDIO_FORMATS = {
+    "WAV": {"ext": "wav", "display": "WAV (無損)"},
+    "MP3": {"ext": "mp3", "display": "MP3 (常用格式)"},
+    "M4A": {"ext": "m4a", "display": "M4A (Apple格式)"},
+    "OGG": {"ext": "ogg", "display": "OGG (開放格式)"}
+}
+
+# 視頻格式選項
+VIDEO_FORMATS = {
+    "MP4": {"ext": "mp4", "display": "MP4 (常用格式)"},
+    "MOV": {"ext": "mov", "display": "MOV (Apple格式)"},
+    "MKV": {"ext": "mkv", "display": "MKV (開放格式)"}
+}
+
+# 媒體類型
+MEDIA_TYPES = {
+    "AUDIO": "音訊",
+    "VIDEO": "視頻"
+}
+
+# 支援的副檔名
+VIDEO_EXTS = ('.mp4', '.mov', '.mkv')
+SUPPORTED_EXTS = ('.wav', '.mp3', '.ogg', '.m4a') + VIDEO_EXTS
+
+# 語音合成模式
+SYNTHESIS_MODES = ("full", "sentence", "stream")
+
+# 翻譯路徑模式
+ROUTE_MODES = ("shortest", "pivot")
+
+# 各音訊格式的匯出參數
+AUDIO_EXPORT_PARAMS = {
+    "mp3": {"bitrate": "192k"},
+    "m4a": {"bitrate": "192k", "format": "ipod"},
+    "ogg": {"bitrate": "192k"},
+}
+
+
+def detect_media_type(path):
+    """依副檔名判斷媒體類型"""
+    if os.path.splitext(path)[1].lower() in VIDEO_EXTS:
+        return MEDIA_TYPES["VIDEO"]
+    return MEDIA_TYPES["AUDIO"]
+
+
+def list_media_files(folder_path):
+    """列出資料夾中所有支援的媒體檔案"""
+    return sorted(
+        os.path.join(folder_path, f)
+        for f in os.listdir(folder_path)
+        if f.lower().endswith(SUPPORTED_EXTS)
+    )
+
+
+@dataclass
+class PipelineConfig:
+    """翻譯流程設定：轉錄 → 兩層翻譯 → 語音合成 → 合成視頻"""
+    model_size: str = "tiny"
+    lang_mode: str = "zh-en"
+    from_lang: str = "zh"
+    to_lang: str = "en"
+    final_lang: str = "ja"
+    output_type: str = "AUDIO"
+    output_format: str = "WAV"
+    speaker_wav: Optional[str] = None
+    # 視頻輸入時使用其提取的聲音作為參考語音（優先於 speaker_wav）
+    clone_video_voice: bool = False
+    xtts_dir: str = "XTTS-v2"
+    device: str = "cpu"
+    # 批次模式各階段的工作線程數（未指定的階段為 1）與階段間佇列長度
+    stage_workers: dict = field(default_factory=dict)
+    stage_queue_size: int = 2
+    # 各階段的線程數（未指定時依核心數與同時執行的階段自動分配），以及是否將階段綁定到互不重疊的核心
+    stage_threads: dict = field(default_factory=dict)
+    pin_cores: bool = False
+    # 批次模式的工作進程數（大於 1 時使用多進程模式，每個進程常駐各自的模型）
+    processes: int = 1
+    # 語音合成模式：full 整段合成、sentence 逐句合成並即時寫入、stream 使用 XTTS 串流推論
+    synthesis_mode: str = "full"
+    # 翻譯路徑：shortest 取翻譯次數最少的路徑，pivot 固定經過中間語言 (to_lang)
+    route_mode: str = "shortest"
+    # 批次模式在輸出資料夾記錄各檔案的階段進度，重新執行時略過已完成的工作並從中斷處繼續
+    resume: bool = True
+    # 階段計時的 Chrome trace JSON 輸出路徑（未指定時只在日誌輸出摘要）
+    trace_path: Optional[str] = None
+    # 模型常駐策略：auto 依實體記憶體決定、keep 兩個模型都常駐、swap 轉錄與合成之間互相卸載
+    model_residency: str = "auto"
+    # 閒置超過此秒數的模型自動卸載（0 表示不卸載）
+    model_idle_timeout: float = 0
+    # 以 tracemalloc 記錄 Python 記憶體配置，並在每個工作結束時列出配置最多的位置
+    trace_allocations: bool = False
+    # 是否使用磁碟快取（轉錄快取與翻譯記憶；停用時每次都重新轉錄與翻譯）
+    use_cache: bool = True
+    # Whisper 與 XTTS GPT 的全連接層使用動態 int8 量化（僅 CPU，量化後的模型快取於磁碟）
+    quantize: bool = False
+    # 轉錄引擎：whisper (openai-whisper) 或 faster-whisper (CTranslate2 int8，VAD 過濾後批次解碼)
+    transcription_backend: str = "whisper"
+    # 以能量偵測語音區段：只轉錄語音部分，參考語音也只取語音部分
+    vad: bool = False
+    # 長音訊（超過 long_audio_seconds 秒）在靜音處分塊，以多個進程並行轉錄（1 表示不分塊）
+    transcribe_processes: int = 1
+    long_audio_seconds: float = LONG_AUDIO_SECONDS
+
+    @property
+    def output_ext(self):
+        """輸出檔案的副檔名"""
+        formats = VIDEO_FORMATS if self.output_type == "VIDEO" else AUDIO_FORMATS
+        return formats[self.output_format]["ext"]
+
+    def validate(self):
+        """檢查設定是否有效，無效時拋出 ValueError"""
+        if self.model_size not in MODEL_SIZES:
+            raise ValueError(f"不支援的Whisper模型大小: {self.model_size}")
+        if self.lang_mode not in LANGUAGE_PROMPTS:
+            raise ValueError(f"不支援的轉錄語言模式: {self.lang_mode}")
+        for code in (self.from_lang, self.to_lang, self.final_lang):
+            if code not in LANGUAGE_CODES.values():
+                raise ValueError(f"不支援的語言代碼: {code}")
+        if self.output_type not in ("AUDIO", "VIDEO"):
+            raise ValueError(f"不支援的輸出類型: {self.output_type}")
+        formats = VIDEO_FORMATS if self.output_type == "VIDEO" else AUDIO_FORMATS
+        if self.output_format not in formats:
+            raise ValueError(f"輸出類型 {self.output_type} 不支援格式: {self.output_format}")
+        if self.synthesis_mode not in SYNTHESIS_MODES:
+            raise ValueError(f"不支援的語音合成模式: {self.synthesis_mode}")
+        if self.model_residency not in RESIDENCY_POLICIES:
+            raise ValueError(f"不支援的模型常駐策略: {self.model_residency}")
+        if self.route_mode not in ROUTE_MODES:
+            raise ValueError(f"不支援的翻譯路徑模式: {self.route_mode}")
+        for stage in list(self.stage_workers) + list(self.stage_threads):
+            if stage not in PIPELINE_STAGES:
+                raise ValueError(f"不支援的處理階段: {stage}")
+        if self.transcribe_processes < 1:
+            raise ValueError(f"轉錄進程數必須至少為 1: {self.transcribe_processes}")
+        if self.transcription_backend not in TRANSCRIPTION_BACKENDS:
+            raise ValueError(f"不支援的轉錄引擎: {self.transcription_backend}")
+        if self.quantize and not quantization_supported(self.device):
+            raise ValueError(f"int8 量化只支援 CPU，目前裝置: {self.device}")
+
+
+@dataclass
+class PipelineResult:
+    """單一檔案的處理結果"""
+    input_path: str
+    media_type: str
+    transcription: str = ""
+    segments: list = field(default_factory=list)
+    translated_middle: str = ""
+    translated_final: str = ""
+    output_path: Optional[str] = None
+    # 處理期間的 RSS 高水位（位元組）
+    peak_rss_bytes: int = 0
+
+
+# 流程的處理階段（依序執行）
+PIPELINE_STAGES = ("extract", "transcribe", "translate", "synthesize", "mux")
+
+
+@dataclass
+class PipelineJob:
+    """單一檔案在各處理階段之間傳遞的狀態"""
+    input_path: str
+    output_path: str
+    result: PipelineResult
+    temp_dir: str
+    index: int = 0
+    audio: Optional[np.ndarray] = None
+    speaker_wav: Optional[str] = None
+    transcription_result: Optional[dict] = None
+    synthesized_path: Optional[str] = None
+    # 輸入音訊長度（秒），用於計算即時率
+    input_seconds: Optional[float] = None
+    # 語音區段 [(起點秒, 終點秒), ...]（啟用 VAD 時才有）
+    speech_intervals: Optional[list] = None
+    # 批次記錄（可繼續的批次才有）與已完成的階段
+    manifest: Optional[BatchManifest] = None
+    completed_stages: set = field(default_factory=set)
+
+
+def extract_audio(video_path, temp_dir, log=print, threads=0, speech_intervals=None):
+    """從視頻檔案中提取參考語音片段到 temp_dir（有語音區段時只取語音），回傳音訊路徑"""
+    log(f"🔄 正在從視頻中提取參考語音...")
+    temp_audio_path = extract_speaker_clip(
+        video_path, os.path.join(temp_dir, "speaker_reference.wav"), threads=threads,
+        speech_intervals=speech_intervals
+    )
+    log(f"✅ 成功從視頻中提取參考語音")
+    return temp_audio_path
+
+
+def write_audio(wav, sample_rate, output_path, log=print):
+    """將波形直接編碼為輸出格式並以原子方式寫入（不經過臨時 WAV），格式轉換失敗時改存為 WAV，回傳實際輸出路徑"""
+    try:
+        return write_pcm_file(wav, sample_rate, output_path)
+    except Exception as e:
+        if output_path.lower().endswith(".wav"):
+            raise
+        log(f"❌ 格式轉換錯誤: {str(e)}")
+        # 如果轉換失敗，改存為 WAV 作為備選
+        return write_pcm_file(wav, sample_rate, os.path.splitext(output_path)[0] + ".wav")
+
+
+def convert_audio_format(source_path, target_path, log=print):
+    """轉換音訊格式"""
+    source_ext = os.path.splitext(source_path)[1].lower()
+    target_format = os.path.splitext(target_path)[1].lower()[1:]
+
+    if source_ext == '.wav':
+        audio = AudioSegment.from_wav(source_path)
+    elif source_ext == '.mp3':
+        audio = AudioSegment.from_mp3(source_path)
+    elif source_ext == '.m4a':
+        audio = AudioSegment.from_file(source_path, format="m4a")
+    elif source_ext == '.ogg':
+        audio = AudioSegment.from_ogg(source_path)
+    else:
+        audio = AudioSegment.from_file(source_path)
+
+    audio.export(target_path, format=target_format, **AUDIO_EXPORT_PARAMS.get(target_format, {}))
+    log(f"✅ 已成功將音訊保存為 {target_format.upper()} 格式: {target_path}")
+
+
+def close_clips(clips):
+    """關閉 MoviePy 片段，釋放其 ffmpeg 讀取進程與影格緩衝"""
+    for clip in clips:
+        try:
+            clip.close()
+        except Exception:
+            pass
+
+
+def convert_video_format(source_path, target_path, log=print):
+    """轉換視頻格式"""
+    temp_dir = tempfile.mkdtemp()
+    video = None
+    try:
+        video = mp.VideoFileClip(source_path)
+        target_ext = os.path.splitext(target_path)[1].lower()[1:]
+
+        # MKV 使用 Vorbis 音訊，其餘使用 AAC
+        if target_ext == 'mkv':
+            audio_codec, temp_audio = 'libvorbis', "temp_audio.ogg"
+        else:
+            audio_codec, temp_audio = 'aac', "temp_audio.m4a"
+        video.write_videofile(
+            target_path,
+            codec='libx264',
+            audio_codec=audio_codec,
+            temp_audiofile=os.path.join(temp_dir, temp_audio),
+            remove_temp=True
+        )
+        log(f"✅ 已成功將視頻保存為 {target_ext.upper()} 格式: {target_path}")
+    finally:
+        if video is not None:
+            close_clips([video])
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+class TranslationPipeline:
+    """不依賴 GUI 的媒體翻譯流程，可由 GUI、命令列或其他程式呼叫"""
+
+    def __init__(self, config, log=print, on_update=None, on_audio_chunk=None):
+        config.validate()
+        self.config = config
+        self.log = log
+        # on_update(欄位, 文字)：欄位為 "transcription"、"translation1"、"translation2"
+        self.on_update = on_update or (lambda name, text: None)
+        # on_audio_chunk(段落索引, 段落總數, 輸出路徑)：逐句合成時每段寫入後呼叫
+        self.on_audio_chunk = on_audio_chunk
+        self.temp_files = []
+        self._manifests = {}
+        self.tracer = Tracer()
+        self.scheduler = ResourceScheduler(config.stage_threads, pin=config.pin_cores)
+        self.residency = ModelResidency(config.model_residency, config.model_size, config.processes, log=log,
+                                        quantize=config.quantize)
+        set_idle_timeout(config.model_idle_timeout, log=log)
+
+    @property
+    def device(self):
+        return torch.device(self.config.device)
+
+    def cleanup(self):
+        """清理臨時文件和目錄"""
+        for temp_path in self.temp_files:
+            try:
+                if os.path.isdir(temp_path):
+                    shutil.rmtree(temp_path)
+                elif os.path.exists(temp_path):
+                    os.remove(temp_path)
+            except Exception as e:
+                self.log(f"⚠️ 清理臨時文件時出錯: {str(e)}")
+        self.temp_files = []
+
+    def make_temp_dir(self):
+        """建立由流程管理的臨時目錄"""
+        temp_dir = tempfile.mkdtemp()
+        self.temp_files.append(temp_dir)
+        return temp_dir
+
+    def extract_audio(self, video_path):
+        """從視頻檔案中提取參考語音片段，回傳音訊路徑"""
+        return extract_audio(video_path, self.make_temp_dir(), log=self.log)
+
+    def transcribe(self, audio, speech_intervals=None):
+        """使用設定的轉錄引擎轉錄音訊（路徑或 16kHz float32 陣列），回傳包含 text 與 segments 的結果
+
+        啟用 VAD 時只轉錄語音區段（拼接後送入模型），segments 的時間戳對回原始時間軸。
+        """
+        config = self.config
+        lang_config = LANGUAGE_PROMPTS[config.lang_mode]
+
+        # 相同音訊、引擎、模型與語言設定的轉錄結果直接從快取讀取
+        cache_key = None
+        if config.use_cache and isinstance(audio, np.ndarray):
+            model_name = f"{config.model_size}-int8" if config.quantize else config.model_size
+            if config.transcription_backend != "whisper":
+                model_name = f"{config.transcription_backend}-{config.model_size}"
+            if config.vad:
+                model_name += "-vad"
+            # 是否分塊取決於略過靜音後的長度，啟用分塊時以其設定區分（分塊的切點與合併會影響 segments）
+            mode = "single"
+            if config.transcribe_processes > 1 and config.processes <= 1:
+                mode = f"chunked>={config.long_audio_seconds}"
+            cache_key = TranscriptionCache.make_key(audio, model_name, lang_config,
+                                                    backend_version(config.transcription_backend), mode)
+            cached = transcription_cache.get(cache_key)
+            if cached is not None:
+                self.log("♻️ 使用快取的轉錄結果")
+                return cached
+
+        input_seconds = len(audio) / WHISPER_SAMPLE_RATE if isinstance(audio, np.ndarray) else None
+
+        layout = None
+        if config.vad and isinstance(audio, np.ndarray):
+            with self.tracer.span("vad", input_seconds=input_seconds):
+                if speech_intervals is None:
+                    speech_intervals = detect_speech(audio, WHISPER_SAMPLE_RATE)
+                if speech_intervals:
+                    audio, layout = concat_speech(audio, speech_intervals, WHISPER_SAMPLE_RATE)
+            if layout is None:
+                self.log("⚠️ 未偵測到語音區段，改為轉錄完整音訊")
+            else:
+                self.log(f"🔇 略過靜音：語音 {len(audio) / WHISPER_SAMPLE_RATE:.1f} 秒 / 全長 {input_seconds:.1f} 秒 "
+                         f"({len(speech_intervals)} 個區段)")
+
+        self.log(f"🎧 轉錄音訊中 ({input_seconds:.1f} 秒)..." if input_seconds is not None
+                 else f"🎧 轉錄音訊中: {os.path.basename(audio)}")
+        if self.use_chunked_transcription(audio):
+            transcriber = ChunkedTranscriber(
+                config.transcribe_processes, self.scheduler.partition(config.transcribe_processes),
+                config.model_size, device=config.device, quantize=config.quantize,
+                backend=config.transcription_backend, pin_cores=config.pin_cores, log=self.log
+            )
+            with self.tracer.span("whisper_transcribe_chunked", input_seconds=input_seconds,
+                                  backend=config.transcription_backend, processes=config.transcribe_processes):
+                result = transcriber.transcribe(audio, WHISPER_SAMPLE_RATE, language=lang_config["language"],
+                                                prompt=lang_config["prompt"])
+        else:
+            with self.tracer.span("whisper_load", backend=config.transcription_backend):
+                model = whisper_registry.get(config.model_size, self.device, log=self.log, quantize=config.quantize,
+                                             backend=config.transcription_backend,
+                                             threads=self.scheduler.threads("transcribe"))
+            # RTF 仍以原始音訊長度計算，反映略過靜音後的實際效益
+            with self.tracer.span("whisper_transcribe", input_seconds=input_seconds,
+                                  backend=config.transcription_backend):
+                result = model.transcribe(audio, language=lang_config["language"], prompt=lang_config["prompt"])
+        if layout is not None:
+            result = dict(result, segments=map_segments(result.get("segments") or [], layout))
+
+        if cache_key is not None:
+            try:
+                transcription_cache.put(cache_key, result)
+            except Exception as e:
+                self.log(f"⚠️ 寫入轉錄快取失敗: {str(e)}")
+        return result
+
+    def use_chunked_transcription(self, audio):
+        """長音訊且設定了多個轉錄進程時使用分塊轉錄（多進程批次模式下核心已分給各工作進程，不再分塊）"""
+        config = self.config
+        return (
+            config.transcribe_processes > 1
+            and config.processes <= 1
+            and isinstance(audio, np.ndarray)
+            and len(audio) / WHISPER_SAMPLE_RATE >= config.long_audio_seconds
+        )
+
+    def translate_sentences(self, sentences, source_lang, target_lang):
+        """以批次方式翻譯句子列表"""
+        self.log(f"🌍 翻譯中 ({source_lang} → {target_lang})...")
+        translation_engine.set_threads(*self.scheduler.translation_threads())
+        memory = translation_memory if self.config.use_cache else None
+        return translation_engine.translate_many(sentences, source_lang, target_lang, log=self.log, memory=memory)
+
+    def translate(self, result):
+        """依規劃的翻譯路徑翻譯轉錄結果，回傳 (中間翻譯, 最終翻譯)
+
+        route_mode 為 shortest 時取翻譯次數最少的路徑（有直接語言包時不經過中間語言），
+        pivot 時固定經過中間語言。路徑未經過中間語言時，中間翻譯為路徑上的第一個轉換語言（直接翻譯時為原文）。
+        """
+        config = self.config
+        # 依 Whisper 的 segments 切分句子，以批次方式翻譯
+        sentences = sentences_from_segments(result.get('segments') or []) or split_sentences(result['text'])
+
+        via = config.to_lang if config.route_mode == "pivot" else None
+        route = translation_engine.plan_route(config.from_lang, config.final_lang, via=via, log=self.log)
+        self.log(f"🧭 翻譯路徑 ({config.route_mode}): {' → '.join(route)}")
+        if config.to_lang not in route:
+            self.log(f"💡 最短路徑未經過中間語言 ({config.to_lang})，如需經過請將翻譯路徑設為 pivot")
+
+        texts = {route[0]: sentences}
+        for source_lang, target_lang in zip(route, route[1:]):
+            sentences = self.translate_sentences(sentences, source_lang, target_lang)
+            texts[target_lang] = sentences
+
+        if config.to_lang in texts:
+            middle_lang = config.to_lang
+        else:
+            middle_lang = route[1] if len(route) > 2 else route[0]
+        translated_middle = join_sentences(texts[middle_lang], middle_lang)
+        self.on_update("translation1", translated_middle)
+
+        translated_final = join_sentences(texts[config.final_lang], config.final_lang)
+        self.on_update("translation2", translated_final)
+        return translated_middle, translated_final
+
+    def synthesize(self, text, speaker_wav, output_path):
+        """使用XTTS合成語音並寫入 output_path，回傳實際輸出路徑"""
+        xtts_dir = self.config.xtts_dir
+        if not os.path.exists(xtts_dir):
+            self.log(f"❌ 找不到XTTS模型目錄: {xtts_dir}")
+            self.log("💡 提示: 請確保已下載XTTS-v2模型並放置在正確位置")
+            raise FileNotFoundError(f"找不到XTTS模型目錄: {xtts_dir}")
+
+        # 從註冊表取得XTTS模型（每個目錄與裝置只載入一次）
+        try:
+            with self.tracer.span("xtts_load"):
+                model, config = xtts_registry.get(xtts_dir, self.device, log=self.log,
+                                                  quantize=self.config.quantize)
+        except Exception as e:
+            self.log(f"❌ 載入XTTS模型時出錯: {str(e)}")
+            self.log("💡 提示: 請確保模型檔案完整且未損壞")
+            raise e
+
+        if not os.path.exists(speaker_wav):
+            self.log(f"❌ 找不到參考音訊: {speaker_wav}")
+            raise FileNotFoundError(f"找不到參考音訊: {speaker_wav}")
+
+        model_tag = xtts_model_tag(xtts_dir, self.config.quantize)
+        self.log("🔊 正在生成合成語音...")
+        self.log(f"🔊 使用語言: {self.config.final_lang}, 參考音訊: {os.path.basename(speaker_wav)}")
+
+        if self.config.synthesis_mode != "full":
+            # 逐句合成，每段完成即寫入輸出檔案
+            with self.tracer.span("xtts_inference", chars=len(text)) as info:
+                info["input_seconds"] = stream_synthesize(
+                    model, config, text, self.config.final_lang, speaker_wav, speaker_latent_cache, output_path,
+                    gpt_cond_len=3, model_tag=model_tag, use_inference_stream=self.config.synthesis_mode == "stream",
+                    on_chunk=self.on_audio_chunk, log=self.log
+                )
+            return output_path
+
+        with self.tracer.span("xtts_inference", chars=len(text)) as info:
+            outputs = synthesize_with_cache(
+                model, config, text, self.config.final_lang, speaker_wav,
+                speaker_latent_cache, gpt_cond_len=3, model_tag=model_tag, log=self.log
+            )
+            if "wav" not in outputs:
+                self.log("❌ 無法找到音訊資料輸出")
+                raise Exception("合成過程未生成有效的音訊資料")
+            sr = outputs.get("sample_rate", 24000)
+            # 合成語音以輸出音訊的長度計算即時率
+            info["input_seconds"] = len(outputs["wav"]) / sr
+
+        with self.tracer.span("write_audio"):
+            return write_audio(outputs["wav"], sr, output_path, log=self.log)
+
+    def create_video_with_new_audio(self, video_path, audio_path, output_path, temp_dir=None):
+        """使用原視頻但替換為新的音頻，優先以 ffmpeg 直接複製視頻串流，回傳輸出路徑"""
+        self.log("🔄 正在創建視頻（使用原視頻 + 新音頻）...")
+        try:
+            with self.tracer.span("mux_ffmpeg") as info:
+                info["stream_copy"] = mux_audio(
+                    video_path, audio_path, output_path, log=self.log, threads=self.scheduler.threads("mux")
+                )
+            if info["stream_copy"]:
+                self.log("⚡ 已直接複製視頻串流，未重新編碼畫面")
+            self.log(f"✅ 成功生成視頻到 {output_path}")
+            return output_path
+        except Exception as e:
+            self.log(f"⚠️ ffmpeg 合成視頻失敗，改用 MoviePy 重新編碼: {str(e)}")
+        with self.tracer.span("mux_moviepy"):
+            return self.create_video_with_moviepy(video_path, audio_path, output_path, temp_dir=temp_dir)
+
+    def create_video_with_moviepy(self, video_path, audio_path, output_path, temp_dir=None):
+        """以 MoviePy 重新編碼整段視頻並替換音頻，失敗時改存音頻並回傳其路徑"""
+        clips = []
+        try:
+            temp_dir = temp_dir or self.make_temp_dir()
+
+            # 加載原視頻（但不使用其音頻）與新音頻
+            video_clip = mp.VideoFileClip(video_path)
+            clips.append(video_clip)
+            audio_clip = mp.AudioFileClip(audio_path)
+            clips.append(audio_clip)
+
+            # 檢查音頻和視頻的時長，如果音頻較長，則延長視頻；如果視頻較長，則剪切視頻
+            video_duration = video_clip.duration
+            audio_duration = audio_clip.duration
+
+            if audio_duration > video_duration:
+                self.log(f"⚠️ 合成的音頻 ({audio_duration:.2f}秒) 比原視頻 ({video_duration:.2f}秒) 長，將重複視頻以匹配音頻長度")
+                repeat_times = int(audio_duration / video_duration) + 1
+                extended_clip = mp.concatenate_videoclips([video_clip] * repeat_times)
+                video_clip = extended_clip.subclip(0, audio_duration)
+            elif video_duration > audio_duration:
+                self.log(f"⚠️ 原視頻 ({video_duration:.2f}秒) 比合成的音頻 ({audio_duration:.2f}秒) 長，將裁剪視頻以匹配音頻長度")
+                video_clip = video_clip.subclip(0, audio_duration)
+
+            final_clip = video_clip.set_audio(audio_clip)
+            final_clip.write_videofile(
+                output_path,
+                codec='libx264',
+                audio_codec='aac',
+                temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
+                remove_temp=True
+            )
+            self.log(f"✅ 成功生成視頻到 {output_path}")
+            return output_path
+
+        except Exception as e:
+            self.log(f"❌ 創建視頻時出錯: {str(e)}")
+            return self._fallback_audio(audio_path, output_path)
+        finally:
+            close_clips(clips)
+
+    def create_audio_visual_video(self, audio_path, output_path, temp_dir=None):
+        """從音頻創建簡單視頻（單色背景+音頻），失敗時改存音頻並回傳其路徑"""
+        with self.tracer.span("render_audio_visual"):
+            return self._create_audio_visual_video(audio_path, output_path, temp_dir)
+
+    def _create_audio_visual_video(self, audio_path, output_path, temp_dir=None):
+        clips = []
+        try:
+            self.log("🔄 正在創建音頻視覺化視頻...")
+            temp_dir = temp_dir or self.make_temp_dir()
+
+            audio_clip = mp.AudioFileClip(audio_path)
+            clips.append(audio_clip)
+            audio_duration = audio_clip.duration
+
+            # 創建純色背景視頻（黑色背景）
+            video_clip = mp.ColorClip(size=(1280, 720), color=(0, 0, 0), duration=audio_duration)
+
+            # 添加標題文字
+            txt_clip = mp.TextClip(
+                "音訊語音合成 - 由多語言音訊處理器生成",
+                fontsize=50, color='white', font="Arial-Bold",
+                size=(1000, 200)
+            )
+            txt_clip = txt_clip.set_position('center').set_duration(audio_duration)
+
+            # 添加時間戳
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            time_txt = mp.TextClip(
+                f"生成時間: {timestamp}",
+                fontsize=30, color='white', font="Arial",
+                size=(800, 100)
+            )
+            time_txt = time_txt.set_position(('center', 500)).set_duration(audio_duration)
+
+            video_with_txt = mp.CompositeVideoClip([video_clip, txt_clip, time_txt])
+            clips.extend([video_clip, txt_clip, time_txt, video_with_txt])
+            video_with_audio = video_with_txt.set_audio(audio_clip)
+            video_with_audio.write_videofile(
+                output_path,
+                codec='libx264',
+                audio_codec='aac',
+                temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
+                remove_temp=True,
+                fps=30
+            )
+            self.log(f"✅ 成功生成視頻到 {output_path}")
+            return output_path
+
+        except Exception as e:
+            self.log(f"❌ 創建視頻時出錯: {str(e)}")
+            return self._fallback_audio(audio_path, output_path)
+        finally:
+            close_clips(clips)
+
+    def _fallback_audio(self, audio_path, output_path):
+        """視頻生成失敗時，改為保存音頻"""
+        fallback_path = os.path.splitext(output_path)[0] + ".wav"
+        try:
+            shutil.copy2(audio_path, fallback_path)
+            self.log(f"⚠️ 視頻創建失敗，已保存音頻到 {fallback_path}")
+            return fallback_path
+        except Exception:
+            self.log("❌ 無法保存後備音頻文件")
+            return None
+
+    def create_job(self, input_path, output_path, index=0):
+        """建立單一檔案的處理工作（擁有自己的臨時目錄）"""
+        return PipelineJob(
+            input_path=input_path,
+            output_path=output_path,
+            result=PipelineResult(input_path=input_path, media_type=detect_media_type(input_path)),
+            temp_dir=tempfile.mkdtemp(),
+            index=index
+        )
+
+    def job_name(self, job):
+        """計時記錄中的工作名稱"""
+        return f"{job.index + 1}:{os.path.basename(job.input_path)}"
+
+    def log_job_summary(self, job):
+        """輸出單一工作各階段的耗時與記憶體摘要，並記錄 RSS 高水位"""
+        name = self.job_name(job)
+        lines = self.tracer.summary_lines(name)
+        if len(lines) > 1:
+            self.log(f"⏱️ 階段耗時 ({os.path.basename(job.input_path)}):\n" + "\n".join(lines))
+        job.result.peak_rss_bytes = self.tracer.job_peak_rss(name)
+        if job.result.peak_rss_bytes:
+            self.log(f"📈 記憶體高水位: {job.result.peak_rss_bytes / 1024 ** 2:.0f} MB")
+        allocations = top_allocations()
+        if allocations:
+            self.log("🔍 Python 記憶體配置最多的位置:\n" + "\n".join(allocations))
+
+    def start_allocation_tracing(self):
+        if self.config.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def export_trace(self):
+        """依設定輸出 Chrome trace JSON"""
+        if self.config.trace_path:
+            try:
+                self.tracer.export_chrome_trace(self.config.trace_path)
+                self.log(f"📊 已輸出階段計時: {self.config.trace_path}")
+            except Exception as e:
+                self.log(f"⚠️ 輸出階段計時失敗: {str(e)}")
+
+    def release_job(self, job):
+        """刪除工作的臨時目錄；可繼續的批次工作未完成時保留中間檔案"""
+        if job.manifest is not None and not job.completed_stages.issuperset(PIPELINE_STAGES):
+            return
+        self.log_job_summary(job)
+        if job.manifest is not None:
+            job.manifest.mark_done(job.input_path)
+        shutil.rmtree(job.temp_dir, ignore_errors=True)
+
+    def run_stage(self, stage, job):
+        """執行指定階段（已完成的階段略過），並在批次記錄中寫入產物"""
+        if stage in job.completed_stages:
+            return
+        with self.tracer.span(stage, job=self.job_name(job), input_seconds=job.input_seconds) as info:
+            info["threads"] = self.scheduler.apply(stage)
+            getattr(self, f"stage_{stage}")(job)
+            info["input_seconds"] = job.input_seconds
+        job.completed_stages.add(stage)
+        if job.manifest is not None:
+            job.manifest.record_stage(job.input_path, stage, self.stage_artifacts(stage, job))
+
+    def stage_artifacts(self, stage, job):
+        """各階段完成後寫入批次記錄的產物"""
+        if stage == "extract":
+            return {"speaker_wav": job.speaker_wav, "input_seconds": job.input_seconds}
+        if stage == "transcribe":
+            return {"transcription": job.transcription_result}
+        if stage == "translate":
+            return {"middle": job.result.translated_middle, "final": job.result.translated_final}
+        if stage == "synthesize":
+            return {"audio_path": job.synthesized_path or job.result.output_path}
+        return {"output_path": job.result.output_path}
+
+    def restore_stage(self, stage, job, artifacts):
+        """由批次記錄恢復階段的結果，產物已不存在時回傳 False"""
+        if stage == "extract":
+            if not artifacts["speaker_wav"] or not os.path.exists(artifacts["speaker_wav"]):
+                return False
+            job.speaker_wav = artifacts["speaker_wav"]
+            job.input_seconds = artifacts.get("input_seconds")
+        elif stage == "transcribe":
+            job.transcription_result = artifacts["transcription"]
+            job.result.transcription = job.transcription_result['text']
+            job.result.segments = job.transcription_result.get('segments') or []
+        elif stage == "translate":
+            job.result.translated_middle = artifacts["middle"]
+            job.result.translated_final = artifacts["final"]
+        elif stage == "synthesize":
+            if not artifacts["audio_path"] or not os.path.exists(artifacts["audio_path"]):
+                return False
+            if self.config.output_type == "AUDIO":
+                job.result.output_path = artifacts["audio_path"]
+            else:
+                job.synthesized_path = artifacts["audio_path"]
+        elif stage == "mux":
+            if artifacts["output_path"] and not os.path.exists(artifacts["output_path"]):
+                return False
+            job.result.output_path = artifacts["output_path"] or job.result.output_path
+        return True
+
+    def restore_finished(self, job, stages):
+        """恢復已完成檔案的結果（不需要已刪除的中間檔案），最終輸出不存在時回傳 False"""
+        output_path = (stages.get("mux") or {}).get("output_path")
+        if not output_path or not os.path.exists(output_path):
+            return False
+        if "transcribe" in stages:
+            self.restore_stage("transcribe", job, stages["transcribe"])
+        if "translate" in stages:
+            self.restore_stage("translate", job, stages["translate"])
+        job.result.output_path = output_path
+        job.completed_stages.update(PIPELINE_STAGES)
+        return True
+
+    def batch_config_key(self):
+        """影響輸出結果的設定摘要；設定改變時批次記錄會重設"""
+        config = self.config
+        values = [
+            config.model_size, config.lang_mode, config.from_lang, config.to_lang, config.final_lang,
+            config.route_mode, config.output_type, config.output_format, config.speaker_wav,
+            config.clone_video_voice, config.xtts_dir, config.quantize, config.transcription_backend, config.vad
+        ]
+        return hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest()
+
+    def create_batch_job(self, input_path, output_folder, index=0):
+        """建立批次工作：啟用 resume 時由輸出資料夾的批次記錄恢復已完成的階段"""
+        if not self.config.resume:
+            return self.create_job(input_path, self.batch_output_path(input_path, output_folder), index=index)
+
+        manifest = self._manifests.get(output_folder)
+        if manifest is None:
+            manifest = self._manifests[output_folder] = BatchManifest(output_folder, self.batch_config_key())
+        entry = manifest.open_file(input_path, self.batch_output_path(input_path, output_folder))
+        os.makedirs(entry["work_dir"], exist_ok=True)
+        job = PipelineJob(
+            input_path=input_path,
+            output_path=entry["output_path"],
+            result=PipelineResult(input_path=input_path, media_type=detect_media_type(input_path)),
+            temp_dir=entry["work_dir"],
+            index=index,
+            manifest=manifest
+        )
+
+        # 已完成的檔案中間檔案已刪除，只要最終輸出仍存在就直接略過
+        if entry["status"] == "done" and self.restore_finished(job, entry["stages"]):
+            self.log(f"⏭️ 已完成，略過: {os.path.basename(input_path)}")
+            return job
+
+        for stage in PIPELINE_STAGES:
+            artifacts = entry["stages"].get(stage)
+            if artifacts is None or not self.restore_stage(stage, job, artifacts):
+                break
+            job.completed_stages.add(stage)
+        # 解碼的音訊不寫入磁碟，尚未轉錄時需重新解碼
+        if "transcribe" not in job.completed_stages:
+            job.completed_stages.discard("extract")
+
+        if job.completed_stages.issuperset(PIPELINE_STAGES):
+            self.log(f"⏭️ 已完成，略過: {os.path.basename(input_path)}")
+        elif job.completed_stages:
+            done = [stage for stage in PIPELINE_STAGES if stage in job.completed_stages]
+            self.log(f"⏩ 從中斷處繼續（已完成: {', '.join(done)}）: {os.path.basename(input_path)}")
+        return job
+
+    def run_batch_file(self, input_path, output_folder, index=0):
+        """在批次中處理單一檔案（多進程模式的工作進程使用），回傳 PipelineResult"""
+        self.start_allocation_tracing()
+        job = self.create_batch_job(input_path, output_folder, index=index)
+        try:
+            for stage in PIPELINE_STAGES:
+                self.run_stage(stage, job)
+            return job.result
+        finally:
+            self.release_job(job)
+
+    def stage_extract(self, job):
+        """將輸入的音軌一次解碼為 16kHz 單聲道陣列，並確定參考語音"""
+        self.log(f"🔄 正在解碼音訊...")
+        job.audio = decode_audio(job.input_path, threads=self.scheduler.threads("extract"))
+        job.input_seconds = len(job.audio) / WHISPER_SAMPLE_RATE
+        if self.config.vad:
+            job.speech_intervals = detect_speech(job.audio, WHISPER_SAMPLE_RATE)
+
+        if job.result.media_type == MEDIA_TYPES["VIDEO"]:
+            # 只有需要以視頻本身的聲音作為參考語音時，才另外提取原始音質的片段
+            if self.config.clone_video_voice or not self.config.speaker_wav:
+                job.speaker_wav = extract_audio(
+                    job.input_path, job.temp_dir, log=self.log, threads=self.scheduler.threads("extract"),
+                    speech_intervals=job.speech_intervals
+                )
+            else:
+                job.speaker_wav = self.config.speaker_wav
+        elif not self.config.speaker_wav and job.speech_intervals:
+            # 未指定參考語音時使用輸入檔案本身的聲音，只取語音區段
+            job.speaker_wav = extract_audio(
+                job.input_path, job.temp_dir, log=self.log, threads=self.scheduler.threads("extract"),
+                speech_intervals=job.speech_intervals
+            )
+        else:
+            # 未指定參考語音時，使用輸入檔案本身的聲音
+            job.speaker_wav = self.config.speaker_wav or job.input_path
+
+    def stage_transcribe(self, job):
+        """轉錄音訊"""
+        self.residency.before_stage("transcribe")
+        job.transcription_result = self.transcribe(job.audio, job.speech_intervals)
+        # 轉錄完成後不再需要解碼的音訊，提早釋放記憶體
+        job.audio = None
+        job.result.transcription = job.transcription_result['text']
+        job.result.segments = job.transcription_result.get('segments') or []
+        self.on_update("transcription", job.result.transcription)
+        self.log(f"📝 轉錄內容: {job.result.transcription[:100]}...")
+
+    def stage_translate(self, job):
+        """兩層翻譯"""
+        job.result.translated_middle, job.result.translated_final = self.translate(job.transcription_result)
+
+    def stage_synthesize(self, job):
+        """合成語音：音訊輸出直接寫入最終檔案，視頻輸出先寫入臨時 WAV"""
+        self.log("🗣️ 開始合成語音...")
+        self.residency.before_stage("synthesize")
+        if self.config.output_type == "AUDIO":
+            job.result.output_path = self.synthesize(job.result.translated_final, job.speaker_wav, job.output_path)
+            self.log(f"✅ 成功保存音頻到 {job.result.output_path}")
+        else:
+            job.synthesized_path = os.path.join(job.temp_dir, "synthesized.wav")
+            self.synthesize(job.result.translated_final, job.speaker_wav, job.synthesized_path)
+
+    def stage_mux(self, job):
+        """視頻輸出時將合成的音訊與視頻合併"""
+        if self.config.output_type != "VIDEO":
+            return
+        self.log("🎬 正在生成視頻...")
+        if job.result.media_type == MEDIA_TYPES["VIDEO"]:
+            job.result.output_path = self.create_video_with_new_audio(
+                job.input_path, job.synthesized_path, job.output_path, temp_dir=job.temp_dir
+            )
+        else:
+            self.log("⚠️ 未找到源視頻，將使用音頻播放器外殼創建視頻")
+            job.result.output_path = self.create_audio_visual_video(
+                job.synthesized_path, job.output_path, temp_dir=job.temp_dir
+            )
+
+    def log_config(self):
+        config = self.config
+        self.log(f"🔧 使用模型: {config.model_size}, 語言模式: {config.lang_mode}")
+        self.log(f"🔧 翻譯路徑: {config.from_lang} → {config.to_lang} → {config.final_lang}")
+
+    def run(self, input_path, output_path):
+        """處理單一檔案：轉錄 → 翻譯 → 合成 → (合成視頻)，回傳 PipelineResult"""
+        self.log_config()
+        job = self.create_job(input_path, output_path)
+        # 臨時目錄保留到 cleanup()，讓呼叫端仍可使用中間檔案
+        self.temp_files.append(job.temp_dir)
+        self.tracer.clear()
+        self.start_allocation_tracing()
+        try:
+            for stage in PIPELINE_STAGES:
+                self.run_stage(stage, job)
+        finally:
+            self.log_job_summary(job)
+            self.export_trace()
+        return job.result
+
+    def batch_output_path(self, input_path, output_folder):
+        """批次模式的輸出檔名：原檔名_時間戳.副檔名"""
+        base_filename = os.path.splitext(os.path.basename(input_path))[0]
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        return os.path.join(output_folder, f"{base_filename}_{timestamp}.{self.config.output_ext}")
+
+    def staged_executor(self, stages):
+        """建立分階段執行器，並依同時執行的階段分配線程與核心"""
+        self.scheduler = ResourceScheduler(
+            self.config.stage_threads, pin=self.config.pin_cores, concurrent_stages=stages
+        )
+        self.log("🧮 線程分配: " + "；".join(self.scheduler.describe()))
+        return StagedBatchExecutor(
+            self, stages, stage_workers=self.config.stage_workers, queue_size=self.config.stage_queue_size,
+            prerequisites=PIPELINE_STAGES[:PIPELINE_STAGES.index(stages[0])]
+        )
+
+    def run_batch_in_phases(self, files, output_folder, on_file_start=None):
+        """記憶體不足以同時常駐兩個模型時分兩輪執行：先以 Whisper 完成所有檔案的轉錄與翻譯，
+        卸載後再以 XTTS 合成，每個模型只載入一次（中間結果由批次記錄保存）
+
+        第一輪失敗的檔案不進入合成；中間結果無法恢復的檔案在第二輪記為失敗，不會以不完整的資料合成。
+        """
+        self.log("♻️ 記憶體常駐策略 swap：先完成所有檔案的轉錄與翻譯，再進行語音合成")
+        split = PIPELINE_STAGES.index("synthesize")
+        _, failures = self.staged_executor(PIPELINE_STAGES[:split]).run(
+            files, output_folder, on_file_start=on_file_start
+        )
+        failed = {path for path, _ in failures}
+        results, synthesis_failures = self.staged_executor(PIPELINE_STAGES[split:]).run(
+            [path for path in files if path not in failed], output_folder
+        )
+        order = {path: index for index, path in enumerate(files)}
+        return results, sorted(failures + synthesis_failures, key=lambda item: order[item[0]])
+
+    def run_batch(self, files, output_folder, on_file_start=None):
+        """批次處理多個檔案（各階段以管線方式重疊執行，或使用多進程），回傳 (成功結果列表, [(檔案, 錯誤)] 列表)"""
+        os.makedirs(output_folder, exist_ok=True)
+        self.log_config()
+        self.tracer.clear()
+        self.start_allocation_tracing()
+        if self.config.processes > 1:
+            executor = ProcessBatchPool(self, self.config.processes)
+            results, failures = executor.run(files, output_folder, on_file_start=on_file_start)
+        elif self.residency.policy == "swap" and self.config.resume:
+            results, failures = self.run_batch_in_phases(files, output_folder, on_file_start=on_file_start)
+        else:
+            if self.residency.policy == "swap":
+                self.log("⚠️ 未啟用 resume，swap 策略將在每個檔案的轉錄與合成之間重新載入模型")
+            results, failures = self.staged_executor(PIPELINE_STAGES).run(
+                files, output_folder, on_file_start=on_file_start
+            )
+        # 批次結束後恢復為依序執行的線程分配
+        self.scheduler = ResourceScheduler(self.config.stage_threads, pin=self.config.pin_cores)
+        self.export_trace()
+
+        for stats in xtts_registry.report():
+            self.log(f"📊 XTTS模型載入 {stats['load_seconds']:.2f} 秒，重用 {stats['hits']} 次，"
+                     f"節省約 {stats['saved_seconds']:.1f} 秒，常駐記憶體 {stats['rss_delta_bytes'] / 1024 ** 2:.0f} MB")
+        if self.config.use_cache and self.config.processes <= 1:
+            stats = translation_memory.stats()
+            if stats["hits"] + stats["misses"]:
+                self.log(f"📊 翻譯記憶命中率 {stats['hit_rate']:.0%} ({stats['hits']}/{stats['hits'] + stats['misses']} 句)，"
+                         f"記憶庫共 {stats['entries']} 句")
+        return results, failures
@@ -0,0 +1,173 @@
+import os
+import time
+import hashlib
+import dataclasses
+import torch
+from torch import nn
+import whisper
+from cache_utils import cache_dir
+
+try:
+    from transformers.pytorch_utils import Conv1D
+except ImportError:
+    from transformers.modeling_utils import Conv1D
+
+
+# 快取檔案格式版本（只保存 state_dict，可用 weights_only=True 讀取）
+_CACHE_FORMAT = 2
+
+
+def _quantize_dynamic():
+    """取得 quantize_dynamic（新版 torch 位於 torch.ao.quantization）"""
+    try:
+        from torch.ao.quantization import quantize_dynamic
+    except ImportError:
+        from torch.quantization import quantize_dynamic
+    return quantize_dynamic
+
+
+def _dynamic_linear_class():
+    """取得動態量化的 Linear 類別（新版 torch 位於 torch.ao.nn.quantized.dynamic）"""
+    try:
+        from torch.ao.nn.quantized.dynamic import Linear
+    except ImportError:
+        from torch.nn.quantized.dynamic import Linear
+    return Linear
+
+
+def _linearize(module):
+    """將子模組統一為 nn.Linear，quantize_dynamic 只會轉換型別完全相同的 nn.Linear
+
+    - whisper.model.Linear 只覆寫 forward（配合 fp16 轉型），直接改回 nn.Linear
+    - GPT-2 的 Conv1D 是權重轉置的全連接層，改為等價的 nn.Linear
+    """
+    converted = 0
+    for parent in list(module.modules()):
+        for name, child in list(parent.named_children()):
+            if type(child) is whisper.model.Linear:
+                child.__class__ = nn.Linear
+                converted += 1
+            elif isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = nn.Linear(in_features, out_features, bias=child.bias is not None)
+                linear.weight.data = child.weight.data.t().contiguous()
+                if child.bias is not None:
+                    linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+                converted += 1
+    return converted
+
+
+def quantize_linear_layers(module):
+    """將模組內的全連接層原地轉為動態 int8 量化（權重 int8，啟用值於推論時量化），回傳模組"""
+    _linearize(module)
+    return _quantize_dynamic()(module, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _quantized_skeleton(module):
+    """將全連接層原地換為空的動態 int8 Linear（不計算量化），之後以快取的 state_dict 載入權重
+
+    結構與 quantize_linear_layers 的結果相同；多處共用的層換成同一個量化層。
+    """
+    _linearize(module)
+    dynamic_linear = _dynamic_linear_class()
+    replaced = {}
+    for parent in list(module.modules()):
+        for name, child in list(parent.named_children()):
+            if type(child) is not nn.Linear:
+                continue
+            if id(child) not in replaced:
+                replaced[id(child)] = dynamic_linear(child.in_features, child.out_features,
+                                                     bias_=child.bias is not None, dtype=torch.qint8)
+            setattr(parent, name, replaced[id(child)])
+    return module
+
+
+def _cache_path(kind, *parts):
+    """量化模型的快取路徑：鍵包含來源模型、torch 版本與快取格式，任一變更時重新轉換"""
+    key = "|".join(str(part) for part in (kind, torch.__version__, _CACHE_FORMAT) + parts)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir("quantized"), f"{kind}-{digest}.pt")
+
+
+def _load_cached(path, log):
+    """讀取快取的 {"state_dict", ...}；快取只含張量與基本型別，以 weights_only=True 讀取"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return torch.load(path, map_location="cpu", weights_only=True)
+    except Exception as e:
+        log(f"⚠️ 量化模型快取無法讀取，將重新轉換: {str(e)}")
+        return None
+
+
+def _store_cached(path, data, log):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        torch.save(data, temp_path)
+        os.replace(temp_path, path)
+    except Exception as e:
+        log(f"⚠️ 無法寫入量化模型快取: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_quantized_whisper(model_size, log=print):
+    """載入 int8 量化的 Whisper 模型（僅 CPU）
+
+    首次使用時載入 fp32 模型、轉換後將模型維度與量化後的 state_dict 存入快取；
+    之後依維度建立模型結構並直接載入快取的權重，不再讀取 fp32 檢查點。
+    """
+    path = _cache_path("whisper", model_size, whisper.__version__)
+    cached = _load_cached(path, log)
+    if cached is not None:
+        try:
+            model = whisper.model.Whisper(whisper.model.ModelDimensions(**cached["dims"]))
+            _quantized_skeleton(model)
+            model.load_state_dict(cached["state_dict"])
+            if model_size in whisper._ALIGNMENT_HEADS:
+                model.set_alignment_heads(whisper._ALIGNMENT_HEADS[model_size])
+            log(f"♻️ 使用快取的 int8 Whisper 模型 ({model_size})")
+            return model
+        except Exception as e:
+            log(f"⚠️ 量化模型快取無法套用，將重新轉換: {str(e)}")
+
+    model = whisper.load_model(model_size, device="cpu")
+    start = time.perf_counter()
+    quantize_linear_layers(model)
+    log(f"🔧 Whisper ({model_size}) 已轉換為 int8 (耗時 {time.perf_counter() - start:.2f} 秒)")
+    _store_cached(path, {"dims": dataclasses.asdict(model.dims), "state_dict": model.state_dict()}, log)
+    return model
+
+
+def quantize_xtts_gpt(model, checkpoint_dir, log=print):
+    """將 XTTS 的 GPT（自迴歸解碼，合成時間的主要來源）原地換為 int8 量化版本
+
+    HiFi-GAN 解碼器以卷積為主，維持 fp32。量化後 GPT 的 state_dict 存入快取，
+    之後只將 GPT 的全連接層換為量化層並載入快取的權重，不再重新計算量化。
+    """
+    import TTS
+    checkpoint = os.path.join(checkpoint_dir, "model.pth")
+    stat = os.stat(checkpoint)
+    path = _cache_path("xtts-gpt", os.path.abspath(checkpoint), stat.st_size, stat.st_mtime_ns, TTS.__version__)
+    cached = _load_cached(path, log)
+    if cached is not None:
+        try:
+            # 推論用的包裝與 transformer 共用同一組層，換成量化層後仍然共用
+            _quantized_skeleton(model.gpt)
+            model.gpt.load_state_dict(cached["state_dict"])
+            log("♻️ 使用快取的 int8 XTTS GPT")
+            return model
+        except Exception as e:
+            # 結構已部分替換，無法再就地轉換：刪除無效的快取，下次載入時重新轉換
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            raise RuntimeError(f"量化 XTTS GPT 快取無法套用，已刪除快取，請重新載入模型: {e}") from e
+
+    start = time.perf_counter()
+    quantize_linear_layers(model.gpt)
+    log(f"🔧 XTTS GPT 已轉換為 int8 (耗時 {time.perf_counter() - start:.2f} 秒)")
+    _store_cached(path, {"state_dict": model.gpt.state_dict()}, log)
+    return model
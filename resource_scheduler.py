@@ -0,0 +1,108 @@
+import os
+import torch
+
+
+# 各階段同時執行時分配核心的權重（轉錄與合成為主要的運算負載）
+STAGE_WEIGHTS = {"extract": 1, "transcribe": 3, "translate": 1, "synthesize": 3, "mux": 1}
+
+# 以 torch 計算的階段（共用進程層級的 intra-op 線程池）
+TORCH_STAGES = ("transcribe", "synthesize")
+
+
+def available_cores():
+    """目前進程可使用的 CPU 核心編號"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(cores, parts):
+    """將核心切分為 parts 個連續且互不重疊的區段（核心數不足時區段會重複使用核心）"""
+    parts = max(1, parts)
+    if len(cores) < parts:
+        return [[cores[i % len(cores)]] for i in range(parts)]
+    size, extra = divmod(len(cores), parts)
+    slices, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+class ResourceScheduler:
+    """CPU 資源排程：為每個階段指定線程數（torch、CTranslate2、ffmpeg），並可將階段的工作線程綁定到互不重疊的核心
+
+    concurrent_stages 為同時執行的階段（分階段批次模式）；未指定時各階段依序執行，每個階段都可使用全部核心。
+    torch.set_num_threads 設定的是整個進程共用的 intra-op 線程池，無法依線程區分：
+    階段依序執行時每個階段套用自己的線程數；同時執行時只設定一次，取同時執行的 torch 階段的線程數總和
+    （faster-whisper 與 CTranslate2 另以各自的線程參數控制）。
+    sched_setaffinity(0) 在 Linux 上只作用於呼叫線程，因此 apply() 必須在該階段的工作線程內呼叫；
+    之後由該線程建立的 ffmpeg 子進程會繼承核心綁定。
+    """
+
+    def __init__(self, stage_threads=None, pin=False, concurrent_stages=None, cores=None):
+        self.cores = list(cores) if cores else available_cores()
+        self.stage_threads = dict(stage_threads or {})
+        self.pin = pin and hasattr(os, "sched_setaffinity")
+        self.concurrent_stages = tuple(concurrent_stages or ())
+        self.assignments = self._assign()
+
+    def _assign(self):
+        """依權重將核心分配給同時執行的階段，回傳 {階段: 核心列表}"""
+        stages = self.concurrent_stages
+        if len(stages) <= 1:
+            return {stage: self.cores for stage in STAGE_WEIGHTS}
+
+        total = len(self.cores)
+        weight_sum = sum(STAGE_WEIGHTS.get(stage, 1) for stage in stages)
+        assignments = {stage: self.cores for stage in STAGE_WEIGHTS}
+        offset = 0
+        for stage in stages:
+            count = self.stage_threads.get(stage) or max(1, round(total * STAGE_WEIGHTS.get(stage, 1) / weight_sum))
+            count = min(count, total)
+            # 核心數不足時從頭繞回，與其他階段共用核心
+            assignments[stage] = [self.cores[(offset + i) % total] for i in range(count)]
+            offset += count
+        return assignments
+
+    def threads(self, stage):
+        """階段可使用的線程數"""
+        return self.stage_threads.get(stage) or len(self.assignments.get(stage, self.cores))
+
+    def translation_threads(self):
+        """CTranslate2 的 (inter_threads, intra_threads)：線程較多時同時處理兩個批次"""
+        threads = self.threads("translate")
+        inter_threads = 2 if threads >= 4 else 1
+        return inter_threads, max(1, threads // inter_threads)
+
+    def torch_threads(self, stage):
+        """進程的 torch 線程池大小：同時執行的階段共用同一個線程池，取 torch 階段的線程數總和"""
+        if len(self.concurrent_stages) <= 1:
+            return self.threads(stage)
+        stages = [name for name in self.concurrent_stages if name in TORCH_STAGES]
+        return min(len(self.cores), sum(self.threads(name) for name in stages)) if stages else 1
+
+    def apply(self, stage):
+        """在目前線程套用階段的核心綁定與（進程層級的）torch 線程數，回傳階段的線程數"""
+        threads = self.threads(stage)
+        torch_threads = self.torch_threads(stage)
+        if torch.get_num_threads() != torch_threads:
+            torch.set_num_threads(torch_threads)
+        if self.pin:
+            os.sched_setaffinity(0, set(self.assignments.get(stage, self.cores)))
+        return threads
+
+    def partition(self, parts):
+        """將可用核心切分給多個工作進程"""
+        return partition_cores(self.cores, parts)
+
+    def describe(self):
+        """各階段的線程與核心分配（用於日誌）"""
+        lines = []
+        for stage in self.concurrent_stages or STAGE_WEIGHTS:
+            cores = self.assignments.get(stage, self.cores)
+            pinned = f"，綁定核心 {','.join(map(str, cores))}" if self.pin else ""
+            lines.append(f"{stage}: {self.threads(stage)} 線程{pinned}")
+        return lines
@@ -0,0 +1,94 @@
+import re
+
+
+# 句尾標點（可接著引號或括號）：ASCII 標點後需有空白才斷句（避免切開小數、網址），CJK 標點後直接斷句
+_CLOSERS = "\"'”’)]）」』"
+_CLOSERS_CLASS = f"[{re.escape(_CLOSERS)}]*"
+_SENTENCE_END_RE = re.compile(
+    rf"(?P<ascii>[.!?]+{_CLOSERS_CLASS})\s+|(?P<cjk>[。！？…]+{_CLOSERS_CLASS})\s*"
+)
+
+# 句點後不斷句的常見縮寫（不分大小寫）
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "e.g", "i.e",
+    "fig", "inc", "ltd", "co", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "oct", "nov", "dec",
+}
+
+# 只在後面接著數字時才視為縮寫（例如 No. 5）
+_NUMBER_ABBREVIATIONS = {"no", "vol", "p", "pp"}
+
+# 不使用空白分隔句子的語言
+_NO_SPACE_LANGS = {"zh", "ja"}
+
+
+def _is_initial(word):
+    return len(word) == 2 and word[0].isupper() and word[1] == "."
+
+
+def _is_abbreviation(before, after):
+    """句點是否屬於縮寫：before 為句點前的文本（不含句點），after 為斷句位置之後的文本"""
+    words = before.split()
+    if not words:
+        return False
+    word = words[-1].lstrip("\"'(“‘")
+    following = after.split(None, 1)[0] if after.strip() else ""
+    if word.lower() in _ABBREVIATIONS:
+        return True
+    if word.lower() in _NUMBER_ABBREVIATIONS:
+        return following[:1].isdigit()
+    if len(word) == 1 and word.isupper():
+        # 姓名縮寫：後面是另一個縮寫（J. K.），或前面沒有詞/是大寫詞且後面是大寫詞（J. Smith、John F. Kennedy）
+        if _is_initial(following):
+            return True
+        previous = words[-2] if len(words) > 1 else ""
+        return following[:1].isupper() and (not previous or previous[:1].isupper() or _is_initial(previous))
+    return False
+
+
+def _sentence_parts(text):
+    """在句尾標點處切開文本，縮寫後的句點不斷句"""
+    parts, start = [], 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        end = match.start() + len(match.group("ascii") or match.group("cjk"))
+        if match.group("ascii") == "." and _is_abbreviation(text[start:match.start()], text[match.end():]):
+            continue
+        parts.append(text[start:end])
+        start = match.end()
+    parts.append(text[start:])
+    return parts
+
+
+def split_sentences(text, max_chars=400):
+    """依句尾標點切分文本，過長的句子再依長度切開"""
+    sentences = []
+    for part in _sentence_parts(text):
+        part = part.strip()
+        while len(part) > max_chars:
+            sentences.append(part[:max_chars])
+            part = part[max_chars:].strip()
+        if part:
+            sentences.append(part)
+    return sentences
+
+
+def sentences_from_segments(segments, max_chars=400):
+    """將 Whisper 的 segments 合併為句子：遇到句尾標點或超過長度上限時斷句"""
+    sentences = []
+    current = ""
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        current = f"{current} {text}".strip() if current else text
+        if current.rstrip(_CLOSERS)[-1:] in tuple(".!?。！？…") or len(current) >= max_chars:
+            sentences.extend(split_sentences(current, max_chars))
+            current = ""
+    if current:
+        sentences.extend(split_sentences(current, max_chars))
+    return sentences
+
+
+def join_sentences(sentences, lang):
+    """依目標語言將句子組回完整文本"""
+    separator = "" if lang in _NO_SPACE_LANGS else " "
+    return separator.join(s.strip() for s in sentences if s.strip())
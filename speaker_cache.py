@@ -0,0 +1,123 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import torch
+from cache_utils import cache_dir, file_sha256
+
+
+def xtts_inference_settings(config):
+    """取得與 Xtts.synthesize 相同的推論參數"""
+    return {
+        "temperature": config.temperature,
+        "length_penalty": config.length_penalty,
+        "repetition_penalty": config.repetition_penalty,
+        "top_k": config.top_k,
+        "top_p": config.top_p,
+    }
+
+
+def xtts_model_tag(xtts_dir, quantize=False):
+    """快取鍵使用的模型標記：不同的檢查點目錄或量化狀態的條件編碼器不同，潛在向量不可共用"""
+    return f"{os.path.abspath(xtts_dir)}|{'int8' if quantize else 'fp32'}"
+
+
+class SpeakerLatentCache:
+    """參考語音條件潛在向量快取：以音訊內容雜湊與條件參數為鍵，記憶體 LRU + 磁碟 .pt 檔"""
+
+    def __init__(self, max_entries=16, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, key):
+        directory = self.disk_dir or cache_dir("speaker_latents")
+        return os.path.join(directory, f"{key}.pt")
+
+    @staticmethod
+    def make_key(speaker_wav, model_tag, gpt_cond_len, gpt_cond_chunk_len, max_ref_len, sound_norm_refs):
+        """以參考音訊內容與條件參數組成快取鍵"""
+        raw = "|".join([
+            file_sha256(speaker_wav), str(model_tag), str(gpt_cond_len),
+            str(gpt_cond_chunk_len), str(max_ref_len), str(sound_norm_refs)
+        ])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key, latents):
+        with self._lock:
+            self._memory[key] = latents
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, model, config, speaker_wav, gpt_cond_len=3, model_tag="XTTS-v2", log=print):
+        """取得 (gpt_cond_latent, speaker_embedding)，快取未命中時才執行說話人編碼器"""
+        gpt_cond_chunk_len = getattr(config, "gpt_cond_chunk_len", 6)
+        max_ref_len = getattr(config, "max_ref_len", 10)
+        sound_norm_refs = getattr(config, "sound_norm_refs", False)
+        key = self.make_key(speaker_wav, model_tag, gpt_cond_len, gpt_cond_chunk_len, max_ref_len, sound_norm_refs)
+
+        with self._lock:
+            latents = self._memory.get(key)
+            if latents is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return latents
+
+        device = next(model.parameters()).device
+        disk_path = self._disk_path(key)
+        if os.path.exists(disk_path):
+            try:
+                # 快取只含張量，不允許載入任意物件
+                data = torch.load(disk_path, map_location=device, weights_only=True)
+                latents = (data["gpt_cond_latent"], data["speaker_embedding"])
+                self.disk_hits += 1
+                log("♻️ 從磁碟快取載入參考語音特徵")
+                self._remember(key, latents)
+                return latents
+            except Exception as e:
+                log(f"⚠️ 讀取參考語音快取失敗，將重新計算: {str(e)}")
+
+        self.misses += 1
+        log("🔄 正在計算參考語音特徵...")
+        with torch.inference_mode():
+            gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(
+                audio_path=[speaker_wav],
+                gpt_cond_len=gpt_cond_len,
+                gpt_cond_chunk_len=gpt_cond_chunk_len,
+                max_ref_length=max_ref_len,
+                sound_norm_refs=sound_norm_refs
+            )
+        latents = (gpt_cond_latent, speaker_embedding)
+        self._remember(key, latents)
+
+        # 先寫入臨時檔再改名，避免中斷時留下損壞的快取
+        try:
+            temp_path = f"{disk_path}.{os.getpid()}.tmp"
+            torch.save({
+                "gpt_cond_latent": gpt_cond_latent.cpu(),
+                "speaker_embedding": speaker_embedding.cpu()
+            }, temp_path)
+            os.replace(temp_path, disk_path)
+        except Exception as e:
+            log(f"⚠️ 寫入參考語音快取失敗: {str(e)}")
+        return latents
+
+
+def synthesize_with_cache(model, config, text, language, speaker_wav, cache, gpt_cond_len=3,
+                          model_tag="XTTS-v2", log=print):
+    """使用快取的參考語音特徵進行XTTS推論，輸出格式與 model.synthesize 相同"""
+    gpt_cond_latent, speaker_embedding = cache.get(
+        model, config, speaker_wav, gpt_cond_len=gpt_cond_len, model_tag=model_tag, log=log
+    )
+    return model.inference(
+        text, language, gpt_cond_latent, speaker_embedding, **xtts_inference_settings(config)
+    )
+
+
+# 全域共用的參考語音快取
+speaker_latent_cache = SpeakerLatentCache()
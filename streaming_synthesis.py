@@ -0,0 +1,205 @@
+import os
+import re
+import wave
+import subprocess
+import numpy as np
+import torch
+from speaker_cache import xtts_inference_settings
+from sentence_split import split_sentences
+
+
+# XTTS 各語言單次推論的字元上限（與 XTTS tokenizer 的 char_limits 一致）
+XTTS_CHAR_LIMITS = {
+    "en": 250, "de": 253, "fr": 273, "es": 239, "it": 213, "pt": 203, "pl": 224, "zh": 82,
+    "ar": 166, "cs": 186, "ru": 182, "nl": 251, "tr": 226, "ja": 71, "hu": 224, "ko": 95,
+}
+
+# 以 ffmpeg 編碼各音訊格式時使用的參數
+FFMPEG_AUDIO_CODECS = {
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "192k"],
+    "m4a": ["-c:a", "aac", "-b:a", "192k", "-f", "ipod"],
+    "ogg": ["-c:a", "libvorbis", "-b:a", "192k"],
+    "wav": ["-c:a", "pcm_s16le"],
+}
+
+# 句子過長時可斷開的位置（逗號、分號、空白）
+_SOFT_BREAK_RE = re.compile(r"(?<=[,;:，、；：])\s*|\s+")
+
+
+def split_for_xtts(text, lang):
+    """依句子切分文本，並確保每段不超過 XTTS 該語言的字元上限"""
+    limit = XTTS_CHAR_LIMITS.get(lang.split("-")[0], 250)
+    chunks = []
+    for sentence in split_sentences(text, max_chars=len(text) + 1):
+        if len(sentence) <= limit:
+            chunks.append(sentence)
+            continue
+        # 句子過長時先在逗號或空白處斷開，仍過長則依字元數硬切
+        current = ""
+        for piece in _SOFT_BREAK_RE.split(sentence):
+            if not piece:
+                continue
+            joiner = "" if not current or lang in ("zh", "ja") else " "
+            if len(current) + len(joiner) + len(piece) <= limit:
+                current = f"{current}{joiner}{piece}"
+                continue
+            if current:
+                chunks.append(current)
+            while len(piece) > limit:
+                chunks.append(piece[:limit])
+                piece = piece[limit:]
+            current = piece
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def float_to_pcm16(wav):
+    """將 [-1, 1] 的浮點波形轉為 16 位元 PCM 位元組"""
+    if isinstance(wav, torch.Tensor):
+        wav = wav.detach().cpu().numpy()
+    wav = np.clip(np.asarray(wav, dtype=np.float32).reshape(-1), -1.0, 1.0)
+    return (wav * 32767.0).astype("<i2").tobytes()
+
+
+class PcmStreamWriter:
+    """逐段寫入 PCM 音訊：WAV 直接寫入檔案（每段寫入後標頭即有效），其他格式經由 ffmpeg 管道編碼
+
+    atomic 為 True 時先寫入同目錄的暫存檔，完成後才以 os.replace 換成 output_path，
+    中途失敗不會留下不完整的輸出（逐句播放需要讀取寫入中的檔案，因此預設不使用）。
+    """
+
+    def __init__(self, output_path, sample_rate=24000, atomic=False):
+        self.output_path = output_path
+        self.sample_rate = sample_rate
+        root, ext = os.path.splitext(output_path)
+        self.output_format = ext.lower()[1:]
+        # 暫存檔保留副檔名，讓 ffmpeg 依副檔名選擇封裝格式
+        self.write_path = f"{root}.tmp-{os.getpid()}-{id(self)}{ext}" if atomic else output_path
+        self.frames_written = 0
+        self._file = None
+        self._wave = None
+        self._process = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def open(self):
+        if self.output_format == "wav":
+            self._file = open(self.write_path, "wb")
+            self._wave = wave.open(self._file, "wb")
+            self._wave.setnchannels(1)
+            self._wave.setsampwidth(2)
+            self._wave.setframerate(self.sample_rate)
+        else:
+            if self.output_format not in FFMPEG_AUDIO_CODECS:
+                raise ValueError(f"不支援的串流輸出格式: {self.output_format}")
+            self._process = subprocess.Popen(
+                ["ffmpeg", "-y", "-loglevel", "error",
+                 "-f", "s16le", "-ar", str(self.sample_rate), "-ac", "1", "-i", "pipe:0",
+                 *FFMPEG_AUDIO_CODECS[self.output_format], self.write_path],
+                stdin=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+
+    @property
+    def seconds_written(self):
+        return self.frames_written / self.sample_rate
+
+    def write(self, wav):
+        """寫入一段浮點波形"""
+        data = float_to_pcm16(wav)
+        if self._wave is not None:
+            self._wave.writeframes(data)
+            # 立即寫入磁碟，讓播放器可以讀取已寫入的部分
+            self._file.flush()
+        else:
+            self._process.stdin.write(data)
+            self._process.stdin.flush()
+        self.frames_written += len(data) // 2
+
+    def close(self):
+        """完成寫入"""
+        if self._wave is not None:
+            self._wave.close()
+            self._file.close()
+            self._wave = None
+            self._file = None
+        if self._process is not None:
+            self._process.stdin.close()
+            stderr = self._process.stderr.read().decode("utf-8", "replace")
+            returncode = self._process.wait()
+            self._process = None
+            if returncode != 0:
+                if os.path.exists(self.write_path):
+                    os.remove(self.write_path)
+                raise RuntimeError(f"ffmpeg 編碼失敗: {stderr.strip()}")
+        if self.write_path != self.output_path:
+            os.replace(self.write_path, self.output_path)
+
+    def abort(self):
+        """中止寫入並刪除未完成的檔案"""
+        try:
+            if self._wave is not None:
+                self._wave.close()
+                self._file.close()
+            if self._process is not None:
+                self._process.kill()
+                self._process.wait()
+        finally:
+            self._file = None
+            self._wave = None
+            self._process = None
+            if os.path.exists(self.write_path):
+                os.remove(self.write_path)
+
+
+def write_pcm_file(wav, sample_rate, output_path):
+    """將完整的浮點波形一次寫入 output_path 的格式：WAV 直接寫入，其他格式經由 ffmpeg stdin 編碼，不產生中間檔案
+
+    輸出以原子方式寫入（完成後才出現在 output_path），回傳 output_path。
+    """
+    with PcmStreamWriter(output_path, sample_rate, atomic=True) as writer:
+        writer.write(wav)
+    return output_path
+
+
+def stream_synthesize(model, config, text, language, speaker_wav, cache, output_path,
+                      gpt_cond_len=3, model_tag="XTTS-v2", use_inference_stream=False, on_chunk=None, log=print):
+    """逐句合成語音並即時寫入輸出檔案，回傳輸出音訊的秒數
+
+    on_chunk(段落索引, 段落總數, 輸出路徑) 會在每段寫入後呼叫，
+    第一段寫入後即可開始播放。
+    """
+    gpt_cond_latent, speaker_embedding = cache.get(
+        model, config, speaker_wav, gpt_cond_len=gpt_cond_len, model_tag=model_tag, log=log
+    )
+    settings = xtts_inference_settings(config)
+    chunks = split_for_xtts(text, language)
+    sample_rate = getattr(getattr(config, "audio", None), "output_sample_rate", 24000)
+    log(f"🔊 串流合成 {len(chunks)} 個段落...")
+
+    with PcmStreamWriter(output_path, sample_rate) as writer:
+        for index, chunk in enumerate(chunks):
+            with torch.inference_mode():
+                if use_inference_stream:
+                    for wav_chunk in model.inference_stream(
+                        chunk, language, gpt_cond_latent, speaker_embedding, **settings
+                    ):
+                        writer.write(wav_chunk)
+                else:
+                    writer.write(model.inference(
+                        chunk, language, gpt_cond_latent, speaker_embedding, **settings
+                    )["wav"])
+            if on_chunk:
+                on_chunk(index, len(chunks), output_path)
+        seconds = writer.seconds_written
+    return seconds
@@ -0,0 +1,60 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pipeline = pytest.importorskip("pipeline")
+
+
+def make_pipeline(calls):
+    config = pipeline.PipelineConfig(output_type="AUDIO", output_format="WAV", model_residency="keep",
+                                     use_cache=False, resume=True)
+    instance = pipeline.TranslationPipeline(config, log=lambda message: None)
+
+    def stage_extract(job):
+        calls.append("extract")
+        job.speaker_wav = os.path.join(job.temp_dir, "speaker_reference.wav")
+        with open(job.speaker_wav, "wb") as f:
+            f.write(b"speaker")
+
+    def stage_transcribe(job):
+        calls.append("transcribe")
+        job.transcription_result = {"text": "hello.", "segments": []}
+        job.result.transcription = "hello."
+
+    def stage_translate(job):
+        calls.append("translate")
+        job.result.translated_middle, job.result.translated_final = "hello.", "こんにちは。"
+
+    def stage_synthesize(job):
+        calls.append("synthesize")
+        with open(job.output_path, "wb") as f:
+            f.write(b"audio")
+        job.result.output_path = job.output_path
+
+    def stage_mux(job):
+        calls.append("mux")
+
+    for name, stage in [("extract", stage_extract), ("transcribe", stage_transcribe),
+                        ("translate", stage_translate), ("synthesize", stage_synthesize), ("mux", stage_mux)]:
+        setattr(instance, f"stage_{name}", stage)
+    return instance
+
+
+def test_finished_files_are_skipped_on_rerun(tmp_path):
+    input_path = tmp_path / "input.wav"
+    input_path.write_bytes(b"input")
+    output_folder = str(tmp_path / "out")
+
+    first_calls = []
+    results, failures = make_pipeline(first_calls).run_batch([str(input_path)], output_folder)
+    assert not failures
+    assert first_calls == list(pipeline.PIPELINE_STAGES)
+
+    second_calls = []
+    rerun, failures = make_pipeline(second_calls).run_batch([str(input_path)], output_folder)
+    assert not failures
+    assert second_calls == []
+    assert rerun[0].output_path == results[0].output_path
+    assert rerun[0].translated_final == "こんにちは。"
@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sentence_split import split_sentences, sentences_from_segments, join_sentences  # noqa: E402
+
+
+def test_decimal_not_split():
+    assert split_sentences("The price is 3.50 dollars. It rose.") == ["The price is 3.50 dollars.", "It rose."]
+
+
+def test_url_not_split():
+    assert split_sentences("Visit example.com now! Thanks.") == ["Visit example.com now!", "Thanks."]
+
+
+def test_abbreviations_not_split():
+    assert split_sentences("Mr. Smith agreed. Use tools, e.g. hammers.") == \
+        ["Mr. Smith agreed.", "Use tools, e.g. hammers."]
+
+
+def test_initials_not_split():
+    assert split_sentences("J. K. Rowling wrote it. John F. Kennedy spoke.") == \
+        ["J. K. Rowling wrote it.", "John F. Kennedy spoke."]
+
+
+def test_no_is_abbreviation_only_before_number():
+    assert split_sentences("I said no. Then I left.") == ["I said no.", "Then I left."]
+    assert split_sentences("See No. 5 please. Ok.") == ["See No. 5 please.", "Ok."]
+
+
+def test_single_capital_ending_sentence():
+    assert split_sentences("We chose plan A. It works.") == ["We chose plan A.", "It works."]
+
+
+def test_closing_quotes_and_brackets():
+    assert split_sentences('"Yes." Done.') == ['"Yes."', "Done."]
+    assert split_sentences("(It rained.) We stayed.") == ["(It rained.)", "We stayed."]
+    assert split_sentences("他說：「好。」然後離開。") == ["他說：「好。」", "然後離開。"]
+
+
+def test_cjk_split_without_space():
+    assert split_sentences("你好。今天天氣很好！真的嗎？") == ["你好。", "今天天氣很好！", "真的嗎？"]
+
+
+def test_no_empty_parts():
+    assert split_sentences("One. Two!  ") == ["One.", "Two!"]
+
+
+def test_long_sentence_is_cut():
+    assert split_sentences("a" * 10, max_chars=4) == ["aaaa", "aaaa", "aa"]
+
+
+def test_sentences_from_segments_flushes_after_quote():
+    segments = [{"text": ' He said "stop."'}, {"text": " Then"}, {"text": " he left."}]
+    assert sentences_from_segments(segments) == ['He said "stop."', "Then he left."]
+
+
+def test_join_sentences():
+    assert join_sentences(["你好。", "再見。"], "zh") == "你好。再見。"
+    assert join_sentences(["Hi.", "Bye."], "en") == "Hi. Bye."
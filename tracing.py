@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from memory_stats import rss_sampler
+
+
+MB = 1024 ** 2
+
+
+class Tracer:
+    """輕量的階段計時：記錄每個區段的實際耗時、CPU 時間、輸入音訊長度、即時率 (RTF) 與 RSS 變化/峰值
+
+    區段可以巢狀（例如 synthesize 內的 xtts_load、xtts_inference），未指定 job 時沿用外層區段的 job。
+    CPU 時間與 RSS 皆為整個進程的數值（包含 torch 的運算線程），多個階段同時執行時會互相重疊。
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name, job=None, input_seconds=None, **args):
+        """記錄一個區段；yield 的 dict 可在區段內補上 input_seconds 等資訊"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        if job is None and stack:
+            job = stack[-1]
+        info = {"input_seconds": input_seconds, **args}
+        depth = len(stack)
+        stack.append(job)
+        start_time = time.time()
+        start = time.perf_counter()
+        start_cpu = time.process_time()
+        memory = rss_sampler.watch()
+        try:
+            yield info
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - start_cpu
+            rss_sampler.unwatch(memory)
+            stack.pop()
+            input_seconds = info.pop("input_seconds", None)
+            record = {
+                "name": name,
+                "job": job,
+                "depth": depth,
+                "start": start_time,
+                "wall": wall,
+                "cpu": cpu,
+                "input_seconds": input_seconds,
+                "rtf": wall / input_seconds if input_seconds else None,
+                "rss_start": memory["start"],
+                "rss_end": memory["end"],
+                "rss_peak": memory["peak"],
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "thread": threading.current_thread().name,
+                "args": info,
+            }
+            with self._lock:
+                self.spans.append(record)
+
+    def extend(self, spans):
+        """加入其他進程回傳的區段"""
+        with self._lock:
+            self.spans.extend(spans)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def job_spans(self, job):
+        with self._lock:
+            return sorted((span for span in self.spans if span["job"] == job), key=lambda span: span["start"])
+
+    def jobs(self):
+        """依首次出現的順序列出所有 job"""
+        with self._lock:
+            return list(dict.fromkeys(span["job"] for span in sorted(self.spans, key=lambda span: span["start"])))
+
+    def job_peak_rss(self, job):
+        """單一 job 期間的 RSS 高水位（位元組），沒有記錄時回傳 0"""
+        return max((span["rss_peak"] for span in self.job_spans(job)), default=0)
+
+    def summary_lines(self, job):
+        """單一 job 的摘要表格（每個區段一行）"""
+        # 中文字元顯示寬度為 2，表頭的寬度已扣除
+        lines = [f"{'階段':<22}{'耗時(秒)':>8}{'CPU(秒)':>9}{'RTF':>8}{'ΔRSS(MB)':>10}{'峰值(MB)':>8}"]
+        for span in self.job_spans(job):
+            name = "  " * span["depth"] + span["name"]
+            rtf = f"{span['rtf']:.2f}" if span["rtf"] is not None else "-"
+            lines.append(
+                f"{name:<24}{span['wall']:>10.2f}{span['cpu']:>10.2f}{rtf:>8}"
+                f"{(span['rss_end'] - span['rss_start']) / MB:>+10.0f}{span['rss_peak'] / MB:>10.0f}"
+            )
+        return lines
+
+    def summary(self):
+        """所有 job 的摘要：{job: [{name, wall, cpu, input_seconds, rtf}, ...]}"""
+        return {
+            job: [
+                {key: span[key] for key in ("name", "depth", "wall", "cpu", "input_seconds", "rtf",
+                                            "rss_start", "rss_end", "rss_peak")}
+                for span in self.job_spans(job)
+            ]
+            for job in self.jobs()
+        }
+
+    def export_chrome_trace(self, path):
+        """輸出 Chrome trace_event JSON（可在 chrome://tracing 或 Perfetto 開啟），並附上各 job 的摘要"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        events = []
+        threads = {}
+        for span in spans:
+            threads[(span["pid"], span["tid"])] = span["thread"]
+            events.append({
+                "name": span["name"],
+                "cat": span["job"] or "pipeline",
+                "ph": "X",
+                "ts": int(span["start"] * 1e6),
+                "dur": int(span["wall"] * 1e6),
+                "pid": span["pid"],
+                "tid": span["tid"],
+                "args": {
+                    "job": span["job"],
+                    "cpu_seconds": round(span["cpu"], 4),
+                    "input_seconds": span["input_seconds"],
+                    "rtf": span["rtf"],
+                    "rss_delta_mb": round((span["rss_end"] - span["rss_start"]) / MB, 1),
+                    "rss_peak_mb": round(span["rss_peak"] / MB, 1),
+                    **span["args"],
+                },
+            })
+            # 以計數器事件顯示 RSS 隨時間的變化
+            events.append({
+                "name": "rss_mb", "ph": "C", "pid": span["pid"],
+                "ts": int((span["start"] + span["wall"]) * 1e6),
+                "args": {"rss": round(span["rss_end"] / MB, 1)},
+            })
+        for (pid, tid), thread_name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "jobSummaries": self.summary()},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, path)
+        return path
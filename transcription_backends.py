@@ -0,0 +1,103 @@
+import whisper
+from quantization import load_quantized_whisper
+
+
+# 可選的轉錄引擎：whisper 為 openai-whisper (PyTorch)，faster-whisper 為 CTranslate2 實作（int8 計算）
+TRANSCRIPTION_BACKENDS = ("whisper", "faster-whisper")
+
+# faster-whisper 的模型名稱（large 對應最新的 large-v3）
+FASTER_WHISPER_MODELS = {"large": "large-v3"}
+
+# faster-whisper 批次解碼時同時處理的語音片段數
+FASTER_WHISPER_BATCH_SIZE = 8
+
+# 與 openai-whisper 結果相同的 segment 欄位
+SEGMENT_FIELDS = ("id", "seek", "start", "end", "text", "tokens", "temperature",
+                  "avg_logprob", "compression_ratio", "no_speech_prob")
+
+
+class WhisperBackend:
+    """openai-whisper 引擎（可選 int8 動態量化）"""
+
+    name = "whisper"
+
+    def __init__(self, model_size, device, quantize=False, log=print):
+        self.model_size = model_size
+        if quantize:
+            self.model = load_quantized_whisper(model_size, log=log)
+        else:
+            self.model = whisper.load_model(model_size, device=device)
+
+    def transcribe(self, audio, language=None, prompt=None):
+        """轉錄音訊（路徑或 16kHz float32 陣列），回傳 {"text", "segments", "language"}"""
+        return self.model.transcribe(audio, prompt=prompt, language=language)
+
+
+class FasterWhisperBackend:
+    """faster-whisper 引擎：CTranslate2 int8 計算，先以 VAD 切出語音片段再批次解碼"""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size, device, threads=0, log=print):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("未安裝 faster-whisper，請執行: pip install faster-whisper")
+        self.model_size = model_size
+        device_type = getattr(device, "type", str(device))
+        self.model = WhisperModel(
+            FASTER_WHISPER_MODELS.get(model_size, model_size),
+            device=device_type,
+            compute_type="int8" if device_type == "cpu" else "int8_float16",
+            cpu_threads=threads,
+        )
+        try:
+            from faster_whisper import BatchedInferencePipeline
+            self.pipeline = BatchedInferencePipeline(model=self.model)
+        except ImportError:
+            # 舊版 faster-whisper 沒有批次解碼，改為逐段解碼並啟用 VAD 過濾
+            self.pipeline = None
+
+    def transcribe(self, audio, language=None, prompt=None):
+        """轉錄音訊（路徑或 16kHz float32 陣列），回傳與 openai-whisper 相同格式的 {"text", "segments", "language"}"""
+        if self.pipeline is not None:
+            segments, info = self.pipeline.transcribe(
+                audio, language=language, initial_prompt=prompt, batch_size=FASTER_WHISPER_BATCH_SIZE
+            )
+        else:
+            segments, info = self.model.transcribe(audio, language=language, initial_prompt=prompt, vad_filter=True)
+        # segments 為產生器，逐段解碼完成後才會產出
+        segments = [
+            {key: getattr(segment, key, None) for key in SEGMENT_FIELDS}
+            for segment in segments
+        ]
+        for index, segment in enumerate(segments):
+            segment["id"] = index
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": info.language,
+        }
+
+
+def backend_version(backend):
+    """轉錄引擎所用函式庫的版本（作為轉錄快取鍵的一部分，升級後不會沿用舊結果）"""
+    if backend == "whisper":
+        return f"openai-whisper {getattr(whisper, '__version__', 'unknown')}"
+    from importlib import metadata
+    versions = []
+    for package in ("faster-whisper", "ctranslate2"):
+        try:
+            versions.append(f"{package} {metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package} unknown")
+    return ", ".join(versions)
+
+
+def load_backend(backend, model_size, device, quantize=False, threads=0, log=print):
+    """載入指定的轉錄引擎"""
+    if backend == "whisper":
+        return WhisperBackend(model_size, device, quantize=quantize, log=log)
+    if backend == "faster-whisper":
+        return FasterWhisperBackend(model_size, device, threads=threads, log=log)
+    raise ValueError(f"不支援的轉錄引擎: {backend}")
@@ -0,0 +1,90 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from cache_utils import cache_dir, json_default
+
+
+# 轉錄快取的容量上限 (MB)，可用環境變數 DTV_TRANSCRIPTION_CACHE_MB 覆寫
+TRANSCRIPTION_CACHE_MB = int(os.environ.get("DTV_TRANSCRIPTION_CACHE_MB", "512"))
+
+
+class TranscriptionCache:
+    """以解碼後音訊內容為鍵的轉錄快取：完整保存 Whisper 結果（text 與 segments），超過容量時淘汰最久未使用的項目"""
+
+    def __init__(self, directory=None, max_bytes=TRANSCRIPTION_CACHE_MB * 1024 ** 2):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory or cache_dir("transcriptions"), f"{key}.json")
+
+    @staticmethod
+    def make_key(audio, model_size, lang_config, backend_version="unknown", mode=""):
+        """以音訊內容雜湊、模型名稱、轉錄語言設定、引擎函式庫版本與轉錄方式（例如分塊轉錄）組成快取鍵"""
+        sha = hashlib.sha256()
+        # 直接雜湊陣列的緩衝區，避免 tobytes() 複製整段音訊
+        sha.update(memoryview(np.ascontiguousarray(audio)))
+        sha.update("|".join([
+            str(model_size), lang_config["language"], lang_config["prompt"], str(backend_version), str(mode)
+        ]).encode("utf-8"))
+        return sha.hexdigest()
+
+    def get(self, key):
+        """讀取快取結果，不存在或損壞時回傳 None"""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        # 更新修改時間，作為 LRU 淘汰依據
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """寫入快取（先寫臨時檔再改名），並依容量上限淘汰舊項目"""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, default=json_default)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """刪除最久未使用的項目，直到總大小不超過上限"""
+        directory = self.directory or cache_dir("transcriptions")
+        with self._lock:
+            entries = []
+            for name in os.listdir(directory):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(directory, name))
+                    total -= size
+                except OSError:
+                    pass
+
+
+# 全域共用的轉錄快取
+transcription_cache = TranscriptionCache()
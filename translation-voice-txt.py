@@ -1,18 +1,12 @@
 import os
 import ssl
 import torch
-import whisper
 import warnings
 import numpy as np
 import tkinter as tk
 from tkinter import filedialog, ttk, scrolledtext, messagebox
 from pathlib import Path
 from typing import Literal
-from TTS.tts.configs.xtts_config import XttsConfig
-from TTS.tts.models.xtts import Xtts
-import argostranslate.package
-import argostranslate.translate
-import scipy.io.wavfile as wav_write
 import threading
 import pygame
 from pydub import AudioSegment
@@ -21,56 +15,20 @@ import shutil
 import tempfile
 import moviepy as mp
 from datetime import datetime
+from model_registry import whisper_registry, MODEL_SIZES
+from resource_scheduler import ResourceScheduler
+from transcription_backends import TRANSCRIPTION_BACKENDS
+from ui_events import UiEventBus
+from pipeline import (
+    TranslationPipeline, PipelineConfig, LANGUAGE_PROMPTS, LANGUAGE_CODES, AUDIO_FORMATS,
+    VIDEO_FORMATS, MEDIA_TYPES, SUPPORTED_EXTS, extract_audio, convert_audio_format, convert_video_format
+)
 
 
 # 禁用警告並設置SSL上下文
 warnings.filterwarnings("ignore")
 ssl._create_default_https_context = ssl._create_unverified_context
 
-# 語言設置
-LANGUAGE_PROMPTS = {
-    "zh": {"language": "zh", "prompt": "請轉錄以下繁體中文的內容：", "display": "中文"},
-    "zh-en": {"language": "zh", "prompt": "請轉錄以下內容，可能包含中文和英文：", "display": "中文和英文"},
-    "en": {"language": "en", "prompt": "Please transcribe the following English content:", "display": "英文"},
-    "ja": {"language": "ja", "prompt": "以下の日本語の内容を文字起こししてください：", "display": "日文"}
-}
-
-# 支持的語言代碼
-LANGUAGE_CODES = {
-    "中文": "zh",
-    "英文": "en",
-    "日文": "ja",
-    "韓文": "ko",
-    "法文": "fr",
-    "德文": "de",
-    "西班牙文": "es",
-    "俄文": "ru"
-}
-
-# 模型大小選項
-MODEL_SIZES = ["tiny", "base", "small", "medium", "large"]
-
-# 輸出格式選項
-AUDIO_FORMATS = {
-    "WAV": {"ext": "wav", "display": "WAV (無損)"},
-    "MP3": {"ext": "mp3", "display": "MP3 (常用格式)"},
-    "M4A": {"ext": "m4a", "display": "M4A (Apple格式)"},
-    "OGG": {"ext": "ogg", "display": "OGG (開放格式)"}
-}
-
-# 視頻格式選項
-VIDEO_FORMATS = {
-    "MP4": {"ext": "mp4", "display": "MP4 (常用格式)"},
-    "MOV": {"ext": "mov", "display": "MOV (Apple格式)"},
-    "MKV": {"ext": "mkv", "display": "MKV (開放格式)"}
-}
-
-# 媒體類型
-MEDIA_TYPES = {
-    "AUDIO": "音訊",
-    "VIDEO": "視頻"
-}
-
 class AudioProcessorApp:
     def __init__(self, root):
         self.root = root
@@ -89,7 +47,7 @@ class AudioProcessorApp:
         # 臨時文件和狀態追踪
         self.temp_files = []  # 保存程序過程中創建的臨時文件
         self.input_media_type = None  # 輸入媒體類型 (音訊/視頻)
-        self.extracted_audio_path = None  # 從視頻中提取的音訊路徑
+        self.extracted_audio_path = None  # 從視頻中提取的參考語音路徑
         
         # 創建主框架
         main_frame = ttk.Frame(root, padding=10)
@@ -133,6 +91,9 @@ class AudioProcessorApp:
         model_combo = ttk.Combobox(left_config, textvariable=self.model_size_var, values=MODEL_SIZES, state="readonly", width=15)
         model_combo.grid(row=0, column=1, sticky=tk.W, pady=5)
         
+        # 模型大小變更時在背景預載，讓按下開始時模型已就緒
+        self.model_size_var.trace_add("write", lambda *args: self.preload_whisper())
+        
         # 轉錄語言模式
         ttk.Label(left_config, text="轉錄語言模式:").grid(row=1, column=0, sticky=tk.W, pady=5)
         self.lang_mode_var = tk.StringVar(value="zh-en")
@@ -141,6 +102,14 @@ class AudioProcessorApp:
                                   state="readonly", width=15)
         lang_combo.grid(row=1, column=1, sticky=tk.W, pady=5)
         
+        # 轉錄引擎
+        ttk.Label(left_config, text="轉錄引擎:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.backend_var = tk.StringVar(value="whisper")
+        backend_combo = ttk.Combobox(left_config, textvariable=self.backend_var,
+                                     values=list(TRANSCRIPTION_BACKENDS), state="readonly", width=15)
+        backend_combo.grid(row=2, column=1, sticky=tk.W, pady=5)
+        self.backend_var.trace_add("write", lambda *args: self.preload_whisper())
+        
         # 右側面板
         right_config = ttk.Frame(config_frame)
         right_config.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -169,6 +138,14 @@ class AudioProcessorApp:
                                     state="readonly", width=15)
         final_combo.grid(row=2, column=1, sticky=tk.W, pady=5)
         
+        # 翻譯路徑（預設固定經過中間翻譯語言）
+        ttk.Label(right_config, text="翻譯路徑:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.route_mode_var = tk.StringVar(value="pivot - 經過中間語言")
+        route_combo = ttk.Combobox(right_config, textvariable=self.route_mode_var,
+                                   values=["pivot - 經過中間語言", "shortest - 最少翻譯次數"],
+                                   state="readonly", width=15)
+        route_combo.grid(row=3, column=1, sticky=tk.W, pady=5)
+        
         # 裝置選擇
         device_frame = ttk.Frame(config_frame)
         device_frame.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
@@ -180,6 +157,27 @@ class AudioProcessorApp:
                                      values=["cpu"], state="readonly", width=10)
         device_combo.pack(side=tk.LEFT, padx=5)
         
+        # 批次處理的工作進程數
+        ttk.Label(device_frame, text="批次進程數:").pack(side=tk.LEFT, padx=5)
+        self.processes_var = tk.StringVar(value="1")
+        processes_combo = ttk.Combobox(device_frame, textvariable=self.processes_var,
+                                       values=[str(n) for n in range(1, (os.cpu_count() or 1) + 1)],
+                                       state="readonly", width=5)
+        processes_combo.pack(side=tk.LEFT, padx=5)
+        
+        # 逐句合成：第一段合成完成即可開始播放
+        self.streaming_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(device_frame, text="逐句合成", variable=self.streaming_var).pack(side=tk.LEFT, padx=5)
+        
+        # int8 量化：CPU 推論較快、記憶體較少（首次使用時轉換並快取）
+        self.quantize_var = tk.BooleanVar(value=False)
+        self.quantize_var.trace_add("write", lambda *args: self.preload_whisper())
+        ttk.Checkbutton(device_frame, text="int8 量化", variable=self.quantize_var).pack(side=tk.LEFT, padx=5)
+        
+        # 略過靜音：只轉錄偵測到的語音區段
+        self.vad_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(device_frame, text="略過靜音", variable=self.vad_var).pack(side=tk.LEFT, padx=5)
+        
         # 輸出格式選擇
         ttk.Label(device_frame, text="輸出格式:").pack(side=tk.LEFT, padx=5)
         self.format_var = tk.StringVar(value="WAV")
@@ -227,6 +225,11 @@ class AudioProcessorApp:
         self.log_text = scrolledtext.ScrolledText(log_tab, wrap=tk.WORD, height=10)
         self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
+        # 工作線程的日誌與介面更新都經由事件匯流排，由主線程定時套用
+        self.ui = UiEventBus(self.root, self.log_text)
+        self.ui.start()
+        self.log(f"📝 完整日誌寫入: {self.ui.log_path}")
+        
         # 轉錄標籤頁
         trans_tab = ttk.Frame(self.output_tabs)
         self.output_tabs.add(trans_tab, text="轉錄")
@@ -269,9 +272,6 @@ class AudioProcessorApp:
         self.retalk_btn = ttk.Button(button_frame, text="視頻換臉", command=self.start_video_retalk, state=tk.DISABLED)
         self.retalk_btn.pack(side=tk.RIGHT, padx=5)
         
-        # 模型加載狀態
-        self.whisper_model = None
-        
         # 當前輸出音訊路徑
         self.current_output_path = "output.wav"
         
@@ -281,25 +281,66 @@ class AudioProcessorApp:
         
         # 檢查 FFmpeg 是否可用（用於音訊格式轉換）
         self.check_ffmpeg()
+        
+        # 預載預設的Whisper模型
+        self.preload_whisper()
+    
+    def preload_whisper(self):
+        """依目前選擇的轉錄引擎、模型大小與量化設定在背景預載 Whisper 模型
+
+        線程數與處理時轉錄階段使用的相同，faster-whisper 預載的模型才能直接重用。
+        """
+        whisper_registry.preload(self.model_size_var.get(), torch.device("cpu"), log=self.log,
+                                 quantize=self.quantize_var.get(), backend=self.backend_var.get(),
+                                 threads=ResourceScheduler().threads("transcribe"))
     
     def log(self, message):
-        """添加日誌訊息"""
-        self.log_text.insert(tk.END, f"[INFO] {message}\n")
-        self.log_text.see(tk.END)
+        """添加日誌訊息（任何線程皆可呼叫）"""
+        self.ui.log(f"[INFO] {message}")
         print(message)
+    
+    def build_pipeline_config(self):
+        """從介面上的設定建立流程設定"""
+        return PipelineConfig(
+            model_size=self.model_size_var.get(),
+            lang_mode=self.lang_mode_var.get(),
+            from_lang=LANGUAGE_CODES[self.from_lang_var.get()],
+            to_lang=LANGUAGE_CODES[self.to_lang_var.get()],
+            final_lang=LANGUAGE_CODES[self.final_lang_var.get()],
+            output_type=self.output_type_var.get().split(" - ")[0],
+            output_format=self.format_var.get().split(" - ")[0],
+            speaker_wav=self.speaker_path_var.get() or None,
+            device=self.device_var.get(),
+            synthesis_mode="sentence" if self.streaming_var.get() else "full",
+            route_mode=self.route_mode_var.get().split(" - ")[0],
+            quantize=self.quantize_var.get(),
+            transcription_backend=self.backend_var.get(),
+            vad=self.vad_var.get()
+        )
+    
+    def show_output_text(self, name, text):
+        """在主線程中更新轉錄/翻譯標籤頁的內容（同一週期內只顯示最新的內容）"""
+        widget = {
+            "transcription": self.transcription_text,
+            "translation1": self.translation1_text,
+            "translation2": self.translation2_text
+        }[name]
+
+        def replace_text():
+            widget.delete(1.0, tk.END)
+            widget.insert(tk.END, text)
+        self.ui.update(f"text:{name}", replace_text)
+    
     def browse_input_folder(self):
         folder_path = filedialog.askdirectory(title="選擇資料夾")
         if not folder_path:
             return
 
-        # 支援的副檔名
-        supported_exts = ('.wav', '.mp3', '.ogg', '.m4a', '.mp4', '.mov', '.mkv')
-
         # 取得符合的檔案列表
         files = [
             os.path.join(folder_path, f)
             for f in os.listdir(folder_path)
-            if f.lower().endswith(supported_exts)
+            if f.lower().endswith(SUPPORTED_EXTS)
         ]
         
         if not files:
@@ -337,344 +378,37 @@ class AudioProcessorApp:
     def process_folder_files(self, files, output_folder):
         """批次處理資料夾內的所有檔案"""
         total_files = len(files)
-        success_count = 0
-        fail_count = 0
         
         try:
-            # 載入模型（只載入一次）
-            self.log("🔄 準備批次處理，正在載入模型...")
-            model_size = self.model_size_var.get()
-            device = torch.device("cpu")
+            self.log("🔄 準備批次處理...")
+            config = self.build_pipeline_config()
+            # 視頻檔案使用其本身提取的聲音作為參考語音
+            config.clone_video_voice = True
+            config.processes = int(self.processes_var.get())
+            pipeline = TranslationPipeline(config, log=self.log, on_update=self.show_output_text)
             
-            # 載入Whisper模型
-            if not hasattr(self, 'whisper_model') or self.whisper_model is None:
-                self.log(f"🔄 正在載入Whisper模型 ({model_size})...")
-                self.whisper_model = whisper.load_model(model_size, device=device)
+            def on_file_start(i, total, file_path):
+                file_name = os.path.basename(file_path)
+                self.ui.update("status", lambda: self.update_status(f"處理檔案 {i+1}/{total}: {file_name}"))
+                self.ui.update("input_path", lambda: self.audio_path_var.set(file_path))
             
-            for i, file_path in enumerate(files):
-                try:
-                    # 更新狀態
-                    file_name = os.path.basename(file_path)
-                    self.update_status(f"處理檔案 {i+1}/{total_files}: {file_name}")
-                    self.log(f"🔄 開始處理檔案 {i+1}/{total_files}: {file_name}")
-                    
-                    # 清理之前可能存在的臨時檔案
-                    self.cleanup_temp_files()
-                    
-                    # 設置當前檔案為輸入
-                    self.audio_path_var.set(file_path)
-                    
-                    # 確定文件類型
-                    file_ext = os.path.splitext(file_path)[1].lower()
-                    
-                    # 重設提取音訊路徑
-                    self.extracted_audio_path = None
-                    
-                    # 設置媒體類型並從視頻中提取音訊（如果是視頻）
-                    if file_ext in ['.mp4', '.mov', '.mkv']:
-                        self.input_media_type = MEDIA_TYPES["VIDEO"]
-                        self.extract_audio_from_video(file_path)
-                    else:
-                        self.input_media_type = MEDIA_TYPES["AUDIO"]
-                    
-                    # 確定要處理的音訊路徑
-                    audio_for_transcription = file_path
-                    if self.input_media_type == MEDIA_TYPES["VIDEO"] and self.extracted_audio_path:
-                        audio_for_transcription = self.extracted_audio_path
-                        self.log(f"🔄 使用從視頻中提取的音訊進行轉錄")
-                    
-                    # 獲取配置
-                    speaker_path = self.speaker_path_var.get()
-                    lang_mode = self.lang_mode_var.get()
-                    from_lang_code = LANGUAGE_CODES[self.from_lang_var.get()]
-                    to_lang_code = LANGUAGE_CODES[self.to_lang_var.get()]
-                    final_lang_code = LANGUAGE_CODES[self.final_lang_var.get()]
-                    
-                    # 轉錄音訊
-                    self.log(f"🎧 轉錄音訊中: {os.path.basename(audio_for_transcription)}")
-                    lang_config = LANGUAGE_PROMPTS[lang_mode]
-                    result = self.whisper_model.transcribe(audio_for_transcription, prompt=lang_config["prompt"], language=lang_config["language"])
-                    transcription = result['text']
-                    
-                    # 更新UI
-                    self.root.after(0, lambda: self.transcription_text.delete(1.0, tk.END))
-                    self.root.after(0, lambda: self.transcription_text.insert(tk.END, transcription))
-                    self.log(f"📝 轉錄內容: {transcription[:100]}...")
-                    
-                    # 翻譯文本 (第一次)
-                    self.log(f"🌍 翻譯中 ({from_lang_code} → {to_lang_code})...")
-                    translated_middle = self.translate_text(transcription, from_lang_code, to_lang_code)
-                    
-                    # 更新UI
-                    self.root.after(0, lambda: self.translation1_text.delete(1.0, tk.END))
-                    self.root.after(0, lambda: self.translation1_text.insert(tk.END, translated_middle))
-                    
-                    # 翻譯文本 (第二次)
-                    self.log(f"🌍 翻譯中 ({to_lang_code} → {final_lang_code})...")
-                    translated_final = self.translate_text(translated_middle, to_lang_code, final_lang_code)
-                    
-                    # 更新UI
-                    self.root.after(0, lambda: self.translation2_text.delete(1.0, tk.END))
-                    self.root.after(0, lambda: self.translation2_text.insert(tk.END, translated_final))
-                    
-                    # 準備輸出文件名
-                    base_filename = os.path.splitext(os.path.basename(file_path))[0]
-                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                    
-                    # 獲取選定的輸出類型和格式
-                    output_type = self.output_type_var.get().split(" - ")[0]
-                    format_choice = self.format_var.get().split(" - ")[0]
-                    
-                    # 根據設置確定輸出格式和文件名
-                    if output_type == "AUDIO":
-                        output_format = AUDIO_FORMATS[format_choice]["ext"]
-                        output_filename = f"{base_filename}_{timestamp}.{output_format}"
-                    else:  # VIDEO
-                        output_format = VIDEO_FORMATS[format_choice]["ext"]
-                        output_filename = f"{base_filename}_{timestamp}.{output_format}"
-                    
-                    # 構建完整輸出路徑
-                    output_path = os.path.join(output_folder, output_filename)
-                    
-                    # 合成語音
-                    self.log("🗣️ 開始合成語音...")
-                    self.synthesize_voice_for_batch(translated_final, speaker_path, device, output_path)
-                    
-                    # 如果需要視頻輸出，且輸入是視頻
-                    if output_type == "VIDEO" and self.input_media_type == MEDIA_TYPES["VIDEO"]:
-                        # 使用臨時音訊路徑
-                        temp_audio_path = os.path.join(output_folder, f"temp_{base_filename}_{timestamp}.wav")
-                        if os.path.exists(output_path):
-                            shutil.move(output_path, temp_audio_path)
-                        else:
-                            self.log("⚠️ 中間音訊文件不存在，視頻生成可能失敗")
-                            continue
-                            
-                        # 從處理後的音訊構建視頻
-                        self.log("🎬 正在生成視頻...")
-                        try:
-                            self.create_video_with_new_audio_for_batch(file_path, temp_audio_path, format_choice, output_path)
-                            
-                            # 刪除臨時音訊文件
-                            if os.path.exists(temp_audio_path):
-                                os.remove(temp_audio_path)
-                        except Exception as e:
-                            self.log(f"❌ 視頻生成出錯: {str(e)}")
-                    
-                    success_count += 1
-                    self.log(f"✅ 檔案 {file_name} 處理成功")
-                    
-                except Exception as e:
-                    fail_count += 1
-                    self.log(f"❌ 處理檔案 {os.path.basename(file_path)} 時發生錯誤: {str(e)}")
+            results, failures = pipeline.run_batch(files, output_folder, on_file_start=on_file_start)
             
             # 批處理完成
-            self.root.after(0, lambda: self.progress.stop())
-            self.root.after(0, lambda: self.update_status("批處理完成"))
-            self.root.after(0, lambda: self.process_btn.configure(state=tk.NORMAL))
+            self.ui.call(lambda: self.progress.stop())
+            self.ui.update("status", lambda: self.update_status("批處理完成"))
+            self.ui.call(lambda: self.process_btn.configure(state=tk.NORMAL))
             
             # 顯示完成訊息
-            summary = f"批處理完成！總共 {total_files} 個檔案，成功 {success_count} 個，失敗 {fail_count} 個"
+            summary = f"批處理完成！總共 {total_files} 個檔案，成功 {len(results)} 個，失敗 {len(failures)} 個"
             self.log(f"🎉 {summary}")
-            self.root.after(0, lambda: messagebox.showinfo("批處理完成", summary))
+            self.ui.call(lambda: messagebox.showinfo("批處理完成", summary))
             
         except Exception as e:
             self.log(f"❌ 批處理過程中發生錯誤: {str(e)}")
-            self.root.after(0, lambda: self.progress.stop())
-            self.root.after(0, lambda: self.update_status("批處理錯誤"))
-            self.root.after(0, lambda: self.process_btn.configure(state=tk.NORMAL))
-        
-    def synthesize_voice_for_batch(self, text, speaker_wav, device, output_path):
-        """為批處理設計的合成語音方法，直接輸出到指定路徑"""
-        try:
-            # 確保XTTS目錄存在
-            xtts_dir = "XTTS-v2"
-            if not os.path.exists(xtts_dir):
-                self.log(f"❌ 找不到XTTS模型目錄: {xtts_dir}")
-                raise FileNotFoundError(f"找不到XTTS模型目錄: {xtts_dir}")
-            
-            config_path = os.path.join(xtts_dir, "config.json")
-            if not os.path.exists(config_path):
-                self.log(f"❌ 找不到XTTS配置文件: {config_path}")
-                raise FileNotFoundError(f"找不到XTTS配置文件: {config_path}")
-            
-            # 備份原始torch.load函數
-            torch_load_backup = torch.load
-            
-            # 修補torch.load函數
-            def patched_torch_load(f, map_location=None, pickle_module=None, **kwargs):
-                kwargs['weights_only'] = False
-                return torch_load_backup(f, map_location, pickle_module, **kwargs)
-            
-            # 設置load函數
-            torch.load = patched_torch_load
-            
-            # 如果模型尚未載入，則載入XTTS模型
-            xtts_model = None
-            xtts_config = None
-            
-            try:
-                # 配置XTTS
-                self.log("🔄 載入XTTS配置...")
-                config = XttsConfig()
-                config.load_json(config_path)
-                xtts_config = config
-                
-                # 載入XTTS模型
-                self.log("🔄 正在載入XTTS模型...")
-                model = Xtts.init_from_config(config)
-                model.load_checkpoint(config, checkpoint_dir=xtts_dir, eval=True)
-                model.to(device)
-                xtts_model = model
-            except Exception as e:
-                self.log(f"❌ 載入XTTS模型時出錯: {str(e)}")
-                raise e
-            
-            if not os.path.exists(speaker_wav):
-                self.log(f"❌ 找不到參考音訊: {speaker_wav}")
-                raise FileNotFoundError(f"找不到參考音訊: {speaker_wav}")
-            
-            # 最終語言代碼
-            final_lang_code = LANGUAGE_CODES[self.final_lang_var.get()]
-            
-            # 生成合成語音
-            try:
-                self.log("🔊 正在生成合成語音...")
-                
-                outputs = xtts_model.synthesize(
-                    text=text,
-                    config=xtts_config,
-                    speaker_wav=speaker_wav,
-                    gpt_cond_len=3,
-                    language=final_lang_code
-                )
-                
-                if "wav" in outputs:
-                    sr = outputs.get("sample_rate", 24000)
-                    
-                    # 創建臨時目錄
-                    output_temp_dir = tempfile.mkdtemp()
-                    self.temp_files.append(output_temp_dir)
-                    
-                    # 首先保存為 WAV 格式（這是 XTTS 的原始輸出格式）
-                    temp_wav_path = os.path.join(output_temp_dir, "output_temp.wav")
-                    wav_write.write(temp_wav_path, sr, outputs["wav"])
-                    
-                    # 獲取選定的輸出類型和格式
-                    output_type = self.output_type_var.get().split(" - ")[0]
-                    format_choice = self.format_var.get().split(" - ")[0]
-                    
-                    if output_type == "AUDIO":
-                        # 處理音訊輸出
-                        output_format = os.path.splitext(output_path)[1].lower()[1:]
-                        
-                        if output_format == "wav":
-                            # 如果是 WAV 格式，直接複製臨時文件
-                            shutil.copy2(temp_wav_path, output_path)
-                        else:
-                            # 使用 pydub 轉換為其他格式
-                            try:
-                                audio = AudioSegment.from_wav(temp_wav_path)
-                                
-                                # 設置轉換參數
-                                export_params = {}
-                                if output_format == "mp3":
-                                    export_params = {"bitrate": "192k"}
-                                elif output_format == "m4a":
-                                    export_params = {"bitrate": "192k", "format": "ipod"}
-                                elif output_format == "ogg":
-                                    export_params = {"bitrate": "192k"}
-                                
-                                # 導出為所選格式
-                                audio.export(output_path, format=output_format, **export_params)
-                                
-                            except Exception as e:
-                                self.log(f"❌ 格式轉換錯誤: {str(e)}")
-                                # 如果轉換失敗，使用原始 WAV 文件作為備選
-                                wav_output_path = os.path.splitext(output_path)[0] + ".wav"
-                                shutil.copy2(temp_wav_path, wav_output_path)
-                                output_path = wav_output_path
-                        
-                        self.log(f"✅ 成功保存音頻到 {output_path}")
-                    else:
-                        # 視頻處理時，先保存為WAV，稍後在create_video_with_new_audio_for_batch中處理
-                        shutil.copy2(temp_wav_path, output_path)
-                        self.log(f"✅ 成功生成中間音頻文件")
-                else:
-                    self.log("❌ 無法找到音訊資料輸出")
-                    raise Exception("合成過程未生成有效的音訊資料")
-            except Exception as e:
-                self.log(f"❌ 音訊合成時出錯: {str(e)}")
-                raise e
-            finally:
-                # 恢復原始torch.load函數
-                torch.load = torch_load_backup
-            
-        except Exception as e:
-            self.log(f"❌ 語音合成過程中發生錯誤: {str(e)}")
-            raise e
-            
-    def create_video_with_new_audio_for_batch(self, video_path, audio_path, video_format, output_path):
-        """批處理模式下的視頻合成函數"""
-        try:
-            self.log("🔄 正在創建視頻（使用原視頻 + 新音頻）...")
-            
-            # 獲取輸出格式
-            output_format = VIDEO_FORMATS[video_format]["ext"]
-            
-            # 創建臨時目錄
-            temp_dir = tempfile.mkdtemp()
-            self.temp_files.append(temp_dir)
-            
-            # 加載原視頻（但不使用其音頻）
-            video_clip = mp.VideoFileClip(video_path)
-            
-            # 加載新音頻
-            audio_clip = mp.AudioFileClip(audio_path)
-            
-            # 檢查音頻和視頻的時長
-            video_duration = video_clip.duration
-            audio_duration = audio_clip.duration
-            
-            if audio_duration > video_duration:
-                self.log(f"⚠️ 合成的音頻 ({audio_duration:.2f}秒) 比原視頻 ({video_duration:.2f}秒) 長，將重複視頻以匹配音頻長度")
-                # 計算需要重複視頻的次數
-                repeat_times = int(audio_duration / video_duration) + 1
-                # 創建重複視頻
-                repeated_clips = [video_clip] * repeat_times
-                extended_clip = mp.concatenate_videoclips(repeated_clips)
-                # 裁剪到音頻長度
-                video_clip = extended_clip.subclip(0, audio_duration)
-            elif video_duration > audio_duration:
-                self.log(f"⚠️ 原視頻 ({video_duration:.2f}秒) 比合成的音頻 ({audio_duration:.2f}秒) 長，將裁剪視頻以匹配音頻長度")
-                video_clip = video_clip.subclip(0, audio_duration)
-            
-            # 設置新音頻
-            final_clip = video_clip.set_audio(audio_clip)
-            
-            # 保存視頻
-            final_clip.write_videofile(
-                output_path, 
-                codec='libx264',
-                audio_codec='aac', 
-                temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
-                remove_temp=True
-            )
-            
-            self.log(f"✅ 成功生成視頻到 {output_path}")
-            return True
-            
-        except Exception as e:
-            self.log(f"❌ 創建視頻時出錯: {str(e)}")
-            # 如果視頻生成失敗，回退到僅保存音頻
-            output_format = "wav"
-            fallback_path = os.path.splitext(output_path)[0] + ".wav"
-            try:
-                shutil.copy2(audio_path, fallback_path)
-                self.log(f"⚠️ 視頻創建失敗，已保存音頻到 {fallback_path}")
-            except:
-                self.log("❌ 無法保存後備音頻文件")
-            return False
+            self.ui.call(lambda: self.progress.stop())
+            self.ui.update("status", lambda: self.update_status("批處理錯誤"))
+            self.ui.call(lambda: self.process_btn.configure(state=tk.NORMAL))
     
     def browse_input_file(self):
         """瀏覽並選擇輸入檔案（音訊或視頻）"""
@@ -714,26 +448,17 @@ class AudioProcessorApp:
                 self.speaker_path_var.set(file_path)
     
     def extract_audio_from_video(self, video_path):
-        """從視頻檔案中提取音訊"""
+        """從視頻檔案中提取參考語音片段"""
         try:
-            self.log(f"🔄 正在從視頻中提取音訊...")
-            
             # 創建臨時目錄管理臨時檔案
             temp_dir = tempfile.mkdtemp()
-            temp_audio_path = os.path.join(temp_dir, "extracted_audio.wav")
-            
-            # 使用 moviepy 提取音訊
-            video = mp.VideoFileClip(video_path)
-            video.audio.write_audiofile(temp_audio_path, logger=None)
+            self.temp_files.append(temp_dir)  # 添加到臨時文件列表以便之後清理
             
             # 保存路徑供後續處理
-            self.extracted_audio_path = temp_audio_path
-            self.temp_files.append(temp_dir)  # 添加到臨時文件列表以便之後清理
+            self.extracted_audio_path = extract_audio(video_path, temp_dir, log=self.log)
             
             # 自動設置提取的音訊為參考語音
-            self.speaker_path_var.set(temp_audio_path)
-            
-            self.log(f"✅ 成功從視頻中提取音訊")
+            self.speaker_path_var.set(self.extracted_audio_path)
             
         except Exception as e:
             self.log(f"❌ 從視頻提取音訊時發生錯誤: {str(e)}")
@@ -810,72 +535,42 @@ class AudioProcessorApp:
         try:
             # 獲取配置
             input_path = self.audio_path_var.get()
-            speaker_path = self.speaker_path_var.get()
-            model_size = self.model_size_var.get()
-            lang_mode = self.lang_mode_var.get()
-            from_lang_code = LANGUAGE_CODES[self.from_lang_var.get()]
-            to_lang_code = LANGUAGE_CODES[self.to_lang_var.get()]
-            final_lang_code = LANGUAGE_CODES[self.final_lang_var.get()]            
-            self.log(f"🔧 使用模型: {model_size}, 語言模式: {lang_mode}")
-            self.log(f"🔧 翻譯路徑: {from_lang_code} → {to_lang_code} → {final_lang_code}")
+            config = self.build_pipeline_config()
+            self.log(f"🔄 使用設備: {config.device} (已強制使用CPU以避免MPS問題)")
             
-            # 始終使用CPU設備
-            device = torch.device("cpu")
-            self.log(f"🔄 使用設備: {device} (已強制使用CPU以避免MPS問題)")
+            output_path = f"output.{config.output_ext}"
             
-            # 載入Whisper模型
-            self.log(f"🔄 正在載入Whisper模型 ({model_size})...")
-            model = whisper.load_model(model_size, device=device)
+            def on_audio_chunk(index, total, path):
+                # WAV 音訊輸出時，第一段寫入後即可播放
+                if index == 0 and config.output_type == "AUDIO" and path.endswith(".wav"):
+                    self.current_output_path = path
+                    self.ui.call(lambda: self.play_btn.configure(state=tk.NORMAL))
+                    self.log("🎵 第一段語音已合成，可以開始播放")
             
-            # 確定要處理的音訊路徑
-            audio_for_transcription = input_path
-            if self.input_media_type == MEDIA_TYPES["VIDEO"] and self.extracted_audio_path:
-                audio_for_transcription = self.extracted_audio_path
-                self.log(f"🔄 使用從視頻中提取的音訊進行轉錄")
-            
-            # 轉錄音訊
-            self.log(f"🎧 轉錄音訊中: {os.path.basename(audio_for_transcription)}")
-            lang_config = LANGUAGE_PROMPTS[lang_mode]
-            result = model.transcribe(audio_for_transcription, prompt=lang_config["prompt"], language=lang_config["language"])
-            transcription = result['text']
-            
-            # 更新UI
-            self.root.after(0, lambda: self.transcription_text.delete(1.0, tk.END))
-            self.root.after(0, lambda: self.transcription_text.insert(tk.END, transcription))
-            self.log(transcription)
-            self.log(f"📝 已完成轉錄")
-            
-            # 翻譯文本 (第一次)
-            self.log(f"🌍 翻譯中 ({from_lang_code} → {to_lang_code})...")
-            translated_middle = self.translate_text(transcription, from_lang_code, to_lang_code)
-            
-            # 更新UI
-            self.root.after(0, lambda: self.translation1_text.delete(1.0, tk.END))
-            self.root.after(0, lambda: self.translation1_text.insert(tk.END, translated_middle))
-            
-            # 翻譯文本 (第二次)
-            self.log(f"🌍 翻譯中 ({to_lang_code} → {final_lang_code})...")
-            translated_final = self.translate_text(translated_middle, to_lang_code, final_lang_code)
+            pipeline = TranslationPipeline(
+                config, log=self.log, on_update=self.show_output_text, on_audio_chunk=on_audio_chunk
+            )
             
-            # 更新UI
-            self.root.after(0, lambda: self.translation2_text.delete(1.0, tk.END))
-            self.root.after(0, lambda: self.translation2_text.insert(tk.END, translated_final))
+            try:
+                result = pipeline.run(input_path, output_path)
+            finally:
+                # 流程的臨時檔案交由介面統一清理
+                self.temp_files.extend(pipeline.temp_files)
             
-            # 合成語音
-            self.log("🗣️ 開始合成語音...")
-            self.synthesize_voice(translated_final, speaker_path, device)
+            # 設置當前輸出路徑，用於播放功能
+            self.current_output_path = result.output_path or output_path
             
             # 完成處理
             self.log("✅ 全部處理完成")
-            self.root.after(0, lambda: self.update_status("處理完成"))
-            self.root.after(0, lambda: self.progress.stop())
-            self.root.after(0, lambda: self.process_btn.configure(state=tk.NORMAL))
-            self.root.after(0, lambda: self.play_btn.configure(state=tk.NORMAL))
-            self.root.after(0, lambda: self.save_btn.configure(state=tk.NORMAL))
+            self.ui.update("status", lambda: self.update_status("處理完成"))
+            self.ui.call(lambda: self.progress.stop())
+            self.ui.call(lambda: self.process_btn.configure(state=tk.NORMAL))
+            self.ui.call(lambda: self.play_btn.configure(state=tk.NORMAL))
+            self.ui.call(lambda: self.save_btn.configure(state=tk.NORMAL))
             
             # 如果有視頻輸入，則啟用視頻換臉按鈕
             if self.input_media_type == MEDIA_TYPES["VIDEO"]:
-                self.root.after(0, lambda: self.retalk_btn.configure(state=tk.NORMAL))
+                self.ui.call(lambda: self.retalk_btn.configure(state=tk.NORMAL))
                 self.log("✅ 可以使用「視頻換臉」功能將翻譯後的音訊與原始視頻合成")
             
         except Exception as e:
@@ -890,299 +585,11 @@ class AudioProcessorApp:
             elif "wav" in error_msg.lower() or "audio" in error_msg.lower():
                 self.log("💡 提示: 音訊檔案可能格式不兼容，請嘗試使用標準WAV格式")
             
-            self.root.after(0, lambda: self.update_status("處理失敗"))
-            self.root.after(0, lambda: self.progress.stop())
-            self.root.after(0, lambda: self.process_btn.configure(state=tk.NORMAL))
-            self.root.after(0, lambda: self.play_btn.configure(state=tk.DISABLED))
-            self.root.after(0, lambda: self.save_btn.configure(state=tk.DISABLED))
-    
-    def translate_text(self, text, source_lang, target_lang):
-        """使用Argos翻譯文本"""
-        try:
-            self.log(f"🔄 檢查和安裝語言包 {source_lang} → {target_lang}...")
-            argostranslate.package.update_package_index()
-            packages = argostranslate.package.get_available_packages()
-            package_found = False
-            
-            for pkg in packages:
-                if hasattr(pkg, "from_code") and hasattr(pkg, "to_code") and pkg.from_code == source_lang and pkg.to_code == target_lang:
-                    self.log(f"🔄 正在安裝語言包: {source_lang} → {target_lang}")
-                    argostranslate.package.install_from_path(pkg.download())
-                    package_found = True
-                    break
-            
-            if not package_found:
-                raise Exception(f"❌ 找不到從 {source_lang} 到 {target_lang} 的語言包")
-            
-            self.log(f"🔄 正在翻譯文本...")
-            translated = argostranslate.translate.translate(text, source_lang, target_lang)
-            return translated
-        except Exception as e:
-            self.log(f"❌ 翻譯過程中發生錯誤: {str(e)}")
-            raise e
-    
-    def synthesize_voice(self, text, speaker_wav, device):
-        """使用XTTS合成語音"""
-        try:
-            # 確保XTTS目錄存在
-            xtts_dir = "XTTS-v2"
-            if not os.path.exists(xtts_dir):
-                self.log(f"❌ 找不到XTTS模型目錄: {xtts_dir}")
-                self.log("💡 提示: 請確保已下載XTTS-v2模型並放置在正確位置")
-                raise FileNotFoundError(f"找不到XTTS模型目錄: {xtts_dir}")
-            
-            config_path = os.path.join(xtts_dir, "config.json")
-            if not os.path.exists(config_path):
-                self.log(f"❌ 找不到XTTS配置文件: {config_path}")
-                raise FileNotFoundError(f"找不到XTTS配置文件: {config_path}")
-            
-            # 備份原始torch.load函數
-            torch_load_backup = torch.load
-            
-            # 修補torch.load函數
-            def patched_torch_load(f, map_location=None, pickle_module=None, **kwargs):
-                kwargs['weights_only'] = False
-                return torch_load_backup(f, map_location, pickle_module, **kwargs)
-            
-            # 設置load函數
-            torch.load = patched_torch_load
-            
-            # 配置XTTS
-            try:
-                self.log("🔄 載入XTTS配置...")
-                config = XttsConfig()
-                config.load_json(config_path)
-            except Exception as e:
-                self.log(f"❌ 載入XTTS配置時出錯: {str(e)}")
-                raise e
-            
-            # 載入XTTS模型
-            try:
-                self.log("🔄 正在載入XTTS模型...")
-                model = Xtts.init_from_config(config)
-                model.load_checkpoint(config, checkpoint_dir=xtts_dir, eval=True)
-                model.to(device)
-            except Exception as e:
-                self.log(f"❌ 載入XTTS模型時出錯: {str(e)}")
-                self.log("💡 提示: 請確保模型檔案完整且未損壞")
-                raise e
-            
-            if not os.path.exists(speaker_wav):
-                self.log(f"❌ 找不到參考音訊: {speaker_wav}")
-                raise FileNotFoundError(f"找不到參考音訊: {speaker_wav}")
-            
-            # 最終語言代碼
-            final_lang_code = LANGUAGE_CODES[self.final_lang_var.get()]
-            
-            # 生成合成語音
-            try:
-                self.log("🔊 正在生成合成語音...")
-                self.log(f"🔊 使用語言: {final_lang_code}, 參考音訊: {os.path.basename(speaker_wav)}")
-                
-                outputs = model.synthesize(
-                    text=text,
-                    config=config,
-                    speaker_wav=speaker_wav,
-                    gpt_cond_len=3,
-                    language=final_lang_code
-                )
-                
-                if "wav" in outputs:
-                    sr = outputs.get("sample_rate", 24000)
-                    
-                    # 獲取選定的輸出類型和格式
-                    output_type = self.output_type_var.get().split(" - ")[0]
-                    format_choice = self.format_var.get().split(" - ")[0]
-                    
-                    # 創建臨時目錄
-                    output_temp_dir = tempfile.mkdtemp()
-                    self.temp_files.append(output_temp_dir)
-                    
-                    # 首先保存為 WAV 格式（這是 XTTS 的原始輸出格式）
-                    temp_wav_path = os.path.join(output_temp_dir, "output_temp.wav")
-                    wav_write.write(temp_wav_path, sr, outputs["wav"])
-                    
-                    if output_type == "AUDIO":
-                        # 處理音訊輸出
-                        output_format = AUDIO_FORMATS[format_choice]["ext"]
-                        final_output_path = f"output.{output_format}"
-                        
-                        if output_format == "wav":
-                            # 如果是 WAV 格式，直接複製臨時文件
-                            shutil.copy2(temp_wav_path, final_output_path)
-                        else:
-                            # 使用 pydub 轉換為其他格式
-                            try:
-                                audio = AudioSegment.from_wav(temp_wav_path)
-                                
-                                # 設置轉換參數
-                                export_params = {}
-                                if output_format == "mp3":
-                                    export_params = {"bitrate": "192k"}
-                                elif output_format == "m4a":
-                                    export_params = {"bitrate": "192k", "format": "ipod"}
-                                elif output_format == "ogg":
-                                    export_params = {"bitrate": "192k"}
-                                
-                                # 導出為所選格式
-                                audio.export(final_output_path, format=output_format, **export_params)
-                                
-                            except Exception as e:
-                                self.log(f"❌ 格式轉換錯誤: {str(e)}")
-                                # 如果轉換失敗，使用原始 WAV 文件作為備選
-                                shutil.copy2(temp_wav_path, "output.wav")
-                                final_output_path = "output.wav"
-                        
-                        self.log(f"✅ 成功保存音頻到 {final_output_path}")
-                    
-                    else:  # VIDEO 輸出
-                        # 檢查是否有源視頻
-                        if self.input_media_type != MEDIA_TYPES["VIDEO"]:
-                            self.log("⚠️ 未找到源視頻，將使用音頻播放器外殼創建視頻")
-                            # 創建無視頻的音頻視覺化（可選：將來可以擴展為波形或其他視覺效果）
-                            self.create_audio_visual_video(temp_wav_path, format_choice)
-                        else:
-                            # 使用原始視頻替換音頻
-                            input_video_path = self.audio_path_var.get()
-                            self.create_video_with_new_audio(input_video_path, temp_wav_path, format_choice)
-                    
-                    # 設置當前輸出路徑，用於播放功能
-                    self.current_output_path = final_output_path
-                else:
-                    self.log("❌ 無法找到音訊資料輸出")
-                    raise Exception("合成過程未生成有效的音訊資料")
-            except Exception as e:
-                self.log(f"❌ 音訊合成時出錯: {str(e)}")
-                raise e
-            finally:
-                # 恢復原始torch.load函數
-                torch.load = torch_load_backup
-            
-        except Exception as e:
-            self.log(f"❌ 語音合成過程中發生錯誤: {str(e)}")
-            raise e
-    
-    def create_audio_visual_video(self, audio_path, video_format):
-        """從音頻創建簡單視頻（單色背景+音頻）"""
-        try:
-            self.log("🔄 正在創建音頻視覺化視頻...")
-            
-            # 獲取輸出格式
-            output_format = VIDEO_FORMATS[video_format]["ext"]
-            
-            # 創建臨時目錄
-            temp_dir = tempfile.mkdtemp()
-            self.temp_files.append(temp_dir)
-            
-            # 使用 moviepy 創建視頻
-            audio_clip = mp.AudioFileClip(audio_path)
-            audio_duration = audio_clip.duration
-            
-            # 創建純色背景視頻（黑色背景）
-            # 可以在這裡添加音頻可視化，例如波形等
-            video_clip = mp.ColorClip(size=(1280, 720), color=(0, 0, 0), duration=audio_duration)
-            
-            # 添加標題文字
-            txt_clip = mp.TextClip(
-                "音訊語音合成 - 由多語言音訊處理器生成",
-                fontsize=50, color='white', font="Arial-Bold", 
-                size=(1000, 200)
-            )
-            txt_clip = txt_clip.set_position('center').set_duration(audio_duration)
-            
-            # 添加時間戳
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            time_txt = mp.TextClip(
-                f"生成時間: {timestamp}",
-                fontsize=30, color='white', font="Arial", 
-                size=(800, 100)
-            )
-            time_txt = time_txt.set_position(('center', 500)).set_duration(audio_duration)
-            
-            # 組合視頻
-            video_with_txt = mp.CompositeVideoClip([video_clip, txt_clip, time_txt])
-            video_with_audio = video_with_txt.set_audio(audio_clip)
-            
-            # 保存視頻
-            final_output_path = f"output.{output_format}"
-            video_with_audio.write_videofile(
-                final_output_path, 
-                codec='libx264',
-                audio_codec='aac', 
-                temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
-                remove_temp=True,
-                fps=30
-            )
-            
-            self.current_output_path = final_output_path
-            self.log(f"✅ 成功生成視頻到 {final_output_path}")
-            
-        except Exception as e:
-            self.log(f"❌ 創建視頻時出錯: {str(e)}")
-            # 如果視頻生成失敗，回退到僅保存音頻
-            output_format = "wav"
-            shutil.copy2(audio_path, f"output.{output_format}")
-            self.current_output_path = f"output.{output_format}"
-            self.log(f"⚠️ 視頻創建失敗，已保存音頻到 {self.current_output_path}")
-    
-    def create_video_with_new_audio(self, video_path, audio_path, video_format):
-        """使用原視頻但替換為新的音頻"""
-        try:
-            self.log("🔄 正在創建視頻（使用原視頻 + 新音頻）...")
-            
-            # 獲取輸出格式
-            output_format = VIDEO_FORMATS[video_format]["ext"]
-            
-            # 創建臨時目錄
-            temp_dir = tempfile.mkdtemp()
-            self.temp_files.append(temp_dir)
-            
-            # 加載原視頻（但不使用其音頻）
-            video_clip = mp.VideoFileClip(video_path)
-            
-            # 加載新音頻
-            audio_clip = mp.AudioFileClip(audio_path)
-            
-            # 檢查音頻和視頻的時長，如果音頻較長，則延長視頻；如果視頻較長，則剪切視頻
-            video_duration = video_clip.duration
-            audio_duration = audio_clip.duration
-            
-            if audio_duration > video_duration:
-                self.log(f"⚠️ 合成的音頻 ({audio_duration:.2f}秒) 比原視頻 ({video_duration:.2f}秒) 長，將重複視頻以匹配音頻長度")
-                # 計算需要重複視頻的次數
-                repeat_times = int(audio_duration / video_duration) + 1
-                # 創建重複視頻
-                repeated_clips = [video_clip] * repeat_times
-                extended_clip = mp.concatenate_videoclips(repeated_clips)
-                # 裁剪到音頻長度
-                video_clip = extended_clip.subclip(0, audio_duration)
-            elif video_duration > audio_duration:
-                self.log(f"⚠️ 原視頻 ({video_duration:.2f}秒) 比合成的音頻 ({audio_duration:.2f}秒) 長，將裁剪視頻以匹配音頻長度")
-                video_clip = video_clip.subclip(0, audio_duration)
-            
-            # 設置新音頻
-            final_clip = video_clip.set_audio(audio_clip)
-            
-            # 保存視頻
-            final_output_path = f"output.{output_format}"
-            final_clip.write_videofile(
-                final_output_path, 
-                codec='libx264',
-                audio_codec='aac', 
-                temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
-                remove_temp=True
-            )
-            
-            self.current_output_path = final_output_path
-            self.log(f"✅ 成功生成視頻到 {final_output_path}")
-            
-        except Exception as e:
-            self.log(f"❌ 創建視頻時出錯: {str(e)}")
-            # 如果視頻生成失敗，回退到僅保存音頻
-            output_format = "wav"
-            shutil.copy2(audio_path, f"output.{output_format}")
-            self.current_output_path = f"output.{output_format}"
-            self.log(f"⚠️ 視頻創建失敗，已保存音頻到 {self.current_output_path}")
+            self.ui.update("status", lambda: self.update_status("處理失敗"))
+            self.ui.call(lambda: self.progress.stop())
+            self.ui.call(lambda: self.process_btn.configure(state=tk.NORMAL))
+            self.ui.call(lambda: self.play_btn.configure(state=tk.DISABLED))
+            self.ui.call(lambda: self.save_btn.configure(state=tk.DISABLED))
     
     def play_output(self):
         """播放生成的音訊或視頻"""
@@ -1358,10 +765,10 @@ class AudioProcessorApp:
                 try:
                     if is_video:
                         # 視頻轉換
-                        self.convert_video_format(self.current_output_path, save_path)
+                        convert_video_format(self.current_output_path, save_path, log=self.log)
                     else:
                         # 音訊轉換
-                        self.convert_audio_format(self.current_output_path, save_path)
+                        convert_audio_format(self.current_output_path, save_path, log=self.log)
                 
                 except Exception as e:
                     self.log(f"❌ 格式轉換失敗: {str(e)}")
@@ -1372,82 +779,6 @@ class AudioProcessorApp:
             except Exception as e:
                 self.log(f"❌ 保存檔案時發生錯誤: {str(e)}")
     
-    def convert_video_format(self, source_path, target_path):
-        """轉換視頻格式"""
-        try:
-            # 創建臨時目錄
-            temp_dir = tempfile.mkdtemp()
-            self.temp_files.append(temp_dir)
-            
-            # 加載視頻
-            video = mp.VideoFileClip(source_path)
-            
-            # 獲取目標格式
-            target_ext = os.path.splitext(target_path)[1].lower()[1:]  # 移除點號
-            
-            # 設置不同格式的參數
-            if target_ext == 'mp4':
-                video.write_videofile(
-                    target_path, 
-                    codec='libx264',
-                    audio_codec='aac', 
-                    temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
-                    remove_temp=True
-                )
-            elif target_ext == 'mov':
-                video.write_videofile(
-                    target_path, 
-                    codec='libx264',
-                    audio_codec='aac', 
-                    temp_audiofile=os.path.join(temp_dir, "temp_audio.m4a"),
-                    remove_temp=True
-                )
-            elif target_ext == 'mkv':
-                video.write_videofile(
-                    target_path, 
-                    codec='libx264',
-                    audio_codec='libvorbis', 
-                    temp_audiofile=os.path.join(temp_dir, "temp_audio.ogg"),
-                    remove_temp=True
-                )
-            
-            self.log(f"✅ 已成功將視頻保存為 {target_ext.upper()} 格式: {target_path}")
-            
-        except Exception as e:
-            self.log(f"❌ 視頻格式轉換失敗: {str(e)}")
-            raise e
-    
-    def convert_audio_format(self, source_path, target_path):
-        """轉換音訊格式"""
-        # 使用 pydub 加載音訊
-        source_ext = os.path.splitext(source_path)[1].lower()
-        target_ext = os.path.splitext(target_path)[1].lower()
-        target_format = target_ext[1:]  # 去掉點號
-        
-        if source_ext == '.wav':
-            audio = AudioSegment.from_wav(source_path)
-        elif source_ext == '.mp3':
-            audio = AudioSegment.from_mp3(source_path)
-        elif source_ext == '.m4a':
-            audio = AudioSegment.from_file(source_path, format="m4a")
-        elif source_ext == '.ogg':
-            audio = AudioSegment.from_ogg(source_path)
-        else:
-            audio = AudioSegment.from_file(source_path)
-        
-        # 設置轉換參數
-        export_params = {}
-        if target_format == "mp3":
-            export_params = {"bitrate": "192k"}
-        elif target_format == "m4a":
-            export_params = {"bitrate": "192k", "format": "ipod"}
-        elif target_format == "ogg":
-            export_params = {"bitrate": "192k"}
-        
-        # 導出為目標格式
-        audio.export(target_path, format=target_format, **export_params)
-        self.log(f"✅ 已成功將音訊保存為 {target_format.upper()} 格式: {target_path}")
-    
     def start_video_retalk(self):
         """啟動視頻換臉處理對話框並執行"""
         # 檢查輸出音訊是否存在
@@ -1584,29 +915,31 @@ class AudioProcessorApp:
                     result = self.video_retalk(face_path, audio_path, output_path)
                     
                     # 在主線程中更新UI
-                    self.root.after(0, lambda: progress.stop())
+                    self.ui.call(lambda: progress.stop())
                     
                     if result:
-                        self.root.after(0, lambda: status_var.set("處理完成"))
-                        self.root.after(0, lambda: messagebox.showinfo("成功", f"視頻換臉處理成功!\n輸出檔案: {result}"))
-                        self.root.after(0, lambda: retalk_dialog.destroy())
+                        self.ui.call(lambda: status_var.set("處理完成"))
+                        self.ui.call(lambda: messagebox.showinfo("成功", f"視頻換臉處理成功!\n輸出檔案: {result}"))
+                        self.ui.call(lambda: retalk_dialog.destroy())
                         
                         # 更新主界面的當前輸出路徑並啟用播放按鈕
                         self.current_output_path = result
-                        self.root.after(0, lambda: self.play_btn.configure(state=tk.NORMAL))
-                        self.root.after(0, lambda: self.save_btn.configure(state=tk.NORMAL))
+                        self.ui.call(lambda: self.play_btn.configure(state=tk.NORMAL))
+                        self.ui.call(lambda: self.save_btn.configure(state=tk.NORMAL))
                     else:
-                        self.root.after(0, lambda: status_var.set("處理失敗"))
-                        self.root.after(0, lambda: messagebox.showerror("錯誤", "視頻換臉處理失敗"))
-                        self.root.after(0, lambda: start_btn.configure(state=tk.NORMAL))
-                        self.root.after(0, lambda: cancel_btn.configure(state=tk.NORMAL))
+                        self.ui.call(lambda: status_var.set("處理失敗"))
+                        self.ui.call(lambda: messagebox.showerror("錯誤", "視頻換臉處理失敗"))
+                        self.ui.call(lambda: start_btn.configure(state=tk.NORMAL))
+                        self.ui.call(lambda: cancel_btn.configure(state=tk.NORMAL))
                 
                 except Exception as e:
-                    self.root.after(0, lambda: progress.stop())
-                    self.root.after(0, lambda: status_var.set("處理錯誤"))
-                    self.root.after(0, lambda: messagebox.showerror("錯誤", f"處理時發生錯誤: {str(e)}"))
-                    self.root.after(0, lambda: start_btn.configure(state=tk.NORMAL))
-                    self.root.after(0, lambda: cancel_btn.configure(state=tk.NORMAL))
+                    # 例外變數在 except 區塊結束後即被刪除，先取出訊息
+                    error_msg = str(e)
+                    self.ui.call(lambda: progress.stop())
+                    self.ui.call(lambda: status_var.set("處理錯誤"))
+                    self.ui.call(lambda: messagebox.showerror("錯誤", f"處理時發生錯誤: {error_msg}"))
+                    self.ui.call(lambda: start_btn.configure(state=tk.NORMAL))
+                    self.ui.call(lambda: cancel_btn.configure(state=tk.NORMAL))
             
             # 啟動處理線程
             threading.Thread(target=process_thread, daemon=True).start()
@@ -1677,6 +1010,7 @@ if __name__ == "__main__":
                 widget.destroy()
                 
         app.cleanup_temp_files()
+        app.ui.stop()
         root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
@@ -0,0 +1,301 @@
+import os
+import re
+import glob
+import time
+import heapq
+import threading
+import argostranslate.package
+import argostranslate.translate
+
+try:
+    import ctranslate2
+    import sentencepiece
+except ImportError:  # 缺少時退回逐句呼叫 Argos
+    ctranslate2 = None
+    sentencepiece = None
+
+
+# 離線安裝用的本地語言包目錄（可用環境變數 ARGOS_PACKAGE_DIR 覆寫）
+LOCAL_PACKAGE_DIR = os.environ.get("ARGOS_PACKAGE_DIR", "argos-packages")
+
+# 本地語言包檔名格式，例如 translate-en_ja-1_1.argosmodel
+_PACKAGE_NAME_RE = re.compile(r"translate-([a-z]{2,3})_([a-z]{2,3})[-_.]", re.IGNORECASE)
+
+# 批次翻譯的預設參數
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_INTER_THREADS = max(1, min(4, (os.cpu_count() or 1) // 2))
+
+
+class BatchTranslator:
+    """直接使用 Argos 語言包內的 CTranslate2 模型進行批次翻譯"""
+
+    def __init__(self, package_path, target_prefix=None, inter_threads=DEFAULT_INTER_THREADS,
+                 intra_threads=0, batch_size=DEFAULT_BATCH_SIZE):
+        package_path = str(package_path)
+        self.batch_size = batch_size
+        self.target_prefix = target_prefix or None
+        self.translator = ctranslate2.Translator(
+            os.path.join(package_path, "model"),
+            device="cpu",
+            inter_threads=inter_threads,
+            intra_threads=intra_threads
+        )
+        self.tokenizer = sentencepiece.SentencePieceProcessor(
+            model_file=os.path.join(package_path, "sentencepiece.model")
+        )
+
+    @staticmethod
+    def supports(package_path):
+        """檢查語言包是否為 SentencePiece + CTranslate2 格式"""
+        package_path = str(package_path)
+        return (ctranslate2 is not None
+                and os.path.isdir(os.path.join(package_path, "model"))
+                and os.path.exists(os.path.join(package_path, "sentencepiece.model")))
+
+    def translate_batch(self, texts):
+        """批次翻譯多個句子，回傳與輸入同順序的結果"""
+        if not texts:
+            return []
+        tokens = self.tokenizer.encode(list(texts), out_type=str)
+        target_prefix = None
+        if self.target_prefix:
+            target_prefix = [[self.target_prefix]] * len(tokens)
+        results = self.translator.translate_batch(
+            tokens,
+            target_prefix=target_prefix,
+            max_batch_size=self.batch_size,
+            beam_size=4,
+            replace_unknowns=True
+        )
+        translated = []
+        for result in results:
+            pieces = result.hypotheses[0]
+            if self.target_prefix and pieces and pieces[0] == self.target_prefix:
+                pieces = pieces[1:]
+            translated.append(self.tokenizer.decode(pieces))
+        return translated
+
+
+class TranslationEngine:
+    """Argos 翻譯引擎：語言包只解析一次，翻譯物件依語言對常駐記憶體"""
+
+    def __init__(self, local_package_dir=LOCAL_PACKAGE_DIR):
+        self.local_package_dir = local_package_dir
+        self._translations = {}
+        self._batch_translators = {}
+        self._routes = {}
+        # 各語言對實測的每字元翻譯秒數，作為路徑規劃的次要依據
+        self._seconds_per_char = {}
+        self._index_updated = False
+        self._lock = threading.RLock()
+        # 批次翻譯器的 CTranslate2 線程設定
+        self.inter_threads = DEFAULT_INTER_THREADS
+        self.intra_threads = 0
+
+    def set_threads(self, inter_threads, intra_threads):
+        """設定批次翻譯器的 inter_threads / intra_threads；設定改變時重新建立已快取的翻譯器"""
+        with self._lock:
+            if (inter_threads, intra_threads) != (self.inter_threads, self.intra_threads):
+                self.inter_threads = inter_threads
+                self.intra_threads = intra_threads
+                self._batch_translators.clear()
+
+    def _is_installed(self, source_lang, target_lang):
+        return any(
+            pkg.from_code == source_lang and pkg.to_code == target_lang
+            for pkg in argostranslate.package.get_installed_packages()
+        )
+
+    def _install_from_local(self, source_lang, target_lang, log):
+        """從本地目錄安裝語言包，成功時回傳 True"""
+        if not self.local_package_dir or not os.path.isdir(self.local_package_dir):
+            return False
+        for path in sorted(glob.glob(os.path.join(self.local_package_dir, "*.argosmodel"))):
+            match = _PACKAGE_NAME_RE.search(os.path.basename(path))
+            if match and match.group(1).lower() == source_lang and match.group(2).lower() == target_lang:
+                log(f"🔄 從本地目錄安裝語言包: {os.path.basename(path)}")
+                argostranslate.package.install_from_path(path)
+                return True
+        return False
+
+    def _install_from_index(self, source_lang, target_lang, log):
+        """從線上套件索引下載並安裝語言包（索引每個引擎只更新一次）"""
+        if not self._index_updated:
+            argostranslate.package.update_package_index()
+            self._index_updated = True
+        for pkg in argostranslate.package.get_available_packages():
+            if getattr(pkg, "from_code", None) == source_lang and getattr(pkg, "to_code", None) == target_lang:
+                log(f"🔄 正在安裝語言包: {source_lang} → {target_lang}")
+                argostranslate.package.install_from_path(pkg.download())
+                return True
+        return False
+
+    def ensure_package(self, source_lang, target_lang, log=print):
+        """確保語言包已安裝：已安裝 → 本地目錄 → 線上索引"""
+        with self._lock:
+            if self._is_installed(source_lang, target_lang):
+                return
+            log(f"🔄 檢查和安裝語言包 {source_lang} → {target_lang}...")
+            if self._install_from_local(source_lang, target_lang, log):
+                return
+            try:
+                if self._install_from_index(source_lang, target_lang, log):
+                    return
+            except Exception as e:
+                log(f"⚠️ 無法連線到語言包索引（離線模式）: {str(e)}")
+            raise Exception(f"❌ 找不到從 {source_lang} 到 {target_lang} 的語言包")
+
+    def _package_edges(self, include_index=False):
+        """收集可用的語言對：{(來源, 目標): 是否需要安裝}"""
+        edges = {}
+        try:
+            # 讀取已下載的套件索引（不連線）；include_index 時先更新索引
+            if include_index and not self._index_updated:
+                argostranslate.package.update_package_index()
+                self._index_updated = True
+            for pkg in argostranslate.package.get_available_packages():
+                edges[(pkg.from_code, pkg.to_code)] = True
+        except Exception:
+            pass
+        if self.local_package_dir and os.path.isdir(self.local_package_dir):
+            for path in glob.glob(os.path.join(self.local_package_dir, "*.argosmodel")):
+                match = _PACKAGE_NAME_RE.search(os.path.basename(path))
+                if match:
+                    edges[(match.group(1).lower(), match.group(2).lower())] = True
+        for pkg in argostranslate.package.get_installed_packages():
+            edges[(pkg.from_code, pkg.to_code)] = False
+        return edges
+
+    def _shortest_route(self, source_lang, target_lang, edges):
+        """以 (翻譯次數, 需安裝的語言包數, 實測耗時) 為成本尋找最短路徑，找不到時回傳 None"""
+        graph = {}
+        for (src, dst), needs_install in edges.items():
+            graph.setdefault(src, []).append((dst, needs_install))
+        queue = [((0, 0, 0.0), source_lang, [source_lang])]
+        visited = set()
+        while queue:
+            cost, lang, route = heapq.heappop(queue)
+            if lang == target_lang:
+                return route
+            if lang in visited:
+                continue
+            visited.add(lang)
+            for dst, needs_install in graph.get(lang, []):
+                if dst in visited:
+                    continue
+                hops, installs, seconds = cost
+                heapq.heappush(queue, (
+                    (hops + 1, installs + int(needs_install), seconds + self._seconds_per_char.get((lang, dst), 0.0)),
+                    dst, route + [dst]
+                ))
+        return None
+
+    def plan_route(self, source_lang, target_lang, via=None, log=print):
+        """規劃翻譯路徑，回傳語言代碼列表（例如 ["zh", "en", "ja"]）
+
+        - 來源與目標相同時不翻譯（回傳 [source_lang]）
+        - 指定 via 時依序經過該語言，各段仍取最短路徑並略過相同語言的段落
+        - 否則取翻譯次數最少的路徑，有直接語言包時只翻譯一次
+        路徑依 (來源, 目標, via) 快取。
+        """
+        key = (source_lang, target_lang, via)
+        with self._lock:
+            route = self._routes.get(key)
+            if route is not None:
+                return route
+
+            if via is not None:
+                first = self.plan_route(source_lang, via, log=log)
+                route = first + self.plan_route(via, target_lang, log=log)[1:]
+            elif source_lang == target_lang:
+                route = [source_lang]
+            else:
+                route = self._shortest_route(source_lang, target_lang, self._package_edges())
+                if route is None:
+                    # 本地資訊找不到路徑時才更新線上索引
+                    route = self._shortest_route(source_lang, target_lang, self._package_edges(include_index=True))
+                if route is None:
+                    raise Exception(f"❌ 找不到從 {source_lang} 到 {target_lang} 的翻譯路徑")
+            self._routes[key] = route
+            return route
+
+    def get_translation(self, source_lang, target_lang, log=print):
+        """取得（並快取）指定語言對的翻譯物件"""
+        key = (source_lang, target_lang)
+        with self._lock:
+            translation = self._translations.get(key)
+            if translation is not None:
+                return translation
+
+            self.ensure_package(source_lang, target_lang, log=log)
+            languages = {lang.code: lang for lang in argostranslate.translate.get_installed_languages()}
+            if source_lang not in languages or target_lang not in languages:
+                raise Exception(f"❌ 找不到從 {source_lang} 到 {target_lang} 的語言包")
+            translation = languages[source_lang].get_translation(languages[target_lang])
+            if translation is None:
+                raise Exception(f"❌ 找不到從 {source_lang} 到 {target_lang} 的語言包")
+            self._translations[key] = translation
+            return translation
+
+    def translate(self, text, source_lang, target_lang, log=print):
+        """翻譯單一文本"""
+        return self.get_translation(source_lang, target_lang, log=log).translate(text)
+
+    def get_batch_translator(self, source_lang, target_lang, log=print):
+        """取得（並快取）指定語言對的批次翻譯器，不支援時回傳 None"""
+        key = (source_lang, target_lang)
+        with self._lock:
+            if key in self._batch_translators:
+                return self._batch_translators[key]
+
+            self.ensure_package(source_lang, target_lang, log=log)
+            translator = None
+            for pkg in argostranslate.package.get_installed_packages():
+                if pkg.from_code == source_lang and pkg.to_code == target_lang:
+                    if BatchTranslator.supports(pkg.package_path):
+                        try:
+                            translator = BatchTranslator(
+                                pkg.package_path, target_prefix=getattr(pkg, "target_prefix", None),
+                                inter_threads=self.inter_threads, intra_threads=self.intra_threads
+                            )
+                        except Exception as e:
+                            log(f"⚠️ 無法建立批次翻譯器，改用逐句翻譯: {str(e)}")
+                    break
+            self._batch_translators[key] = translator
+            return translator
+
+    def package_version(self, source_lang, target_lang):
+        """取得已安裝語言包的版本（作為翻譯記憶的鍵，語言包更新後舊譯文即失效）"""
+        for pkg in argostranslate.package.get_installed_packages():
+            if pkg.from_code == source_lang and pkg.to_code == target_lang:
+                return str(getattr(pkg, "package_version", "") or "")
+        return ""
+
+    def translate_many(self, texts, source_lang, target_lang, log=print, memory=None):
+        """批次翻譯多個文本，回傳與輸入同順序的結果；提供 memory 時先查詢翻譯記憶"""
+        texts = list(texts)
+        if memory is not None:
+            self.ensure_package(source_lang, target_lang, log=log)
+            translated, hits = memory.translate(
+                texts, source_lang, target_lang,
+                lambda pending: self.translate_many(pending, source_lang, target_lang, log=log),
+                version=self.package_version(source_lang, target_lang)
+            )
+            if hits:
+                log(f"♻️ 翻譯記憶命中 {hits}/{len(texts)} 句")
+            return translated
+        translator = self.get_batch_translator(source_lang, target_lang, log=log)
+        start = time.perf_counter()
+        if translator is not None:
+            translated = translator.translate_batch(texts)
+        else:
+            translation = self.get_translation(source_lang, target_lang, log=log)
+            translated = [translation.translate(text) for text in texts]
+        chars = sum(len(text) for text in texts)
+        if chars:
+            self._seconds_per_char[(source_lang, target_lang)] = (time.perf_counter() - start) / chars
+        return translated
+
+
+# 全域共用的翻譯引擎
+translation_engine = TranslationEngine()
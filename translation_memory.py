@@ -0,0 +1,122 @@
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from cache_utils import cache_dir
+
+
+# 連續空白
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sentence(text):
+    """正規化句子作為查詢鍵：NFKC 全半形統一、合併連續空白、去除首尾空白"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class TranslationMemory:
+    """句子層級的翻譯記憶（SQLite）：以 (正規化原文, 來源語言, 目標語言, 語言包版本) 為鍵，完全相同的句子直接回傳先前的譯文"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        # 本次執行的命中統計（以句數計算，重複的句子分別計入；只由 translate() 更新）
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        # 連線不可跨進程共用，fork 後的子進程需重新連線
+        if self._conn is None or self._pid != os.getpid():
+            path = self.db_path or os.path.join(cache_dir("translation_memory"), "memory.sqlite3")
+            conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " source TEXT NOT NULL, src TEXT NOT NULL, dst TEXT NOT NULL, version TEXT NOT NULL,"
+                " target TEXT NOT NULL, hits INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (source, src, dst, version))"
+            )
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def lookup(self, sentences, src, dst, version=""):
+        """查詢多個句子，回傳 {正規化原文: 譯文}（只包含命中的句子）"""
+        keys = list(dict.fromkeys(normalize_sentence(s) for s in sentences))
+        found = {}
+        with self._lock:
+            conn = self._connect()
+            # 分批查詢，避免超過 SQLite 的參數數量上限
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT source, target FROM segments WHERE src = ? AND dst = ? AND version = ?"
+                    f" AND source IN ({placeholders})",
+                    [src, dst, version, *batch]
+                ).fetchall()
+                found.update(rows)
+            if found:
+                conn.executemany(
+                    "UPDATE segments SET hits = hits + 1 WHERE source = ? AND src = ? AND dst = ? AND version = ?",
+                    [(source, src, dst, version) for source in found]
+                )
+                conn.commit()
+        return found
+
+    def store(self, pairs, src, dst, version=""):
+        """寫入多組 (原文, 譯文)"""
+        rows = [(normalize_sentence(source), src, dst, version, target) for source, target in pairs]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO segments (source, src, dst, version, target) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
+    def translate(self, sentences, src, dst, translate_fn, version=""):
+        """先查詢翻譯記憶，只將未命中的句子（去除重複後）交給 translate_fn 批次翻譯，回傳 (譯文列表, 命中句數)
+
+        命中句數為譯文來自記憶庫的句子數（重複的句子分別計入），與 stats() 的統計方式相同。
+        """
+        sentences = list(sentences)
+        keys = [normalize_sentence(s) for s in sentences]
+        found = self.lookup(sentences, src, dst, version)
+        # 未命中的句子以第一次出現的原文送去翻譯（正規化只用於查詢鍵）
+        pending = {}
+        for key, sentence in zip(keys, sentences):
+            if key not in found and key not in pending:
+                pending[key] = sentence
+        if pending:
+            translated = translate_fn(list(pending.values()))
+            self.store(zip(pending.values(), translated), src, dst, version)
+            found.update(zip(pending.keys(), translated))
+        hits = sum(1 for key in keys if key not in pending)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return [found[key] for key in keys], hits
+
+    def stats(self):
+        """回傳本次執行的命中率與記憶庫總句數"""
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": entries,
+            }
+
+
+# 全域共用的翻譯記憶
+translation_memory = TranslationMemory()
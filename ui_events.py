@@ -0,0 +1,102 @@
+import os
+import queue
+import threading
+from datetime import datetime
+from cache_utils import cache_dir
+
+
+# 主線程處理事件的間隔（毫秒），約為一個畫面更新週期
+UI_FRAME_MS = 50
+
+# 日誌視窗保留的最大行數（超過時刪除最舊的行；完整記錄寫入日誌檔）
+LOG_MAX_LINES = 2000
+
+
+def default_log_path():
+    """本次執行的完整日誌檔路徑"""
+    return os.path.join(cache_dir("logs"), f"gui-{datetime.now():%Y%m%d-%H%M%S}.log")
+
+
+class UiEventBus:
+    """線程安全的介面事件匯流排：工作線程只將事件放入佇列，由 Tk 主線程定時取出並套用
+
+    每個週期內：
+    - 日誌訊息合併為一次插入，日誌視窗只保留最近 max_lines 行，完整記錄寫入 log_path；
+    - 同一個 key 的更新（例如狀態列、轉錄內容）只套用最後一次；
+    - 其他呼叫依發送順序執行。
+    """
+
+    def __init__(self, root, log_widget, log_path=None, max_lines=LOG_MAX_LINES, interval_ms=UI_FRAME_MS):
+        self.root = root
+        self.log_widget = log_widget
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.log_path = log_path or default_log_path()
+        self._queue = queue.SimpleQueue()
+        self._log_file = open(self.log_path, "a", encoding="utf-8")
+        self._file_lock = threading.Lock()
+        self._after_id = None
+
+    def log(self, message):
+        """發送一行日誌（任何線程皆可呼叫）"""
+        self._queue.put(("log", None, f"{datetime.now():%H:%M:%S} {message}"))
+
+    def call(self, callback):
+        """在主線程執行 callback（依發送順序）"""
+        self._queue.put(("call", None, callback))
+
+    def update(self, key, callback):
+        """在主線程執行 callback；同一週期內同一個 key 只執行最後一次"""
+        self._queue.put(("update", key, callback))
+
+    def start(self):
+        """開始在主線程定時處理事件"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        """停止處理並寫出剩餘的日誌"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self._drain(reschedule=False)
+        with self._file_lock:
+            self._log_file.close()
+
+    def _drain(self, reschedule=True):
+        events = []
+        while True:
+            try:
+                events.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        lines = [payload for kind, _, payload in events if kind == "log"]
+        latest = {key: index for index, (kind, key, _) in enumerate(events) if kind == "update"}
+        try:
+            if lines:
+                self._write_log(lines)
+            for index, (kind, key, callback) in enumerate(events):
+                if kind == "call" or (kind == "update" and latest[key] == index):
+                    try:
+                        callback()
+                    except Exception as e:
+                        self._write_log([f"介面更新失敗: {type(e).__name__}: {e}"])
+        finally:
+            if reschedule:
+                self._after_id = self.root.after(self.interval_ms, self._drain)
+
+    def _write_log(self, lines):
+        text = "".join(f"{line}\n" for line in lines)
+        with self._file_lock:
+            if not self._log_file.closed:
+                self._log_file.write(text)
+                self._log_file.flush()
+
+        widget = self.log_widget
+        widget.insert("end", text)
+        # 只保留最近 max_lines 行（end-1c 位於最後一個換行之後的空行）
+        line_count = int(widget.index("end-1c").split(".")[0]) - 1
+        if line_count > self.max_lines:
+            widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+        widget.see("end")
@@ -0,0 +1,129 @@
+import numpy as np
+
+
+# 能量偵測的音框長度（毫秒）
+VAD_FRAME_MS = 30
+
+# 語音門檻：高於背景雜訊（音框能量第 10 百分位數）多少 dB，且至少高於絕對下限
+VAD_MARGIN_DB = 12.0
+VAD_FLOOR_DB = -55.0
+
+# 短於此長度的靜音併入語音、短於此長度的語音視為雜音（毫秒），以及語音區段前後保留的長度
+VAD_MIN_SILENCE_MS = 500
+VAD_MIN_SPEECH_MS = 250
+VAD_PAD_MS = 200
+
+# 拼接語音區段時插入的靜音長度（秒），讓轉錄模型能分辨區段邊界
+SPEECH_GAP_SECONDS = 0.2
+
+
+def frame_energy_db(audio, frame_length):
+    """各音框的 RMS 能量 (dBFS)，不足一個音框的尾端捨去"""
+    count = len(audio) // frame_length
+    frames = np.asarray(audio[:count * frame_length], dtype=np.float32).reshape(count, frame_length)
+    power = np.einsum("ij,ij->i", frames, frames) / frame_length
+    return 10.0 * np.log10(power + 1e-10)
+
+
+def _runs(mask):
+    """mask 中連續 True 的區段，回傳 shape (n, 2) 的 [起點, 終點) 陣列"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    return edges.reshape(-1, 2)
+
+
+def _fill(length, runs):
+    """將 runs 標記為 True 的遮罩"""
+    delta = np.zeros(length + 1, dtype=np.int32)
+    np.add.at(delta, runs[:, 0], 1)
+    np.add.at(delta, runs[:, 1], -1)
+    return np.cumsum(delta[:-1]) > 0
+
+
+def detect_speech(audio, sample_rate, frame_ms=VAD_FRAME_MS, margin_db=VAD_MARGIN_DB, floor_db=VAD_FLOOR_DB,
+                  min_silence_ms=VAD_MIN_SILENCE_MS, min_speech_ms=VAD_MIN_SPEECH_MS, pad_ms=VAD_PAD_MS):
+    """以音框能量偵測語音區段，回傳 [(起點秒, 終點秒), ...]
+
+    門檻依音訊本身的背景雜訊自動調整；短暫停頓併入前後的語音，過短的聲響捨去，區段前後各保留 pad_ms。
+    """
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    energy = frame_energy_db(audio, frame_length)
+    if energy.size == 0:
+        return []
+    threshold = max(np.percentile(energy, 10) + margin_db, floor_db)
+    mask = energy > threshold
+
+    # 語音之間的短暫停頓視為語音
+    silences = _runs(~mask)
+    interior = (silences[:, 0] > 0) & (silences[:, 1] < mask.size)
+    short = silences[interior & (silences[:, 1] - silences[:, 0] < min_silence_ms / frame_ms)]
+    if short.size:
+        mask |= _fill(mask.size, short)
+
+    speech = _runs(mask)
+    speech = speech[speech[:, 1] - speech[:, 0] >= min_speech_ms / frame_ms]
+    if not speech.size:
+        return []
+
+    # 轉為秒並加上前後保留，重疊的區段合併
+    duration = len(audio) / sample_rate
+    bounds = speech * (frame_length / sample_rate)
+    bounds[:, 0] = np.maximum(bounds[:, 0] - pad_ms / 1000, 0.0)
+    bounds[:, 1] = np.minimum(bounds[:, 1] + pad_ms / 1000, duration)
+    intervals = [[bounds[0, 0], bounds[0, 1]]]
+    for start, end in bounds[1:]:
+        if start <= intervals[-1][1]:
+            intervals[-1][1] = max(intervals[-1][1], end)
+        else:
+            intervals.append([start, end])
+    return [(float(start), float(end)) for start, end in intervals]
+
+
+def concat_speech(audio, intervals, sample_rate, gap_seconds=SPEECH_GAP_SECONDS):
+    """只保留語音區段並以短暫靜音相隔拼接，回傳 (拼接後的音訊, 時間對照表)
+
+    對照表每列為 (拼接後的起點秒, 原始起點秒, 長度秒)，供 to_original_time 將時間對回原始時間軸。
+    """
+    gap = np.zeros(int(gap_seconds * sample_rate), dtype=np.float32)
+    pieces, layout, position = [], [], 0.0
+    for start, end in intervals:
+        piece = audio[int(start * sample_rate):int(end * sample_rate)]
+        if pieces:
+            pieces.append(gap)
+            position += len(gap) / sample_rate
+        layout.append((position, start, len(piece) / sample_rate))
+        pieces.append(piece)
+        position += len(piece) / sample_rate
+    speech = np.concatenate(pieces).astype(np.float32, copy=False) if pieces else np.zeros(0, dtype=np.float32)
+    return speech, np.asarray(layout, dtype=np.float64).reshape(-1, 3)
+
+
+def to_original_time(times, layout, end=False):
+    """將拼接後音訊的時間對回原始時間軸；落在區段間靜音的時間對到前一個區段的結尾
+
+    end 為 True 時，剛好位於下一個區段起點的時間視為前一個區段的結尾（用於 segment 的結束時間）。
+    """
+    times = np.asarray(times, dtype=np.float64)
+    index = np.searchsorted(layout[:, 0], times, side="left" if end else "right") - 1
+    index = np.clip(index, 0, len(layout) - 1)
+    offset = np.clip(times - layout[index, 0], 0.0, layout[index, 2])
+    return layout[index, 1] + offset
+
+
+def map_segments(segments, layout):
+    """將轉錄結果的 segments（及逐字時間戳）對回原始時間軸，回傳新的 segments 列表"""
+    if not segments or not len(layout):
+        return segments
+    starts = to_original_time([segment["start"] for segment in segments], layout)
+    ends = to_original_time([segment["end"] for segment in segments], layout, end=True)
+    mapped = []
+    for segment, start, end in zip(segments, starts, ends):
+        segment = dict(segment, start=float(start), end=float(end))
+        if segment.get("words"):
+            segment["words"] = [
+                dict(word,
+                     start=float(to_original_time(word["start"], layout)),
+                     end=float(to_original_time(word["end"], layout, end=True)))
+                for word in segment["words"]
+            ]
+        mapped.append(segment)
+    return mapped
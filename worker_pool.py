@@ -0,0 +1,181 @@
+import os
+import queue
+import multiprocessing as mproc
+import torch
+from model_registry import whisper_registry, xtts_registry
+from resource_scheduler import ResourceScheduler
+
+
+def _worker_main(pipeline_class, config, task_queue, result_queue, cores, stage_threads):
+    """工作進程：重用（fork 時繼承的）常駐模型，從共用佇列取出檔案處理
+
+    每個工作進程只使用分配到的核心，避免 torch 線程超額訂閱；啟用 pin_cores 時並綁定到這些核心。
+    """
+    if config.pin_cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(cores))
+    torch.set_num_threads(len(cores))
+    pid = os.getpid()
+
+    def log(message):
+        result_queue.put(("log", pid, message))
+
+    pipeline = pipeline_class(config, log=log)
+    # 進程內各階段依序執行，每個階段使用本進程的全部核心
+    pipeline.scheduler = ResourceScheduler(stage_threads, pin=config.pin_cores, cores=cores)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        index, file_path, output_folder = task
+        result_queue.put(("start", pid, index))
+        try:
+            message = ("done", pid, (index, pipeline.run_batch_file(file_path, output_folder, index=index)))
+        except Exception as e:
+            # 例外物件不一定能序列化，只回傳文字
+            message = ("failed", pid, (index, f"{type(e).__name__}: {e}"))
+        finally:
+            pipeline.cleanup()
+        # 階段計時記錄交給父進程合併輸出
+        result_queue.put(("spans", pid, pipeline.tracer.spans))
+        pipeline.tracer.clear()
+        result_queue.put(message)
+
+
+class ProcessBatchPool:
+    """多進程批次處理：每個工作進程各自常駐 Whisper 與 XTTS，從共用佇列領取檔案
+
+    在支援 fork 的平台上，父進程先載入模型再 fork，子進程以寫入時複製 (copy-on-write)
+    共用模型權重的記憶體頁；其他平台則由各工作進程自行載入模型。
+    """
+
+    def __init__(self, pipeline, processes):
+        self.pipeline = pipeline
+        self.processes = max(1, processes)
+        # 將可用核心切分給各工作進程
+        self.core_slices = pipeline.scheduler.partition(self.processes)
+        self.stage_threads = self._worker_stage_threads()
+
+    def _worker_stage_threads(self):
+        """工作進程的階段線程數
+
+        faster-whisper 的計算線程數在載入時固定且是註冊表鍵的一部分；核心無法平均切分時，
+        所有工作進程的轉錄階段都使用最小區段的線程數，才能共用父進程預載（fork 後寫入時複製）的同一個模型。
+        """
+        config = self.pipeline.config
+        stage_threads = dict(config.stage_threads)
+        if config.transcription_backend == "faster-whisper":
+            stage_threads["transcribe"] = min(
+                ResourceScheduler(config.stage_threads, cores=cores).threads("transcribe")
+                for cores in self.core_slices
+            )
+        return stage_threads
+
+    @property
+    def log(self):
+        return self.pipeline.log
+
+    def _preload_models(self):
+        """在父進程預先載入模型，讓 fork 出的子進程直接共用"""
+        config = self.pipeline.config
+        device = torch.device(config.device)
+        # 載入期間使用單線程，避免 fork 前建立 OpenMP 線程池導致子進程卡住
+        previous_threads = torch.get_num_threads()
+        torch.set_num_threads(1)
+        try:
+            # 以工作進程轉錄時的線程數載入，faster-whisper 的模型才能在子進程中直接重用
+            threads = ResourceScheduler(self.stage_threads, cores=self.core_slices[0]).threads("transcribe")
+            whisper_registry.get(config.model_size, device, log=self.log, quantize=config.quantize,
+                                 backend=config.transcription_backend, threads=threads)
+            # swap 策略下 XTTS 由工作進程在合成前才載入
+            if os.path.exists(config.xtts_dir) and self.pipeline.residency.policy != "swap":
+                xtts_registry.get(config.xtts_dir, device, log=self.log, quantize=config.quantize)
+        finally:
+            torch.set_num_threads(previous_threads)
+
+    def run(self, files, output_folder, on_file_start=None):
+        """執行批次處理，回傳 (依輸入順序排列的成功結果, [(檔案, 錯誤)] 列表)"""
+        pipeline = self.pipeline
+        total_files = len(files)
+        use_fork = "fork" in mproc.get_all_start_methods()
+        context = mproc.get_context("fork" if use_fork else "spawn")
+
+        if use_fork:
+            self.log("🔄 在父進程預先載入模型（fork 後以寫入時複製共用）...")
+            self._preload_models()
+
+        task_queue = context.Queue()
+        result_queue = context.Queue()
+        tasks = {}
+        for index, file_path in enumerate(files):
+            tasks[index] = file_path
+            task_queue.put((index, file_path, output_folder))
+        for _ in range(self.processes):
+            task_queue.put(None)
+
+        sizes = sorted(len(cores) for cores in self.core_slices)
+        threads = f"{sizes[0]}" if sizes[0] == sizes[-1] else f"{sizes[0]}-{sizes[-1]}"
+        self.log(f"🚀 啟動 {self.processes} 個工作進程，每個進程使用 {threads} 個線程"
+                 f"{'（已綁定核心）' if self.pipeline.config.pin_cores else ''}")
+        workers = [
+            context.Process(
+                target=_worker_main,
+                args=(type(pipeline), pipeline.config, task_queue, result_queue, cores, self.stage_threads),
+                daemon=True
+            )
+            for cores in self.core_slices
+        ]
+        for worker in workers:
+            worker.start()
+
+        results = {}
+        failures = {}
+        in_flight = {}  # pid -> 處理中的檔案索引
+        started = 0
+
+        while len(results) + len(failures) < total_files:
+            try:
+                kind, pid, payload = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                # 工作進程異常結束（例如被 OOM killer 終止）時，將其處理中的檔案標記為失敗
+                for worker in workers:
+                    if not worker.is_alive() and worker.pid in in_flight:
+                        index = in_flight.pop(worker.pid)
+                        failures[index] = f"工作進程異常結束 (exit code {worker.exitcode})"
+                        self.log(f"❌ 處理檔案 {os.path.basename(tasks[index])} 時發生錯誤: {failures[index]}")
+                if not any(worker.is_alive() for worker in workers):
+                    for index in tasks:
+                        if index not in results and index not in failures:
+                            failures[index] = "所有工作進程都已結束，檔案未被處理"
+                    break
+                continue
+
+            if kind == "log":
+                self.log(f"[{pid}] {payload}")
+            elif kind == "spans":
+                pipeline.tracer.extend(payload)
+            elif kind == "start":
+                in_flight[pid] = payload
+                if on_file_start:
+                    on_file_start(started, total_files, tasks[payload])
+                started += 1
+                self.log(f"🔄 開始處理檔案 {payload+1}/{total_files}: {os.path.basename(tasks[payload])} (進程 {pid})")
+            elif kind == "done":
+                index, result = payload
+                in_flight.pop(pid, None)
+                results[index] = result
+                self.log(f"✅ 檔案 {os.path.basename(tasks[index])} 處理成功")
+            elif kind == "failed":
+                index, error = payload
+                in_flight.pop(pid, None)
+                failures[index] = error
+                self.log(f"❌ 處理檔案 {os.path.basename(tasks[index])} 時發生錯誤: {error}")
+
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+        return (
+            [results[index] for index in sorted(results)],
+            [(tasks[index], Exception(failures[index])) for index in sorted(failures)]
+        )